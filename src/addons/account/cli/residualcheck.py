@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import sys
+
+import openerp
+from openerp.cli import Command
+
+
+class ResidualCheck(Command):
+    """Check the stored residual amounts of the journal items against their reconciliations"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog="%s residualcheck" % sys.argv[0].split(os.path.sep)[-1],
+            description=self.__doc__,
+            epilog="Other arguments are server options, e.g. -d DATABASE.")
+        parser.add_argument('--limit', type=int, default=50,
+                            help="maximum number of drifting journal items to list (default 50)")
+        opts, server_args = parser.parse_known_args(args)
+
+        openerp.tools.config.parse_config(server_args)
+        dbname = openerp.tools.config['db_name']
+        if not dbname:
+            sys.exit("residualcheck: a database is required (-d DATABASE)")
+
+        registry = openerp.modules.registry.RegistryManager.get(dbname)
+        with openerp.api.Environment.manage():
+            with registry.cursor() as cr:
+                env = openerp.api.Environment(cr, openerp.SUPERUSER_ID, {})
+                drift = env['account.move.line']._get_residual_drift()
+
+        for row in drift[:opts.limit]:
+            print "journal item %(id)d: residual %(amount_residual)s (expected %(expected_amount_residual)s), " \
+                  "residual in currency %(amount_residual_currency)s (expected %(expected_amount_residual_currency)s), " \
+                  "reconciled %(reconciled)s (expected %(expected_reconciled)s)" % row
+        if len(drift) > opts.limit:
+            print "... and %d more" % (len(drift) - opts.limit)
+        print "%d journal item(s) with a drifting residual amount" % len(drift)
+        return 1 if drift else 0
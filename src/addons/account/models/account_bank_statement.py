@@ -306,7 +306,7 @@ class AccountBankStatement(models.Model):
 
         #try to assign partner to bank_statement_line
         stl_to_assign_partner = [stl.id for stl in st_lines_left if not stl.partner_id]
-        refs = list(set([st.name for st in st_lines_left if not stl.partner_id]))
+        refs = list(set([st.name for st in st_lines_left if not st.partner_id]))
         if st_lines_left and stl_to_assign_partner and refs:
             sql_query = """SELECT aml.partner_id, aml.ref, stl.id
                             FROM account_move_line aml
@@ -320,16 +320,18 @@ class AccountBankStatement(models.Model):
                                     (acc.internal_type IN ('payable', 'receivable') AND aml.reconciled = false)
                                     )
                                 AND aml.ref IN %s
+                                AND stl.id IN %s
                                 """
-            params = (self.env.user.company_id.id, (st_lines_left[0].journal_id.default_credit_account_id.id, st_lines_left[0].journal_id.default_debit_account_id.id), tuple(refs))
-            if statements:
-                sql_query += 'AND stl.id IN %s'
-                params += (tuple(stl_to_assign_partner),)
+            params = (self.env.user.company_id.id, (st_lines_left[0].journal_id.default_credit_account_id.id, st_lines_left[0].journal_id.default_debit_account_id.id), tuple(refs), tuple(stl_to_assign_partner))
             self.env.cr.execute(sql_query, params)
-            results = self.env.cr.dictfetchall()
+            partner_by_line = dict((line.get('id'), line.get('partner_id')) for line in self.env.cr.dictfetchall())
+            #write the partners by batches of statement lines
+            lines_by_partner = {}
+            for st_line_id, partner_id in partner_by_line.iteritems():
+                lines_by_partner.setdefault(partner_id, []).append(st_line_id)
             st_line = self.env['account.bank.statement.line']
-            for line in results:
-                st_line.browse(line.get('id')).write({'partner_id': line.get('partner_id')})
+            for partner_id, st_line_ids in lines_by_partner.iteritems():
+                st_line.browse(st_line_ids).write({'partner_id': partner_id})
 
         return {
             'st_lines_ids': st_lines_left.ids,
@@ -346,6 +348,11 @@ class AccountBankStatement(models.Model):
                     st_line.bank_account_id.partner_id = st_line.partner_id
 
 
+def _amount_key(amount):
+    """ Key of an amount in the indexes of reconciliation candidates, currencies having at most 6 decimals """
+    return round(amount, 6)
+
+
 class AccountBankStatementLine(models.Model):
     _name = "account.bank.statement.line"
     _description = "Bank Statement Line"
@@ -448,8 +455,9 @@ class AccountBankStatementLine(models.Model):
     def reconciliation_widget_auto_reconcile(self, num_already_reconciled_lines):
         automatic_reconciliation_entries = self.env['account.bank.statement.line']
         unreconciled = self.env['account.bank.statement.line']
+        candidates = self._get_reconciliation_candidates()
         for stl in self:
-            res = stl.auto_reconcile()
+            res = stl.auto_reconcile(candidates=candidates)
             if res:
                 automatic_reconciliation_entries += stl
             else:
@@ -484,8 +492,9 @@ class AccountBankStatementLine(models.Model):
         excluded_ids = excluded_ids or []
         ret = []
 
+        candidates = self._get_reconciliation_candidates()
         for st_line in self:
-            aml_recs = st_line.get_reconciliation_proposition(excluded_ids=excluded_ids)
+            aml_recs = st_line._get_reconciliation_proposition(candidates, excluded_ids)
             target_currency = st_line.currency_id or st_line.journal_id.currency_id or st_line.journal_id.company_id.currency_id
             rp = aml_recs.prepare_move_lines_for_reconciliation_widget(target_currency=target_currency, target_date=st_line.date)
             excluded_ids += [move_line['id'] for move_line in rp]
@@ -606,48 +615,119 @@ class AccountBankStatementLine(models.Model):
             return select_clause, from_clause, where_clause
         return select_clause + from_clause + where_clause
 
-    def get_reconciliation_proposition(self, excluded_ids=None):
-        """ Returns move lines that constitute the best guess to reconcile a statement line
-            Note: it only looks for move lines in the same currency as the statement line.
+    def _get_reconciliation_amount(self):
+        """ Returns the amount of the statement line as matched against journal items, the field of the journal items
+            holding the residual amount in that currency and the field holding the amount of liquidity items.
         """
-        self.ensure_one()
-        if not excluded_ids:
-            excluded_ids = []
         amount = self.amount_currency or self.amount
         company_currency = self.journal_id.company_id.currency_id
         st_line_currency = self.currency_id or self.journal_id.currency_id
         currency = (st_line_currency and st_line_currency != company_currency) and st_line_currency.id or False
         precision = st_line_currency and st_line_currency.decimal_places or company_currency.decimal_places
-        params = {'company_id': self.env.user.company_id.id,
-                    'account_payable_receivable': (self.journal_id.default_credit_account_id.id, self.journal_id.default_debit_account_id.id),
-                    'amount': float_round(amount, precision_digits=precision),
-                    'partner_id': self.partner_id.id,
-                    'excluded_ids': tuple(excluded_ids),
-                    'ref': self.name,
-                    }
+        field = currency and 'amount_residual_currency' or 'amount_residual'
+        liquidity_field = currency and 'amount_currency' or amount > 0 and 'debit' or 'credit'
+        return _amount_key(float_round(amount, precision_digits=precision)), field, liquidity_field
+
+    @api.multi
+    def _get_reconciliation_candidates(self):
+        """ Load at once the journal items that can be proposed for or automatically reconciled with the statement
+            lines in self: the open items whose reference or journal entry name is the name of a statement line, or
+            whose amount is the amount of a statement line. They are indexed by reference and by amount, in the order
+            the propositions are made (maturity date then id).
+        """
+        candidates = {'ref': {}, 'amount': {}, 'used': set()}
+        refs = set()
+        amounts = set()
+        accounts = set()
+        for st_line in self:
+            if st_line.name:
+                refs.add(st_line.name)
+            amounts.add(st_line._get_reconciliation_amount()[0])
+            accounts.update([st_line.journal_id.default_credit_account_id.id, st_line.journal_id.default_debit_account_id.id])
+        if not self:
+            return candidates
+
+        # the stored amounts are rounded as the amounts of the statement lines, see _amount_key()
+        match_clause = """ROUND(aml.amount_residual, 6) IN %(amounts)s OR ROUND(aml.amount_residual_currency, 6) IN %(amounts)s
+                          OR (acc.internal_type = 'liquidity' AND (ROUND(aml.debit, 6) IN %(amounts)s OR ROUND(aml.credit, 6) IN %(amounts)s
+                                                                   OR ROUND(aml.amount_currency, 6) IN %(amounts)s))"""
+        if refs:
+            match_clause += " OR aml.ref IN %(refs)s OR m.name IN %(refs)s"
+        self.env.cr.execute("""
+            SELECT aml.id, aml.ref, m.name AS move_name, aml.partner_id, aml.account_id, aml.statement_id,
+                   aml.reconciled, acc.internal_type, acc.reconcile, aml.date_maturity,
+                   aml.amount_residual, aml.amount_residual_currency, aml.debit, aml.credit, aml.amount_currency
+              FROM account_move_line aml
+              JOIN account_account acc ON acc.id = aml.account_id
+              JOIN account_move m ON m.id = aml.move_id
+             WHERE aml.company_id = %(company_id)s
+               AND ((aml.statement_id IS NULL AND aml.account_id IN %(accounts)s)
+                    OR ((acc.reconcile = true OR acc.internal_type IN ('payable', 'receivable')) AND aml.reconciled = false))
+               AND (""" + match_clause + """)
+          ORDER BY aml.date_maturity ASC, aml.id ASC
+        """, {
+            'company_id': self.env.user.company_id.id,
+            'accounts': tuple(accounts),
+            'amounts': tuple(amounts),
+            'refs': tuple(refs),
+        })
+        for row in self.env.cr.dictfetchall():
+            for ref in set([row['ref'], row['move_name']]) & refs:
+                candidates['ref'].setdefault(ref, []).append(row)
+            fields = ['amount_residual', 'amount_residual_currency']
+            if row['internal_type'] == 'liquidity':
+                fields += ['debit', 'credit', 'amount_currency']
+            for field in fields:
+                key = (field, _amount_key(row[field] or 0.0))
+                if key[1] in amounts:
+                    candidates['amount'].setdefault(key, []).append(row)
+        return candidates
+
+    def _filter_reconciliation_candidates(self, rows, overlook_partner=False, excluded_ids=None):
+        """ Returns the candidates of `rows` the statement line can be matched with, as `_get_common_sql_query` would """
+        accounts = (self.journal_id.default_credit_account_id.id, self.journal_id.default_debit_account_id.id)
+        excluded_ids = set(excluded_ids or [])
+        res = []
+        for row in rows:
+            if row['id'] in excluded_ids:
+                continue
+            excluded_ids.add(row['id'])
+            if self.partner_id and row['partner_id'] != self.partner_id.id:
+                continue
+            if self.partner_id or overlook_partner:
+                matching = row['internal_type'] in ('payable', 'receivable')
+            else:
+                matching = row['reconcile']
+            if (row['statement_id'] is None and row['account_id'] in accounts) or (matching and row['reconciled'] is False):
+                res.append(row)
+        return sorted(res, key=lambda row: (row['date_maturity'], row['id']))
+
+    def _get_amount_candidates(self, candidates):
+        """ Returns the candidates whose amount matches the amount of the statement line """
+        amount, field, liquidity_field = self._get_reconciliation_amount()
+        return candidates['amount'].get((field, amount), []) + candidates['amount'].get((liquidity_field, amount), [])
+
+    def get_reconciliation_proposition(self, excluded_ids=None):
+        """ Returns move lines that constitute the best guess to reconcile a statement line
+            Note: it only looks for move lines in the same currency as the statement line.
+        """
+        self.ensure_one()
+        return self._get_reconciliation_proposition(self._get_reconciliation_candidates(), excluded_ids or [])
+
+    def _get_reconciliation_proposition(self, candidates, excluded_ids):
+        """ Same as `get_reconciliation_proposition`, among the candidates loaded by `_get_reconciliation_candidates` """
+        self.ensure_one()
         # Look for structured communication match
         if self.name:
-            add_to_select = ", CASE WHEN aml.ref = %(ref)s THEN 1 ELSE 2 END as temp_field_order "
-            add_to_from = " JOIN account_move m ON m.id = aml.move_id "
-            select_clause, from_clause, where_clause = self._get_common_sql_query(overlook_partner=True, excluded_ids=excluded_ids, split=True)
-            sql_query = select_clause + add_to_select + from_clause + add_to_from + where_clause
-            sql_query += " AND (aml.ref= %(ref)s or m.name = %(ref)s) \
-                    ORDER BY temp_field_order, date_maturity asc, aml.id asc"
-            self.env.cr.execute(sql_query, params)
-            results = self.env.cr.fetchone()
-            if results:
-                return self.env['account.move.line'].browse(results[0])
+            rows = self._filter_reconciliation_candidates(candidates['ref'].get(self.name, []), overlook_partner=True, excluded_ids=excluded_ids)
+            rows.sort(key=lambda row: row['ref'] != self.name)
+            if rows:
+                return self.env['account.move.line'].browse(rows[0]['id'])
 
         # Look for a single move line with the same amount
-        field = currency and 'amount_residual_currency' or 'amount_residual'
-        liquidity_field = currency and 'amount_currency' or amount > 0 and 'debit' or 'credit'
-        sql_query = self._get_common_sql_query(excluded_ids=excluded_ids) + \
-                " AND ("+field+" = %(amount)s OR (acc.internal_type = 'liquidity' AND "+liquidity_field+" = %(amount)s)) \
-                ORDER BY date_maturity asc, aml.id asc LIMIT 1"
-        self.env.cr.execute(sql_query, params)
-        results = self.env.cr.fetchone()
-        if results:
-            return self.env['account.move.line'].browse(results[0])
+        rows = self._filter_reconciliation_candidates(self._get_amount_candidates(candidates), excluded_ids=excluded_ids)
+        if rows:
+            return self.env['account.move.line'].browse(rows[0]['id'])
 
         return self.env['account.move.line']
 
@@ -656,44 +736,27 @@ class AccountBankStatementLine(models.Model):
         pass
 
     @api.multi
-    def auto_reconcile(self):
+    def auto_reconcile(self, candidates=None):
         """ Try to automatically reconcile the statement.line ; return the counterpart journal entry/ies if the automatic reconciliation succeeded, False otherwise.
+            `candidates` are the journal items loaded by `_get_reconciliation_candidates` when reconciling several lines.
             TODO : this method could be greatly improved and made extensible
         """
         self.ensure_one()
-        match_recs = self.env['account.move.line']
+        if candidates is None:
+            candidates = self._get_reconciliation_candidates()
+        match_recs = []
 
-        amount = self.amount_currency or self.amount
-        company_currency = self.journal_id.company_id.currency_id
-        st_line_currency = self.currency_id or self.journal_id.currency_id
-        currency = (st_line_currency and st_line_currency != company_currency) and st_line_currency.id or False
-        precision = st_line_currency and st_line_currency.decimal_places or company_currency.decimal_places
-        params = {'company_id': self.env.user.company_id.id,
-                    'account_payable_receivable': (self.journal_id.default_credit_account_id.id, self.journal_id.default_debit_account_id.id),
-                    'amount': float_round(amount, precision_digits=precision),
-                    'partner_id': self.partner_id.id,
-                    'ref': self.name,
-                    }
-        field = currency and 'amount_residual_currency' or 'amount_residual'
-        liquidity_field = currency and 'amount_currency' or amount > 0 and 'debit' or 'credit'
         # Look for structured communication match
         if self.name:
-            sql_query = self._get_common_sql_query() + \
-                " AND aml.ref = %(ref)s AND ("+field+" = %(amount)s OR (acc.internal_type = 'liquidity' AND "+liquidity_field+" = %(amount)s)) \
-                ORDER BY date_maturity asc, aml.id asc"
-            self.env.cr.execute(sql_query, params)
-            match_recs = self.env.cr.dictfetchall()
+            match_recs = [row for row in self._filter_reconciliation_candidates(self._get_amount_candidates(candidates), excluded_ids=candidates['used'])
+                          if row['ref'] == self.name]
             if len(match_recs) > 1:
                 return False
 
         # Look for a single move line with the same partner, the same amount
         if not match_recs:
             if self.partner_id:
-                sql_query = self._get_common_sql_query() + \
-                " AND ("+field+" = %(amount)s OR (acc.internal_type = 'liquidity' AND "+liquidity_field+" = %(amount)s)) \
-                ORDER BY date_maturity asc, aml.id asc"
-                self.env.cr.execute(sql_query, params)
-                match_recs = self.env.cr.dictfetchall()
+                match_recs = self._filter_reconciliation_candidates(self._get_amount_candidates(candidates), excluded_ids=candidates['used'])
                 if len(match_recs) > 1:
                     return False
 
@@ -719,6 +782,7 @@ class AccountBankStatementLine(models.Model):
         try:
             with self._cr.savepoint():
                 counterpart = self.process_reconciliation(counterpart_aml_dicts=counterpart_aml_dicts, payment_aml_rec=payment_aml_rec)
+            candidates['used'].update(match_recs.ids)
             return counterpart
         except UserError:
             # A configuration / business logic error that makes it impossible to auto-reconcile should not be raised
@@ -19,6 +19,8 @@ class AccountMove(models.Model):
     _name = "account.move"
     _description = "Account Entry"
     _order = 'date desc, id desc'
+    # the notes are only fetched when accessed, not with the journal items
+    _prefetch_groups = {'narration': ['narration']}
 
     @api.multi
     @api.depends('name', 'state')
@@ -243,11 +245,14 @@ class AccountMoveLine(models.Model):
         if not cr.fetchone():
             cr.execute('CREATE INDEX account_move_line_partner_id_ref_idx ON account_move_line (partner_id, ref)')
 
-    @api.depends('debit', 'credit', 'amount_currency', 'currency_id', 'matched_debit_ids', 'matched_credit_ids', 'matched_debit_ids.amount', 'matched_credit_ids.amount', 'account_id.currency_id', 'move_id.state')
+    @api.depends('debit', 'credit', 'amount_currency', 'currency_id', 'account_id.currency_id', 'move_id.state')
     def _amount_residual(self):
         """ Computes the residual amount of a move line from a reconciliable account in the company currency and the line's currency.
             This amount will be 0 for fully reconciled lines or lines from a non-reconciliable account, the original line amount
             for unreconciled lines, and something in-between for partially reconciled lines.
+            The partial reconciliations don't trigger this method: they apply their own amount to the stored residuals
+            when they are created or removed (see `account.partial.reconcile._get_residual_deltas` and
+            `_apply_residual_deltas`).
         """
         for line in self:
             if not line.account_id.reconcile:
@@ -1172,6 +1177,66 @@ class AccountMoveLine(models.Model):
     # Misc / utility methods
     ####################################################
 
+    @api.model
+    def _get_residual_drift(self):
+        """ Recompute the residual amounts of all the journal items of reconciliable accounts from their partial
+            reconciliations in a single aggregate query, and return the items whose stored `amount_residual`,
+            `amount_residual_currency` or `reconciled` differ from the expected values, as a list of dicts.
+        """
+        self._cr.execute("""
+            WITH matched AS (
+                SELECT credit_move_id AS line_id, debit_move_id AS counterpart_id, 1 AS sign, amount, amount_currency, currency_id
+                  FROM account_partial_reconcile
+                 UNION ALL
+                SELECT debit_move_id, credit_move_id, -1, amount, amount_currency, currency_id
+                  FROM account_partial_reconcile
+            ), expected AS (
+                SELECT l.id, l.amount_currency, cc.rounding AS company_rounding, lc.rounding AS currency_rounding,
+                       l.balance + COALESCE(SUM(m.sign * m.amount), 0) AS amount_residual,
+                       CASE WHEN l.currency_id IS NULL THEN 0
+                            ELSE CASE WHEN l.balance > 0 OR (l.debit = 0 AND l.credit = 0 AND l.amount_currency > 0) THEN 1 ELSE -1 END
+                                 * ABS(COALESCE(l.amount_currency, 0))
+                                 + COALESCE(SUM(m.sign * CASE
+                                       WHEN m.currency_id = l.currency_id THEN m.amount_currency
+                                       ELSE ROUND(m.amount * CASE WHEN l.balance != 0 AND l.amount_currency != 0
+                                                                  THEN l.amount_currency / l.balance
+                                                                  ELSE COALESCE(r.rate, 1) END
+                                                  / lc.rounding) * lc.rounding
+                                   END), 0)
+                       END AS amount_residual_currency
+                  FROM account_move_line l
+                  JOIN account_account a ON a.id = l.account_id
+                  JOIN res_company c ON c.id = l.company_id
+                  JOIN res_currency cc ON cc.id = c.currency_id
+                  LEFT JOIN res_currency lc ON lc.id = l.currency_id
+                  LEFT JOIN matched m ON m.line_id = l.id
+                  LEFT JOIN account_move_line counterpart ON counterpart.id = m.counterpart_id
+                  LEFT JOIN LATERAL (
+                        SELECT rate FROM res_currency_rate
+                         WHERE currency_id = l.currency_id AND name <= counterpart.date
+                           AND (company_id IS NULL OR company_id = l.company_id)
+                      ORDER BY company_id, name DESC LIMIT 1
+                  ) r ON m.currency_id IS DISTINCT FROM l.currency_id
+                 WHERE a.reconcile
+              GROUP BY l.id, cc.rounding, lc.rounding
+            )
+            SELECT l.id, l.amount_residual, e.amount_residual AS expected_amount_residual,
+                   l.amount_residual_currency, e.amount_residual_currency AS expected_amount_residual_currency,
+                   l.reconciled, e.reconciled AS expected_reconciled
+              FROM (SELECT expected.*,
+                           ABS(amount_residual) < company_rounding / 2
+                           AND (currency_rounding IS NULL OR COALESCE(amount_currency, 0) = 0
+                                OR ABS(amount_residual_currency) < currency_rounding / 2) AS reconciled
+                      FROM expected) e
+              JOIN account_move_line l ON l.id = e.id
+             WHERE ABS(COALESCE(l.amount_residual, 0) - e.amount_residual) >= e.company_rounding / 2
+                OR ABS(COALESCE(l.amount_residual_currency, 0) - e.amount_residual_currency)
+                   >= COALESCE(e.currency_rounding, e.company_rounding) / 2
+                OR COALESCE(l.reconciled, FALSE) != e.reconciled
+          ORDER BY l.id
+        """)
+        return self._cr.dictfetchall()
+
     @api.multi
     @api.depends('ref', 'move_id')
     def name_get(self):
@@ -1352,9 +1417,72 @@ class AccountPartialReconcile(models.Model):
             move.post()
         return line_to_reconcile.id, partial_rec.id
 
+    @api.multi
+    def _get_residual_deltas(self, sign):
+        """ Return the amounts to add to the residuals of the journal items matched by the partial reconciliations of
+            `self`, as a dict {line_id: (amount, amount_currency)}. `sign` is 1 for partials being created and -1 for
+            partials being removed.
+        """
+        deltas = {}
+        for rec in self:
+            #the partial amount is added to the residual of the credit line and subtracted from the one of the debit line
+            for line, counterpart, line_sign in [(rec.credit_move_id, rec.debit_move_id, sign), (rec.debit_move_id, rec.credit_move_id, -sign)]:
+                if not line.account_id.reconcile:
+                    continue
+                amount_currency = 0.0
+                if line.currency_id:
+                    if rec.currency_id and rec.currency_id == line.currency_id:
+                        amount_currency = rec.amount_currency
+                    else:
+                        if line.balance and line.amount_currency:
+                            rate = line.amount_currency / line.balance
+                        else:
+                            rate = line.currency_id.with_context(date=counterpart.date).rate
+                        amount_currency = line.currency_id.round(rec.amount * rate)
+                amount, previous_currency = deltas.get(line.id, (0.0, 0.0))
+                deltas[line.id] = (
+                    line.company_id.currency_id.round(amount + line_sign * rec.amount),
+                    line.currency_id and line.currency_id.round(previous_currency + line_sign * amount_currency) or 0.0,
+                )
+        return deltas
+
+    @api.model
+    def _apply_residual_deltas(self, deltas):
+        """ Add the amounts returned by `_get_residual_deltas` to the stored residuals of the journal items with a
+            single UPDATE, instead of recomputing each item from all its partial reconciliations.
+        """
+        if not deltas:
+            return
+        line_ids = deltas.keys()
+        self._cr.execute("""
+            UPDATE account_move_line l
+               SET amount_residual = n.amount_residual,
+                   amount_residual_currency = n.amount_residual_currency,
+                   reconciled = n.amount_residual = 0
+                                AND (n.currency_id IS NULL OR n.amount_currency = 0 OR n.amount_residual_currency = 0)
+              FROM (SELECT l.id, l.currency_id, COALESCE(l.amount_currency, 0) AS amount_currency,
+                           ROUND((l.amount_residual + d.amount) / cc.rounding) * cc.rounding AS amount_residual,
+                           CASE WHEN lc.id IS NULL THEN 0
+                                ELSE ROUND((COALESCE(l.amount_residual_currency, 0) + d.amount_currency) / lc.rounding) * lc.rounding
+                           END AS amount_residual_currency
+                      FROM (SELECT UNNEST(%s) AS id, UNNEST(%s::numeric[]) AS amount, UNNEST(%s::numeric[]) AS amount_currency) d
+                      JOIN account_move_line l ON l.id = d.id
+                      JOIN res_company c ON c.id = l.company_id
+                      JOIN res_currency cc ON cc.id = c.currency_id
+                      LEFT JOIN res_currency lc ON lc.id = l.currency_id) n
+             WHERE l.id = n.id
+        """, (line_ids, [deltas[line_id][0] for line_id in line_ids], [deltas[line_id][1] for line_id in line_ids]))
+        fnames = ['amount_residual', 'amount_residual_currency', 'reconciled']
+        lines = self.env['account.move.line'].browse(line_ids)
+        lines.invalidate_cache(fnames, line_ids)
+        lines.modified(fnames)
+        if self.env.recompute and self._context.get('recompute', True):
+            self.recompute()
+
     @api.model
     def create(self, vals):
         res = super(AccountPartialReconcile, self).create(vals)
+        self._apply_residual_deltas(res._get_residual_deltas(1))
         if self._context.get('skip_full_reconcile_check'):
             #when running the manual reconciliation wizard, don't check the partials separately for full
             #reconciliation or exchange rate because it is handled manually after the whole processing
@@ -1401,6 +1529,15 @@ class AccountPartialReconcile(models.Model):
             aml_id, partial_rec_id = partial_rec.create_exchange_rate_entry(aml_to_balance, total_debit - total_credit, total_amount_currency, currency, maxdate)
         return res
 
+    @api.multi
+    def write(self, vals):
+        if not set(vals) & set(['debit_move_id', 'credit_move_id', 'amount', 'amount_currency', 'currency_id']):
+            return super(AccountPartialReconcile, self).write(vals)
+        self._apply_residual_deltas(self._get_residual_deltas(-1))
+        res = super(AccountPartialReconcile, self).write(vals)
+        self._apply_residual_deltas(self._get_residual_deltas(1))
+        return res
+
     @api.multi
     def unlink(self):
         """ When removing a link between entries, we need to revert the eventual journal entries we created to book the
@@ -1454,8 +1591,10 @@ class AccountPartialReconcile(models.Model):
                             pairs_to_rec.append(to_rec)
         #make sure that the exchange_rate_entries aren't linked to any partial reconciliation anymore
         exchange_rate_entries.write({'rate_diff_partial_rec_id': False})
+        residual_deltas = to_unlink._get_residual_deltas(-1)
         # the call to super() had to be delayed in order to mark the move lines to reconcile together (to use 'rate_diff_partial_rec_id')
         res = super(AccountPartialReconcile, to_unlink).unlink()
+        self._apply_residual_deltas(residual_deltas)
         # now that the origin currency difference line is not reconciled anymore, we can reconcile it with its reversal entry to cancel it completly
         for to_rec in pairs_to_rec:
             to_rec.reconcile()
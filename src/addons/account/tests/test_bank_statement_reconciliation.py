@@ -19,6 +19,28 @@ class TestBankStatementReconciliation(AccountingTestCase):
         self.assertEqual(len(rec_prop), 1)
         self.assertEqual(rec_prop[0].id, rcv_mv_line.id)
 
+    def test_reconciliation_proposition_batch(self):
+        rcv_mv_line_1 = self.create_invoice(173.39)
+        rcv_mv_line_2 = self.create_invoice(173.39)
+        st_lines = self.bsl_model.browse([self.create_statement_line(173.39).id, self.create_statement_line(173.39).id])
+
+        # a journal item proposed for a statement line is not proposed for the next ones
+        data = st_lines.get_data_for_reconciliation_widget()
+        self.assertEqual([d['st_line']['id'] for d in data], st_lines.ids)
+        self.assertEqual([[p['id'] for p in d['reconciliation_proposition']] for d in data], [[rcv_mv_line_1.id], [rcv_mv_line_2.id]])
+
+    def test_auto_reconcile_batch(self):
+        rcv_mv_line_1 = self.create_invoice(137.21)
+        rcv_mv_line_2 = self.create_invoice(241.53)
+        st_lines = self.bsl_model.browse([self.create_statement_line(241.53).id, self.create_statement_line(137.21).id])
+
+        res = st_lines.reconciliation_widget_auto_reconcile(0)
+        self.assertEqual(res['st_lines_ids'], [])
+        self.assertEqual(res['num_already_reconciled_lines'], 2)
+        self.assertTrue(rcv_mv_line_1.reconciled)
+        self.assertTrue(rcv_mv_line_2.reconciled)
+        self.assertTrue(all(st_line.journal_entry_ids for st_line in st_lines))
+
     def test_full_reconcile(self):
         rcv_mv_line = self.create_invoice(100)
         st_line = self.create_statement_line(100)
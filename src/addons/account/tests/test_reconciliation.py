@@ -406,3 +406,54 @@ class TestReconciliation(AccountingTestCase):
             self.assertTrue(aml.reconciled, 'The journal item should be totally reconciled')
             self.assertEquals(aml.amount_residual, 0, 'The journal item should be totally reconciled')
             self.assertEquals(aml.amount_residual_currency, 0, 'The journal item should be totally reconciled')
+
+    def test_partial_reconcile_residuals(self):
+        invoice = self.create_invoice(invoice_amount=50, currency_id=self.currency_usd_id)
+        receivable = invoice.move_id.line_ids.filtered(lambda l: l.account_id == self.account_rcv)
+        AccountMoveLine = self.env['account.move.line']
+
+        self.make_payment(invoice, self.bank_journal_usd, amount=20)
+        self.assertAlmostEquals(receivable.amount_residual_currency, 30)
+        self.assertAlmostEquals(invoice.residual, 30)
+        self.assertFalse(receivable.reconciled)
+        self.assertEquals(AccountMoveLine._get_residual_drift(), [])
+
+        self.make_payment(invoice, self.bank_journal_usd, amount=30)
+        self.assertEquals(receivable.amount_residual, 0)
+        self.assertEquals(receivable.amount_residual_currency, 0)
+        self.assertTrue(receivable.reconciled)
+        self.assertEquals(invoice.state, 'paid')
+        self.assertEquals(AccountMoveLine._get_residual_drift(), [])
+
+        #removing the partial reconciliations restores the residual amounts
+        receivable.remove_move_reconcile()
+        self.assertEquals(receivable.amount_residual, receivable.balance)
+        self.assertAlmostEquals(receivable.amount_residual_currency, 50)
+        self.assertFalse(receivable.reconciled)
+        self.assertAlmostEquals(invoice.residual, 50)
+        self.assertEquals(AccountMoveLine._get_residual_drift(), [])
+
+    def test_batched_residuals_workflow(self):
+        invoice_a = self.create_invoice(invoice_amount=100, currency_id=self.currency_euro_id)
+        invoice_b = self.create_invoice(invoice_amount=200, currency_id=self.currency_euro_id)
+        invoices = invoice_a | invoice_b
+        self.make_payment(invoice_a, self.bank_journal_euro, amount=100)
+        self.make_payment(invoice_b, self.bank_journal_euro, amount=50)
+        self.assertEquals(invoice_a.state, 'paid')
+        self.assertEquals(invoice_b.state, 'open')
+
+        stepped = []
+
+        def step_workflow(self, cr, uid, ids, context=None):
+            stepped.extend(ids)
+            return step_workflow.origin(self, cr, uid, ids, context=context)
+
+        self.account_invoice_model._patch_method('step_workflow', step_workflow)
+        self.addCleanup(self.account_invoice_model._revert_method, 'step_workflow')
+
+        #the residual amounts of both invoices are recomputed together, with different values
+        self.env.add_todo(self.account_invoice_model._fields['residual'], invoices)
+        self.account_invoice_model.recompute()
+        self.assertEquals(invoice_a.residual, 0)
+        self.assertAlmostEquals(invoice_b.residual, 150)
+        self.assertEquals(sorted(stepped), sorted(invoices.ids), 'The recomputation should trigger the workflow')
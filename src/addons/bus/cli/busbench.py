@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+import openerp
+from openerp.cli import Command
+
+
+class BusBench(Command):
+    """Load-test the longpolling bus dispatcher"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog="%s busbench" % sys.argv[0].split(os.path.sep)[-1],
+            description=self.__doc__,
+            epilog="Other arguments are server options, e.g. -d DATABASE.")
+        parser.add_argument('--pollers', type=int, default=1000,
+                            help="number of concurrent pollers (default 1000)")
+        parser.add_argument('--channels', type=int, default=100,
+                            help="number of channels the pollers listen to (default 100)")
+        parser.add_argument('--messages', type=int, default=1000,
+                            help="number of notifications to send (default 1000)")
+        parser.add_argument('--rate', type=float, default=100,
+                            help="notifications sent per second (default 100)")
+        parser.add_argument('--timeout', type=int, default=5,
+                            help="timeout of a poll in seconds (default 5)")
+        opts, server_args = parser.parse_known_args(args)
+
+        openerp.tools.config.parse_config(server_args)
+        dbname = openerp.tools.config['db_name']
+        if not dbname:
+            sys.exit("busbench: a database is required (-d DATABASE)")
+
+        from openerp.addons.bus.models.bus import ImDispatch
+
+        registry = openerp.modules.registry.RegistryManager.get(dbname)
+        with registry.cursor() as cr:
+            cr.execute("SELECT coalesce(max(id), 0) FROM bus_bus")
+            start_id = cr.fetchone()[0]
+
+        # a dispatcher of our own, started with the configuration above
+        dispatch = ImDispatch().start()
+        time.sleep(1)
+
+        channels = ['busbench.%d' % index for index in xrange(opts.channels)]
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {'polls': 0, 'received': 0, 'latency': 0.0}
+
+        def poller(channel):
+            last = start_id
+            with openerp.api.Environment.manage():
+                while not stop.is_set():
+                    notifications = dispatch.poll(dbname, [channel], last, timeout=opts.timeout)
+                    now = time.time()
+                    with lock:
+                        stats['polls'] += 1
+                        for notif in notifications:
+                            if notif['id'] > 0:
+                                stats['received'] += 1
+                                stats['latency'] += now - notif['message']
+                    last = max([last] + [notif['id'] for notif in notifications])
+
+        threading.stack_size(512 * 1024)
+        threads = [
+            threading.Thread(target=poller, args=(channels[index % len(channels)],))
+            for index in xrange(opts.pollers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        usage0 = resource.getrusage(resource.RUSAGE_SELF)
+        t0 = time.time()
+        with openerp.api.Environment.manage():
+            for index in xrange(opts.messages):
+                with registry.cursor() as cr:
+                    registry['bus.bus'].sendone(cr, openerp.SUPERUSER_ID,
+                                                random.choice(channels), time.time())
+                time.sleep(max(0, t0 + (index + 1) / opts.rate - time.time()))
+
+        # let the pollers get the last notifications
+        time.sleep(opts.timeout)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - t0
+        usage1 = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (usage1.ru_utime + usage1.ru_stime) - (usage0.ru_utime + usage0.ru_stime)
+
+        with registry.cursor() as cr:
+            cr.execute("DELETE FROM bus_bus WHERE id > %s AND channel LIKE %s", [start_id, '"busbench.%'])
+
+        expected = opts.messages * opts.pollers / float(len(channels))
+        print "%d pollers on %d channels, %d notifications sent in %.1fs" % (
+            opts.pollers, len(channels), opts.messages, elapsed)
+        print "received %d/%d notifications, average latency %.1fms" % (
+            stats['received'], expected, 1000 * stats['latency'] / (stats['received'] or 1))
+        print "%d polls: %d answered from the buffer, %d from the database" % (
+            stats['polls'], dispatch.stats['buffer'], dispatch.stats['database'])
+        print "cpu time %.2fs (%.1f%% of one core)" % (cpu, 100 * cpu / elapsed)
+        return 0
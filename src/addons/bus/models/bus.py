@@ -6,6 +6,7 @@ import random
 import select
 import threading
 import time
+from collections import OrderedDict, deque
 
 import openerp
 from openerp import api, fields, models
@@ -16,6 +17,15 @@ _logger = logging.getLogger(__name__)
 # longpolling timeout connection
 TIMEOUT = 50
 
+# maximum size of a NOTIFY payload (postgres' limit is 8000 bytes)
+NOTIFY_PAYLOAD_MAX = 7900
+
+# number of notifications kept in memory per channel by the dispatcher
+BUFFER_SIZE = 64
+
+# number of channels kept in memory by the dispatcher
+BUFFER_CHANNELS = 4096
+
 #----------------------------------------------------------
 # Bus
 #----------------------------------------------------------
@@ -44,27 +54,62 @@ class ImBus(models.Model):
 
     @api.model
     def sendmany(self, notifications):
-        channels = set()
-        for channel, message in notifications:
-            channels.add(channel)
-            values = {
-                "channel": json_dump(channel),
-                "message": json_dump(message)
-            }
-            self.sudo().create(values)
-            if random.random() < 0.01:
-                self.gc()
+        """ Store the notifications ``[[channel, message]]``, and notify the
+            dispatcher once the transaction is committed. The notifications
+            are inserted at once, with ids allocated in their order.
+        """
+        channels = [json_dump(channel) for channel, message in notifications]
+        messages = [json_dump(message) for channel, message in notifications]
+        entries = []
         if channels:
+            cr = self._cr
+            cr.execute("SELECT nextval('bus_bus_id_seq') FROM generate_series(1, %s)", (len(channels),))
+            ids = sorted(row[0] for row in cr.fetchall())
+            cr.execute("""INSERT INTO bus_bus (id, channel, message, create_uid, write_uid, create_date, write_date)
+                          SELECT unnest(%s), unnest(%s), unnest(%s), %s, %s,
+                                 now() at time zone 'UTC', now() at time zone 'UTC'""",
+                       (ids, channels, messages, openerp.SUPERUSER_ID, openerp.SUPERUSER_ID))
+            entries = [list(entry) for entry in zip(ids, channels, messages)]
+            if random.random() < 0.01 * len(entries):
+                self.gc()
+        if entries:
             # We have to wait until the notifications are commited in database.
-            # When calling `NOTIFY imbus`, some concurrent threads will be
-            # awakened and will fetch the notification in the bus table. If the
-            # transaction is not commited yet, there will be nothing to fetch,
-            # and the longpolling will return no notification.
+            # When calling `NOTIFY imbus`, the dispatcher will be awakened and
+            # may fetch the notifications in the bus table. If the transaction
+            # is not commited yet, there will be nothing to fetch, and the
+            # longpolling will return no notification.
+            payloads = self._notify_payloads(entries)
             def notify():
                 with openerp.sql_db.db_connect('postgres').cursor() as cr:
-                    cr.execute("notify imbus, %s", (json_dump(list(channels)),))
+                    for payload in payloads:
+                        cr.execute("notify imbus, %s", (payload,))
             self._cr.after('commit', notify)
 
+    @api.model
+    def _notify_payloads(self, entries):
+        """ Return the payloads of the NOTIFY commands for the given entries
+            ``[id, channel, message]``, with channel and message in json. A
+            payload is a json object with the database name and the entries;
+            the messages that do not fit in a payload are replaced by null, and
+            the dispatcher reads them from the database.
+        """
+        head = '{"db":%s,"notifications":[' % json_dump(self._cr.dbname)
+        payloads = []
+        items = []
+        size = len(head) + 2
+        for id_, channel, message in entries:
+            item = '[%d,%s,%s]' % (id_, channel, message)
+            if len(head) + len(item) + 2 > NOTIFY_PAYLOAD_MAX:
+                item = '[%d,%s,null]' % (id_, channel)
+            if items and size + len(item) + 1 > NOTIFY_PAYLOAD_MAX:
+                payloads.append(head + ','.join(items) + ']}')
+                items, size = [], len(head) + 2
+            items.append(item)
+            size += len(item) + 1
+        if items:
+            payloads.append(head + ','.join(items) + ']}')
+        return payloads
+
     @api.model
     def sendone(self, channel, message):
         self.sendmany([[channel, message]])
@@ -90,7 +135,13 @@ class ImBus(models.Model):
                 'channel': json.loads(notif['channel']),
                 'message': json.loads(notif['message']),
             })
+        return self._poll_presence(result, options, force_status)
 
+    @api.model
+    def _poll_presence(self, result, options, force_status=False):
+        """ Complete the result of a poll with the presence of the partners
+            given in ``options``.
+        """
         if result or force_status:
             partner_ids = options.get('bus_presence_partner_ids')
             if partner_ids:
@@ -105,9 +156,98 @@ class ImBus(models.Model):
 #----------------------------------------------------------
 # Dispatcher
 #----------------------------------------------------------
+class ImBuffer(object):
+    """ The recent notifications received by the dispatcher, per database and
+        channel. It answers the polls that only need notifications received
+        since the dispatcher started listening. The least recently notified
+        channels are evicted when there are more than ``channels`` of them.
+    """
+    def __init__(self, size=BUFFER_SIZE, channels=BUFFER_CHANNELS):
+        self.size = size
+        self.channels = channels
+        # {(dbname, channel): deque([(id, channel, message), ...])}, ordered
+        # from the least to the most recently notified channel
+        self.notifications = OrderedDict()
+        # {(dbname, channel): greatest id dropped from the buffer}
+        self.dropped = {}
+        # {dbname: greatest id dropped from the evicted channels}
+        self.evicted = {}
+        # {dbname: first id received}
+        self.first = {}
+
+    def add(self, dbname, id_, channel, message):
+        """ Add a notification, with its decoded channel and message. """
+        self.first.setdefault(dbname, id_)
+        key = (dbname, hashable(channel))
+        queue = self.notifications.pop(key, None)
+        if queue is None:
+            queue = deque(maxlen=self.size)
+        elif len(queue) == queue.maxlen:
+            self.drop(key, queue[0][0])
+        self.notifications[key] = queue
+        queue.append((id_, channel, message))
+        while len(self.notifications) > self.channels:
+            self.evict()
+
+    def drop(self, key, id_):
+        """ Mark the notifications of ``key`` up to ``id_`` as missing. """
+        self.dropped[key] = max(self.dropped.get(key, 0), id_)
+
+    def evict(self):
+        """ Remove the least recently notified channel from the buffer. A
+            channel may be notified again afterwards, so the notifications of
+            its database up to the evicted ones are considered as missing.
+        """
+        key, queue = self.notifications.popitem(last=False)
+        dbname = key[0]
+        id_ = max(queue[-1][0] if queue else 0, self.dropped.pop(key, 0))
+        self.evicted[dbname] = max(self.evicted.get(dbname, 0), id_)
+
+    def fetch(self, dbname, channels, last):
+        """ Return the notifications after ``last`` on ``channels``, or
+            ``None`` if the buffer may not have all of them.
+        """
+        if not last or last < self.first.get(dbname, last + 1):
+            return None
+        if last < self.evicted.get(dbname, 0):
+            return None
+        result = []
+        for channel in channels:
+            key = (dbname, hashable(channel))
+            if last < self.dropped.get(key, 0):
+                return None
+            result.extend(
+                {'id': id_, 'channel': channel, 'message': message}
+                # copy the queue, as the dispatcher may modify it meanwhile
+                for id_, channel, message in tuple(self.notifications.get(key, ()))
+                if id_ > last
+            )
+        result.sort(key=lambda notif: notif['id'])
+        return result
+
+
 class ImDispatch(object):
     def __init__(self):
         self.channels = {}
+        self.buffer = ImBuffer()
+        # number of polls answered from the buffer or the database
+        self.stats = {'buffer': 0, 'database': 0}
+
+    def _poll(self, registry, channels, last, options, force_status=False):
+        """ Return the notifications after ``last``, from the buffer if
+            possible, or from the database.
+        """
+        notifications = self.buffer.fetch(registry.db_name, channels, last)
+        if notifications is None:
+            self.stats['database'] += 1
+            with registry.cursor() as cr:
+                return registry['bus.bus'].poll(cr, openerp.SUPERUSER_ID, channels, last, options, force_status)
+        self.stats['buffer'] += 1
+        if (notifications or force_status) and options.get('bus_presence_partner_ids'):
+            with registry.cursor() as cr:
+                notifications = registry['bus.bus']._poll_presence(
+                    cr, openerp.SUPERUSER_ID, notifications, options, force_status)
+        return notifications
 
     def poll(self, dbname, channels, last, options=None, timeout=TIMEOUT):
         if options is None:
@@ -124,8 +264,7 @@ class ImDispatch(object):
         registry = openerp.registry(dbname)
 
         # immediatly returns if past notifications exist
-        with registry.cursor() as cr:
-            notifications = registry['bus.bus'].poll(cr, openerp.SUPERUSER_ID, channels, last, options)
+        notifications = self._poll(registry, channels, last, options)
         # or wait for future ones
         if not notifications:
             event = self.Event()
@@ -133,13 +272,42 @@ class ImDispatch(object):
                 self.channels.setdefault(hashable(channel), []).append(event)
             try:
                 event.wait(timeout=timeout)
-                with registry.cursor() as cr:
-                    notifications = registry['bus.bus'].poll(cr, openerp.SUPERUSER_ID, channels, last, options, force_status=True)
+                notifications = self._poll(registry, channels, last, options, force_status=True)
             except Exception:
                 # timeout
                 pass
         return notifications
 
+    def _fetch_messages(self, dbname, entries):
+        """ Read the messages that did not fit in the NOTIFY payload. """
+        missing = [entry for entry in entries if entry[2] is None]
+        if missing:
+            with openerp.sql_db.db_connect(dbname).cursor() as cr:
+                cr.execute("SELECT id, message FROM bus_bus WHERE id IN %s",
+                           [tuple(entry[0] for entry in missing)])
+                messages = dict(cr.fetchall())
+            for entry in missing:
+                entry[2] = json.loads(messages.get(entry[0], 'null'))
+
+    def dispatch(self, payload):
+        """ Decode a NOTIFY payload, add its notifications to the buffer, and
+            return the channels to awake.
+        """
+        payload = json.loads(payload)
+        dbname, entries = payload['db'], payload['notifications']
+        try:
+            self._fetch_messages(dbname, entries)
+        except Exception:
+            # without their messages, the notifications must be polled from
+            # the database: consider them as dropped from the buffer
+            _logger.exception("Bus.loop cannot read notifications in %s", dbname)
+            for id_, channel, message in entries:
+                self.buffer.drop((dbname, hashable(channel)), id_)
+            return [channel for id_, channel, message in entries]
+        for id_, channel, message in entries:
+            self.buffer.add(dbname, id_, channel, message)
+        return [channel for id_, channel, message in entries]
+
     def loop(self):
         """ Dispatch postgres notifications to the relevant polling threads/greenlets """
         _logger.info("Bus.loop listen imbus on db postgres")
@@ -147,6 +315,8 @@ class ImDispatch(object):
             conn = cr._cnx
             cr.execute("listen imbus")
             cr.commit();
+            # the buffer only contains what is received while listening
+            self.buffer = ImBuffer()
             while True:
                 if select.select([conn], [], [], TIMEOUT) == ([], [], []):
                     pass
@@ -154,7 +324,11 @@ class ImDispatch(object):
                     conn.poll()
                     channels = []
                     while conn.notifies:
-                        channels.extend(json.loads(conn.notifies.pop().payload))
+                        payload = conn.notifies.pop(0).payload
+                        try:
+                            channels.extend(self.dispatch(payload))
+                        except Exception:
+                            _logger.exception("Bus.loop invalid notification: %s", payload)
                     # dispatch to local threads/greenlets
                     events = set()
                     for channel in channels:
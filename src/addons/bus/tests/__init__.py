@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+import test_bus_buffer
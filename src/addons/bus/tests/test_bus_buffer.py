@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from openerp.addons.bus.models.bus import ImBuffer
+
+
+class TestBusBuffer(unittest.TestCase):
+
+    def test_fetch(self):
+        """ The buffer answers the polls after its first notification. """
+        buf = ImBuffer()
+        buf.add('db', 10, ['db', 'a'], 'a1')
+        buf.add('db', 11, ['db', 'b'], 'b1')
+        buf.add('db', 12, ['db', 'a'], 'a2')
+        buf.add('other', 13, ['db', 'a'], 'x')
+
+        self.assertIsNone(buf.fetch('db', [['db', 'a']], 0))
+        self.assertIsNone(buf.fetch('db', [['db', 'a']], 9))
+        self.assertEqual(buf.fetch('db', [['db', 'a']], 10), [
+            {'id': 12, 'channel': ['db', 'a'], 'message': 'a2'},
+        ])
+        self.assertEqual([n['id'] for n in buf.fetch('db', [['db', 'a'], ['db', 'b']], 10)], [11, 12])
+        self.assertEqual(buf.fetch('db', [['db', 'c']], 10), [])
+
+    def test_drop(self):
+        """ The polls that need dropped notifications are not answered. """
+        buf = ImBuffer(size=2)
+        buf.add('db', 9, 'b', 0)
+        buf.add('db', 10, 'a', 1)
+        buf.add('db', 11, 'a', 2)
+        buf.add('db', 12, 'a', 3)
+        self.assertIsNone(buf.fetch('db', ['a'], 9))
+        self.assertIsNone(buf.fetch('db', ['a', 'b'], 9))
+        self.assertEqual([n['id'] for n in buf.fetch('db', ['a'], 10)], [11, 12])
+        self.assertEqual(buf.fetch('db', ['b'], 9), [])
+
+        buf.drop(('db', 'b'), 14)
+        self.assertIsNone(buf.fetch('db', ['b'], 13))
+        self.assertEqual(buf.fetch('db', ['a'], 13), [])
+
+    def test_evict(self):
+        """ The least recently notified channels are evicted. """
+        buf = ImBuffer(channels=2)
+        buf.add('db', 10, 'a', 1)
+        buf.add('db', 11, 'b', 2)
+        buf.add('db', 12, 'a', 3)
+        buf.add('db', 13, 'c', 4)
+        self.assertEqual(len(buf.notifications), 2)
+        self.assertNotIn(('db', 'b'), buf.notifications)
+        self.assertNotIn(('db', 'b'), buf.dropped)
+
+        # the notifications of 'b' are gone, and so may be those of any
+        # channel of the database up to them
+        self.assertIsNone(buf.fetch('db', ['b'], 10))
+        self.assertIsNone(buf.fetch('db', ['a'], 10))
+        self.assertEqual(buf.fetch('db', ['b'], 11), [])
+        self.assertEqual([n['id'] for n in buf.fetch('db', ['a', 'c'], 11)], [12, 13])
+
+        # eviction also forgets the dropped notifications of the channel
+        buf = ImBuffer(size=1, channels=1)
+        buf.add('db', 10, 'a', 1)
+        buf.add('db', 11, 'a', 2)
+        buf.add('db', 12, 'b', 3)
+        self.assertEqual(buf.dropped, {})
+        self.assertEqual(buf.evicted, {'db': 11})
+        self.assertIsNone(buf.fetch('db', ['b'], 10))
+        self.assertEqual(buf.fetch('db', ['b'], 11), [{'id': 12, 'channel': 'b', 'message': 3}])
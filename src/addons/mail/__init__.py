@@ -3,3 +3,4 @@
 import models
 import wizard
 import controllers
+import cli
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncore
+import os
+import smtpd
+import sys
+import threading
+import time
+
+import openerp
+from openerp.cli import Command
+
+
+class CountingSMTPServer(smtpd.SMTPServer):
+    """ A local SMTP server that drops the messages it receives. """
+
+    def __init__(self, localaddr):
+        smtpd.SMTPServer.__init__(self, localaddr, None)
+        self.messages = 0
+        self.connections = 0
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages += 1
+
+
+class MailBench(Command):
+    """Measure the throughput of the outgoing mail queue"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog="%s mailbench" % sys.argv[0].split(os.path.sep)[-1],
+            description=self.__doc__,
+            epilog="Other arguments are server options, e.g. -d DATABASE.")
+        parser.add_argument('--mails', type=int, default=1000,
+                            help="number of mails to send (default 1000)")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="number of mails per batch (default 100)")
+        parser.add_argument('--threads', type=int, default=1,
+                            help="number of sending threads (default 1)")
+        parser.add_argument('--port', type=int, default=8025,
+                            help="port of the local SMTP server (default 8025)")
+        opts, server_args = parser.parse_known_args(args)
+
+        openerp.tools.config.parse_config(server_args)
+        dbname = openerp.tools.config['db_name']
+        if not dbname:
+            sys.exit("mailbench: a database is required (-d DATABASE)")
+
+        smtp = CountingSMTPServer(('127.0.0.1', opts.port))
+        loop = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+        loop.daemon = True
+        loop.start()
+
+        registry = openerp.modules.registry.RegistryManager.get(dbname)
+        with openerp.api.Environment.manage():
+            with registry.cursor() as cr:
+                env = openerp.api.Environment(cr, openerp.SUPERUSER_ID, {})
+                IrConfig = env['ir.config_parameter']
+                params = dict((key, IrConfig.get_param(key)) for key in ('mail.send.batch_size', 'mail.send.threads'))
+                IrConfig.set_param('mail.send.batch_size', str(opts.batch_size))
+                IrConfig.set_param('mail.send.threads', str(opts.threads))
+                server = env['ir.mail_server'].create({
+                    'name': 'mailbench', 'smtp_host': '127.0.0.1', 'smtp_port': opts.port,
+                })
+                mails = env['mail.mail']
+                for index in xrange(opts.mails):
+                    mails |= mails.create({
+                        'subject': 'mailbench %d' % index,
+                        'body_html': '<p>mailbench</p>',
+                        'email_from': 'mailbench@example.com',
+                        'email_to': 'mailbench%d@example.com' % index,
+                        'mail_server_id': server.id,
+                        'auto_delete': False,
+                    })
+                mail_ids = mails.ids
+                cr.commit()
+
+                t0 = time.time()
+                env['mail.mail'].browse(mail_ids).send(auto_commit=True)
+                elapsed = time.time() - t0
+
+                env.invalidate_all()
+                cr.execute("SELECT count(*) FROM mail_mail WHERE id IN %s AND state='sent'", (tuple(mail_ids),))
+                sent = cr.fetchone()[0]
+                env['mail.mail'].browse(mail_ids).unlink()
+                server.unlink()
+                for key, value in params.iteritems():
+                    IrConfig.set_param(key, value or False)
+
+        smtp.close()
+        print "%d/%d mails sent in %.2fs by batches of %d with %d thread(s): %.1f mails/s" % (
+            sent, opts.mails, elapsed, opts.batch_size, opts.threads, sent / elapsed)
+        print "the SMTP server received %d messages through %d connections" % (
+            smtp.messages, smtp.connections)
+        return 0
@@ -2,10 +2,14 @@
 
 import base64
 import logging
+import Queue
+import threading
+from collections import defaultdict
 from email.utils import formataddr
 
 import psycopg2
 
+import openerp
 from openerp import _, api, fields, models
 from openerp import tools
 from openerp.addons.base.ir.ir_mail_server import MailDeliveryException
@@ -184,30 +188,148 @@ class MailMail(models.Model):
             that fail to be deliver are marked as 'exception', and the
             corresponding error mail is output in the server logs.
 
+            The emails are processed by batches of ``mail.send.batch_size``
+            emails (system parameter, 100 by default): the data they need is
+            read once per batch, their states are written in bulk, and the
+            SMTP connection to each mail server is reused for all of them.
+            With ``auto_commit``, the batches are processed by as many threads
+            as given by the system parameter ``mail.send.threads``, each with
+            its own cursor and SMTP connections.
+
             :param bool auto_commit: whether to force a commit of the mail status
                 after sending each mail (meant only for scheduler processing);
                 should never be True during normal transactions (default: False)
             :param bool raise_exception: whether to raise an exception if the
-                email sending process has failed
+                email sending process has failed; the emails are then sent
+                one by one, as the first failure stops the process
             :return: True
         """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        batch_size = 1 if raise_exception else max(int(get_param('mail.send.batch_size', 100)), 1)
+        batches = [self.ids[index:index + batch_size] for index in xrange(0, len(self.ids), batch_size)]
+
+        threads = int(get_param('mail.send.threads', 1)) if auto_commit is True else 1
+        if threads > 1 and len(batches) > 1 and not getattr(threading.currentThread(), 'testing', False):
+            # the threads must see the mails to send
+            self._cr.commit()
+            self._send_threaded(batches, threads)
+            return True
+
+        smtp_sessions = {}
+        try:
+            for batch_ids in batches:
+                self.browse(batch_ids)._send(smtp_sessions, auto_commit=auto_commit is True,
+                                             raise_exception=raise_exception)
+                if auto_commit is True:
+                    self._cr.commit()
+        finally:
+            self._close_smtp_sessions(smtp_sessions)
+        return True
+
+    @api.model
+    def _send_threaded(self, batches, threads):
+        """ Send the mails of ``batches`` (a list of lists of ids) with
+            ``threads`` threads, committing after each mail.
+        """
+        queue = Queue.Queue()
+        for batch_ids in batches:
+            queue.put(batch_ids)
+        dbname, uid, context = self._cr.dbname, self._uid, self._context
+
+        def worker():
+            registry = openerp.registry(dbname)
+            smtp_sessions = {}
+            with api.Environment.manage():
+                try:
+                    while True:
+                        try:
+                            batch_ids = queue.get_nowait()
+                        except Queue.Empty:
+                            break
+                        try:
+                            with registry.cursor() as cr:
+                                env = api.Environment(cr, uid, context)
+                                env['mail.mail'].browse(batch_ids)._send(smtp_sessions, auto_commit=True)
+                        except Exception:
+                            _logger.exception("Failed processing mails %s", batch_ids)
+                            self._close_smtp_sessions(smtp_sessions)
+                finally:
+                    self._close_smtp_sessions(smtp_sessions)
+
+        workers = [
+            threading.Thread(target=worker, name="%s.send%d" % (__name__, index))
+            for index in xrange(min(threads, len(batches)))
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    @api.model
+    def _get_smtp_session(self, smtp_sessions, mail_server_id):
+        """ Return the SMTP connection to the mail server ``mail_server_id``
+            in ``smtp_sessions``, opening it if necessary. A connection that
+            was already open is checked first, as the server may have closed
+            it since it was last used.
+        """
+        smtp_session = smtp_sessions.get(mail_server_id)
+        if smtp_session is not None:
+            try:
+                alive = smtp_session.noop()[0] == 250
+            except Exception:
+                alive = False
+            if not alive:
+                self._close_smtp_sessions(smtp_sessions, mail_server_id)
+        if mail_server_id not in smtp_sessions:
+            smtp_sessions[mail_server_id] = self.env['ir.mail_server'].connect_server(mail_server_id)
+        return smtp_sessions[mail_server_id]
+
+    @api.model
+    def _close_smtp_sessions(self, smtp_sessions, mail_server_id=None):
+        """ Close the SMTP connections in ``smtp_sessions``, or only the one
+            to ``mail_server_id`` if given.
+        """
+        keys = [mail_server_id] if mail_server_id is not None else list(smtp_sessions)
+        for key in keys:
+            smtp_session = smtp_sessions.pop(key, None)
+            try:
+                if smtp_session is not None:
+                    smtp_session.quit()
+            except Exception:
+                # the connection may already be closed
+                pass
+
+    @api.multi
+    def _send(self, smtp_sessions, auto_commit=False, raise_exception=False):
+        """ Send a batch of mails, through the SMTP connections of
+            ``smtp_sessions`` (a dict associating mail server ids to
+            connections), and update their states. With ``auto_commit``, the
+            state of each mail is committed as soon as it is delivered.
+        """
         IrMailServer = self.env['ir.mail_server']
 
+        # data shared by the mails of the batch
+        # TDE note: remove me when model_id field is present on mail.message
+        model_names = dict(
+            (model.model, model.name)
+            for model in self.env['ir.model'].sudo().search([('model', 'in', filter(None, set(self.mapped('model'))))])
+        )
+        bounce_alias = self.env['ir.config_parameter'].get_param("mail.bounce.alias")
+        catchall_domain = self.env['ir.config_parameter'].get_param("mail.catchall.domain")
+        # load attachment binary data with a separate read(), as prefetching all
+        # `datas` (binary field) could bloat the browse cache, triggerring
+        # soft/hard mem limits with temporary data.
+        attachments = dict(
+            (a['id'], (a['datas_fname'], base64.b64decode(a['datas'])))
+            for a in self.mapped('attachment_ids').sudo().read(['datas_fname', 'datas'])
+        )
+
+        prepared = []                       # [(mail, email messages)]
+        failures = defaultdict(list)        # {failure reason: mail ids}
         for mail in self:
             try:
-                # TDE note: remove me when model_id field is present on mail.message - done here to avoid doing it multiple times in the sub method
-                if mail.model:
-                    model = self.env['ir.model'].sudo().search([('model', '=', mail.model)])[0]
-                else:
-                    model = None
-                if model:
-                    mail = mail.with_context(model_name=model.name)
-
-                # load attachment binary data with a separate read(), as prefetching all
-                # `datas` (binary field) could bloat the browse cache, triggerring
-                # soft/hard mem limits with temporary data.
-                attachments = [(a['datas_fname'], base64.b64decode(a['datas']))
-                               for a in mail.attachment_ids.sudo().read(['datas_fname', 'datas'])]
+                if mail.model in model_names:
+                    mail = mail.with_context(model_name=model_names[mail.model])
 
                 # specific behavior to customize the send email for notified partners
                 email_list = []
@@ -218,8 +340,6 @@ class MailMail(models.Model):
 
                 # headers
                 headers = {}
-                bounce_alias = self.env['ir.config_parameter'].get_param("mail.bounce.alias")
-                catchall_domain = self.env['ir.config_parameter'].get_param("mail.catchall.domain")
                 if bounce_alias and catchall_domain:
                     if mail.model and mail.res_id:
                         headers['Return-Path'] = '%s-%d-%s-%d@%s' % (bounce_alias, mail.id, mail.model, mail.res_id, catchall_domain)
@@ -231,19 +351,10 @@ class MailMail(models.Model):
                     except Exception:
                         pass
 
-                # Writing on the mail object may fail (e.g. lock on user) which
-                # would trigger a rollback *after* actually sending the email.
-                # To avoid sending twice the same email, provoke the failure earlier
-                mail.write({
-                    'state': 'exception',
-                    'failure_reason': _('Error without exception. Probably due do sending an email without computed recipients.'),
-                })
-                mail_sent = False
-
-                # build an RFC2822 email.message.Message object and send it without queuing
-                res = None
-                for email in email_list:
-                    msg = IrMailServer.build_email(
+                # build RFC2822 email.message.Message objects
+                mail_attachments = [attachments[attachment_id] for attachment_id in mail.attachment_ids.ids]
+                messages = [
+                    IrMailServer.build_email(
                         email_from=mail.email_from,
                         email_to=email.get('email_to'),
                         subject=mail.subject,
@@ -251,15 +362,41 @@ class MailMail(models.Model):
                         body_alternative=email.get('body_alternative'),
                         email_cc=tools.email_split(mail.email_cc),
                         reply_to=mail.reply_to,
-                        attachments=attachments,
+                        attachments=mail_attachments,
                         message_id=mail.message_id,
                         references=mail.references,
                         object_id=mail.res_id and ('%s-%s' % (mail.res_id, mail.model)),
                         subtype='html',
                         subtype_alternative='plain',
                         headers=headers)
+                    for email in email_list
+                ]
+                prepared.append((mail, messages))
+            except Exception as e:
+                self._send_failed(mail, e, failures, raise_exception)
+
+        # Writing on the mail object may fail (e.g. lock on user) which
+        # would trigger a rollback *after* actually sending the email.
+        # To avoid sending twice the same email, provoke the failure earlier.
+        # With auto_commit, this is done for each mail, as the state of the
+        # mails that are not sent yet must not be committed.
+        unsent_values = {
+            'state': 'exception',
+            'failure_reason': _('Error without exception. Probably due do sending an email without computed recipients.'),
+        }
+        if not auto_commit:
+            self.browse([mail.id for mail, messages in prepared]).write(unsent_values)
+
+        # send the messages without queuing
+        sent = []                           # [(mail, Message-Id)]
+        for mail, messages in prepared:
+            try:
+                if auto_commit:
+                    mail.write(unsent_values)
+                res = None
+                for msg in messages:
                     try:
-                        res = IrMailServer.send_email(msg, mail_server_id=mail.mail_server_id.id)
+                        res = self._send_message(msg, mail.mail_server_id.id, smtp_sessions)
                     except AssertionError as error:
                         if error.message == IrMailServer.NO_VALID_RECIPIENT:
                             # No valid recipient found for this particular
@@ -267,44 +404,80 @@ class MailMail(models.Model):
                             # delivery to next recipients, if any. If this is
                             # the only recipient, the mail will show as failed.
                             _logger.info("Ignoring invalid recipients for mail.mail %s: %s",
-                                         mail.message_id, email.get('email_to'))
+                                         mail.message_id, msg['To'])
                         else:
                             raise
-                if res:
-                    mail.write({'state': 'sent', 'message_id': res, 'failure_reason': False})
-                    mail_sent = True
-
-                # /!\ can't use mail.state here, as mail.refresh() will cause an error
-                # see revid:odo@openerp.com-20120622152536-42b2s28lvdv3odyr in 6.1
-                if mail_sent:
-                    _logger.info('Mail with ID %r and Message-Id %r successfully sent', mail.id, mail.message_id)
-                mail._postprocess_sent_message_v9(mail_sent=mail_sent)
-            except MemoryError:
-                # prevent catching transient MemoryErrors, bubble up to notify user or abort cron job
-                # instead of marking the mail as failed
-                _logger.exception(
-                    'MemoryError while processing mail with ID %r and Msg-Id %r. Consider raising the --limit-memory-hard startup option',
-                    mail.id, mail.message_id)
-                raise
-            except psycopg2.Error:
-                # If an error with the database occurs, chances are that the cursor is unusable.
-                # This will lead to an `psycopg2.InternalError` being raised when trying to write
-                # `state`, shadowing the original exception and forbid a retry on concurrent
-                # update. Let's bubble it.
-                raise
             except Exception as e:
-                failure_reason = tools.ustr(e)
-                _logger.exception('failed sending mail (id: %s) due to %s', mail.id, failure_reason)
-                mail.write({'state': 'exception', 'failure_reason': failure_reason})
-                mail._postprocess_sent_message_v9(mail_sent=False)
-                if raise_exception:
-                    if isinstance(e, AssertionError):
-                        # get the args of the original error, wrap into a value and throw a MailDeliveryException
-                        # that is an except_orm, with name and value as arguments
-                        value = '. '.join(e.args)
-                        raise MailDeliveryException(_("Mail Delivery Failed"), value)
-                    raise
-
-            if auto_commit is True:
-                self._cr.commit()
-        return True
+                self._send_failed(mail, e, failures, raise_exception)
+                continue
+            if res:
+                sent.append((mail, res))
+                if auto_commit:
+                    # a failure after this point must not roll back the state
+                    # of a delivered mail, which would send it again
+                    values = {'state': 'sent', 'failure_reason': False}
+                    if res != mail.message_id:
+                        values['message_id'] = res
+                    mail.write(values)
+                    self._cr.commit()
+
+        # update the states in bulk
+        sent_mails = self.browse([mail.id for mail, res in sent])
+        if not auto_commit:
+            for mail, res in sent:
+                if res != mail.message_id:
+                    mail.write({'message_id': res})
+            sent_mails.write({'state': 'sent', 'failure_reason': False})
+        for failure_reason, mail_ids in failures.iteritems():
+            self.browse(mail_ids).write({'state': 'exception', 'failure_reason': failure_reason})
+        for mail in sent_mails:
+            _logger.info('Mail with ID %r and Message-Id %r successfully sent', mail.id, mail.message_id)
+        (self - sent_mails)._postprocess_sent_message_v9(mail_sent=False)
+        sent_mails._postprocess_sent_message_v9(mail_sent=True)
+
+    @api.model
+    def _send_message(self, message, mail_server_id, smtp_sessions):
+        """ Send ``message`` through the connection to ``mail_server_id`` in
+            ``smtp_sessions``. A connection that fails is closed, and the
+            next message is sent through a new one. The message itself is
+            not sent again, as the server may have accepted it before the
+            failure.
+        """
+        IrMailServer = self.env['ir.mail_server']
+        smtp_session = self._get_smtp_session(smtp_sessions, mail_server_id)
+        try:
+            return IrMailServer.send_email(message, mail_server_id=mail_server_id, smtp_session=smtp_session)
+        except MailDeliveryException:
+            self._close_smtp_sessions(smtp_sessions, mail_server_id)
+            raise
+
+    @api.model
+    def _send_failed(self, mail, error, failures, raise_exception):
+        """ Record the failure of ``mail`` in ``failures``; this must be
+            called while handling the exception ``error``.
+        """
+        if isinstance(error, MemoryError):
+            # prevent catching transient MemoryErrors, bubble up to notify user or abort cron job
+            # instead of marking the mail as failed
+            _logger.exception(
+                'MemoryError while processing mail with ID %r and Msg-Id %r. Consider raising the --limit-memory-hard startup option',
+                mail.id, mail.message_id)
+            raise
+        if isinstance(error, psycopg2.Error):
+            # If an error with the database occurs, chances are that the cursor is unusable.
+            # This will lead to an `psycopg2.InternalError` being raised when trying to write
+            # `state`, shadowing the original exception and forbid a retry on concurrent
+            # update. Let's bubble it.
+            raise
+        failure_reason = tools.ustr(error)
+        _logger.exception('failed sending mail (id: %s) due to %s', mail.id, failure_reason)
+        if raise_exception:
+            mail.write({'state': 'exception', 'failure_reason': failure_reason})
+            mail._postprocess_sent_message_v9(mail_sent=False)
+            if isinstance(error, AssertionError):
+                # get the args of the original error, wrap into a value and throw a MailDeliveryException
+                # that is an except_orm, with name and value as arguments
+                value = '. '.join(error.args)
+                raise MailDeliveryException(_("Mail Delivery Failed"), value)
+            raise
+        failures[failure_reason].append(mail.id)
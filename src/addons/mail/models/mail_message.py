@@ -895,6 +895,37 @@ class Message(models.Model):
     # Messaging API
     #------------------------------------------------------
 
+    @api.multi
+    def _notify_get_followers(self, group_id=None):
+        """ Return the ids of the partners and of the channels following the
+        document of the message with its subtype, as a pair of lists. With
+        ``group_id``, the partners are restricted to the ones whose user
+        belongs to that group. """
+        self.ensure_one()
+        query = """
+            SELECT DISTINCT f.partner_id, f.channel_id
+            FROM mail_followers f
+            JOIN mail_followers_mail_message_subtype_rel rel ON (rel.mail_followers_id = f.id)
+            WHERE f.res_model = %s AND f.res_id = %s AND rel.mail_message_subtype_id = %s
+        """
+        params = [self.model, self.res_id, self.sudo().subtype_id.id]
+        if group_id:
+            query += """
+            AND (f.channel_id IS NOT NULL OR EXISTS (
+                SELECT 1 FROM res_users u
+                JOIN res_groups_users_rel g ON (g.uid = u.id)
+                WHERE u.partner_id = f.partner_id AND u.active AND g.gid = %s))
+            """
+            params.append(group_id)
+        self._cr.execute(query, params)
+        partner_ids, channel_ids = [], []
+        for partner_id, channel_id in self._cr.fetchall():
+            if partner_id:
+                partner_ids.append(partner_id)
+            if channel_id:
+                channel_ids.append(channel_id)
+        return partner_ids, channel_ids
+
     @api.multi
     def _notify(self, force_send=False, user_signature=True):
         """ Add the related record followers to the destination partner_ids if is not a private message.
@@ -913,14 +944,9 @@ class Message(models.Model):
         # all followers of the mail.message document have to be added as partners and notified
         # and filter to employees only if the subtype is internal
         if self_sudo.subtype_id and self.model and self.res_id:
-            followers = self.env['mail.followers'].sudo().search([
-                ('res_model', '=', self.model),
-                ('res_id', '=', self.res_id)
-            ]).filtered(lambda fol: self.subtype_id in fol.subtype_ids)
-            if self_sudo.subtype_id.internal:
-                followers = followers.filtered(lambda fol: fol.channel_id or (fol.partner_id.user_ids and group_user in fol.partner_id.user_ids[0].mapped('groups_id')))
-            channels = self_sudo.channel_ids | followers.mapped('channel_id')
-            partners = self_sudo.partner_ids | followers.mapped('partner_id')
+            partner_ids, channel_ids = self._notify_get_followers(group_user.id if self_sudo.subtype_id.internal else None)
+            channels = self_sudo.channel_ids | self.env['mail.channel'].sudo().browse(channel_ids)
+            partners = self_sudo.partner_ids | self.env['res.partner'].sudo().browse(partner_ids)
         else:
             channels = self_sudo.channel_ids
             partners = self_sudo.partner_ids
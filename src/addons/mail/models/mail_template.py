@@ -319,6 +319,15 @@ class MailTemplate(models.Model):
         html = self._replace_local_links(html)
         return html
 
+    @api.model
+    @tools.ormcache('template_txt', 'safe')
+    def _compile_template(self, template_txt, safe=False):
+        """ Return the jinja template compiled from ``template_txt``. Compiled
+        templates are cached, as compiling a template is much more expensive
+        than rendering it. """
+        mako_env = mako_safe_template_env if safe else mako_template_env
+        return mako_env.from_string(template_txt)
+
     @api.model
     def render_template(self, template_txt, model, res_ids, post_process=False):
         """ Render the given template text, replace mako expressions ``${expr}``
@@ -342,8 +351,7 @@ class MailTemplate(models.Model):
 
         # try to load the template
         try:
-            mako_env = mako_safe_template_env if self.env.context.get('safe') else mako_template_env
-            template = mako_env.from_string(tools.ustr(template_txt))
+            template = self._compile_template(tools.ustr(template_txt), bool(self.env.context.get('safe')))
         except Exception:
             _logger.info("Failed to load template %r", template_txt, exc_info=True)
             return multi_mode and results or results[res_ids[0]]
@@ -582,13 +582,16 @@ class MailThread(models.AbstractModel):
         officers. """
         # TDE note: recipients is normally sudo-ed
         group_user = self.env['ir.model.data'].xmlid_to_res_id('base.group_user')
-        for recipient in recipients:
-            if recipient.id in done_ids:
-                continue
-            if recipient.user_ids and group_user in recipient.user_ids[0].groups_id.ids:
-                group_data['user'] |= recipient
-            else:
-                group_data['partner'] |= recipient
+        recipient_ids = [rid for rid in recipients.ids if rid not in done_ids]
+        user_partner_ids = set()
+        for sub_ids in self._cr.split_for_in_conditions(recipient_ids):
+            self._cr.execute("""SELECT u.partner_id FROM res_users u
+                                JOIN res_groups_users_rel g ON (g.uid = u.id)
+                                WHERE u.partner_id IN %s AND u.active AND g.gid = %s""",
+                             (sub_ids, group_user))
+            user_partner_ids.update(row[0] for row in self._cr.fetchall())
+        group_data['user'] |= recipients.browse([rid for rid in recipient_ids if rid in user_partner_ids])
+        group_data['partner'] |= recipients.browse([rid for rid in recipient_ids if rid not in user_partner_ids])
         return group_data
 
     @api.multi
@@ -646,22 +649,19 @@ class MailThread(models.AbstractModel):
             group_data[category] = self.env['res.partner']
             result[category].update(data)
 
-        doc_followers = self.env['mail.followers']
+        follower_ids = set()
         if message.model and message.res_id:
-            doc_followers = self.env['mail.followers'].sudo().search([
-                ('res_model', '=', message.model),
-                ('res_id', '=', message.res_id),
-                ('partner_id', 'in', recipients_sudo.ids)])
-        partner_followers = doc_followers.mapped('partner_id')
+            for sub_ids in self._cr.split_for_in_conditions(recipients_sudo.ids):
+                self._cr.execute("""SELECT partner_id FROM mail_followers
+                                    WHERE res_model = %s AND res_id = %s AND partner_id IN %s""",
+                                 (message.model, message.res_id, sub_ids))
+                follower_ids.update(row[0] for row in self._cr.fetchall())
 
         # classify recipients, then set them in followers / not followers
         group_data = self._notification_group_recipients(message, recipients, set(), group_data)
         for category, recipients in group_data.iteritems():
-            for recipient in recipients:
-                if recipient in partner_followers:
-                    result[category]['followers'] |= recipient
-                else:
-                    result[category]['not_followers'] |= recipient
+            result[category]['followers'] |= recipients.filtered(lambda recipient: recipient.id in follower_ids)
+            result[category]['not_followers'] |= recipients.filtered(lambda recipient: recipient.id not in follower_ids)
 
         return result
 
@@ -54,11 +54,13 @@ class Partner(models.Model):
             user = message.author_id.user_ids[0]
         else:
             user = self.env.user
-        if user.company_id.website:
-            website_url = 'http://%s' % user.company_id.website if not user.company_id.website.lower().startswith(('http:', 'https:')) else user.company_id.website
+        # do not prefetch the recipients when reading the company
+        company = user.company_id.with_context(prefetch_fields=False)
+        if company.website:
+            website_url = 'http://%s' % company.website if not company.website.lower().startswith(('http:', 'https:')) else company.website
         else:
             website_url = False
-        company_name = user.company_id.name
+        company_name = company.name
 
         model_name = False
         if message.model:
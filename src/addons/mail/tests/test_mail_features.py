@@ -82,6 +82,21 @@ class TestMessagePost(TestMail):
         self.assertEqual(self.group_pigs.message_follower_ids.mapped('partner_id'), original.mapped('partner_id') | self.partner_2)
         self.assertEqual(self.group_pigs.message_follower_ids.mapped('channel_id'), original.mapped('channel_id'))
 
+    @mute_logger('openerp.addons.mail.models.mail_mail')
+    def test_post_notifications_internal(self):
+        """ Followers of an internal subtype are notified if they are employees """
+        subtype = self.env['mail.message.subtype'].create({'name': 'Internal', 'internal': True})
+        self.group_pigs.message_subscribe(
+            partner_ids=[self.user_employee.partner_id.id, self.user_portal.partner_id.id, self.partner_1.id],
+            subtype_ids=[subtype.id])
+        self.group_pigs.message_subscribe(partner_ids=[self.partner_2.id])
+
+        msg = self.group_pigs.message_post(body='Internal', message_type='comment', subtype_id=subtype.id)
+        self.assertEqual(msg.needaction_partner_ids, self.user_employee.partner_id)
+
+        msg = self.group_pigs.message_post(body='Public', message_type='comment', subtype='mail.mt_comment')
+        self.assertEqual(msg.needaction_partner_ids, self.partner_2)
+
     @mute_logger('openerp.addons.mail.models.mail_mail')
     def test_post_notifications(self):
         _body, _body_alt = '<p>Test Body</p>', 'Test Body'
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from .common import TestMail
+from openerp.addons.base.ir.ir_mail_server import MailDeliveryException
+from openerp.tools import mute_logger
+
+
+class TestMailMail(TestMail):
+
+    @mute_logger('openerp.addons.mail.models.mail_mail')
+    def test_send_batch(self):
+        """ Mails are sent by batches through a single connection per server. """
+        sessions = []
+        sent = []
+
+        class FakeSession(object):
+            closed = False
+
+            def noop(self):
+                return (421, 'closed') if self.closed else (250, 'OK')
+
+            def quit(self):
+                self.closed = True
+
+        def connect_server(self, cr, uid, mail_server_id=None, context=None):
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        def send_email(self, cr, uid, message, *args, **kwargs):
+            sent.append((message['To'], kwargs.get('smtp_session')))
+            return send_email.origin(self, cr, uid, message, *args, **kwargs)
+
+        IrMailServer = self.env['ir.mail_server']
+        IrMailServer._patch_method('connect_server', connect_server)
+        self.addCleanup(IrMailServer._revert_method, 'connect_server')
+        IrMailServer._patch_method('send_email', send_email)
+        self.addCleanup(IrMailServer._revert_method, 'send_email')
+        self.env['ir.config_parameter'].set_param('mail.send.batch_size', '2')
+
+        Mail = self.env['mail.mail']
+        mails = [
+            Mail.create({
+                'subject': 'Batch %d' % index,
+                'body_html': '<p>Batch</p>',
+                'email_to': 'batch%d@example.com' % index,
+                'auto_delete': False,
+            })
+            for index in range(4)
+        ]
+        # a mail without recipient fails
+        mails.append(Mail.create({'subject': 'Nobody', 'body_html': '<p>Batch</p>', 'auto_delete': False}))
+        Mail.browse([mail.id for mail in mails]).send()
+
+        self.assertEqual([mail.state for mail in mails], ['sent'] * 4 + ['exception'])
+        self.assertEqual(sorted(to for to, session in sent), ['batch%d@example.com' % index for index in range(4)])
+        self.assertEqual(len(sessions), 1, 'the connection should be shared by all batches')
+        self.assertTrue(all(session is sessions[0] for to, session in sent))
+        self.assertTrue(sessions[0].closed)
+
+    @mute_logger('openerp.addons.mail.models.mail_mail')
+    def test_send_failed_no_retry(self):
+        """ A mail whose delivery fails is not sent again, as the server may
+            have accepted it; the next mails are sent through a new connection. """
+        sessions = []
+        sent = []
+
+        class FakeSession(object):
+            closed = False
+
+            def noop(self):
+                return (421, 'closed') if self.closed else (250, 'OK')
+
+            def quit(self):
+                self.closed = True
+
+        def connect_server(self, cr, uid, mail_server_id=None, context=None):
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        def send_email(self, cr, uid, message, *args, **kwargs):
+            sent.append((message['To'], kwargs.get('smtp_session')))
+            if message['To'] == 'fail@example.com':
+                raise MailDeliveryException('Mail Delivery Failed', 'Connection lost')
+            return send_email.origin(self, cr, uid, message, *args, **kwargs)
+
+        IrMailServer = self.env['ir.mail_server']
+        IrMailServer._patch_method('connect_server', connect_server)
+        self.addCleanup(IrMailServer._revert_method, 'connect_server')
+        IrMailServer._patch_method('send_email', send_email)
+        self.addCleanup(IrMailServer._revert_method, 'send_email')
+
+        Mail = self.env['mail.mail']
+        mails = [
+            Mail.create({
+                'subject': 'Retry',
+                'body_html': '<p>Retry</p>',
+                'email_to': email_to,
+                'auto_delete': False,
+            })
+            for email_to in ['fail@example.com', 'next@example.com']
+        ]
+        Mail.browse([mail.id for mail in mails]).send()
+
+        self.assertEqual([mail.state for mail in mails], ['exception', 'sent'])
+        self.assertEqual([to for to, session in sent], ['fail@example.com', 'next@example.com'])
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual([session for to, session in sent], sessions)
+        self.assertTrue(all(session.closed for session in sessions))
@@ -387,6 +387,8 @@ class MassMailing(osv.Model):
     _description = 'Mass Mailing'
     # number of periods for tracking mail_mail statistics
     _period_number = 6
+    # number of recipients rendered and sent between two checkpoints
+    _chunk_size = 1000
     _order = 'sent_date DESC'
     # _send_trigger = 5  # Number under which mails are send directly
 
@@ -488,6 +490,10 @@ class MassMailing(osv.Model):
         'sent_date': fields.datetime('Sent Date', oldname='date', copy=False),
         'schedule_date': fields.datetime('Schedule in the Future'),
         'body_html': fields.html('Body', translate=True),
+        'body_converted': fields.html(
+            'Body with Tracked Links', sanitize=False, copy=False,
+            help='Body of the emails, with its links converted into tracked links. '
+                 'It is computed once when sending starts, and reset when the body changes.'),
         'attachment_ids': fields.many2many(
             'ir.attachment', 'mass_mailing_ir_attachments_rel',
             'mass_mailing_id', 'attachment_id', 'Attachments'
@@ -587,6 +593,11 @@ class MassMailing(osv.Model):
             _get_next_departure, string='Next Departure',
             type='datetime'
         ),
+        # sending progress
+        'expected': fields.integer('Expected', readonly=True, copy=False,
+                                   help='Number of recipients of the mailing when sending started.'),
+        'processed': fields.integer('Processed', readonly=True, copy=False,
+                                    help='Number of recipients whose email has been generated.'),
     }
 
     def mass_mailing_statistics_action(self, cr, uid, ids, context=None):
@@ -627,6 +638,12 @@ class MassMailing(osv.Model):
     # Technical stuff
     #------------------------------------------------------
 
+    def write(self, cr, uid, ids, vals, context=None):
+        if 'body_html' in vals and 'body_converted' not in vals:
+            # the tracked links must be converted again
+            vals = dict(vals, body_converted=False)
+        return super(MassMailing, self).write(cr, uid, ids, vals, context=context)
+
     def copy_data(self, cr, uid, id, default=None, context=None):
         mailing = self.browse(cr, uid, id, context=context)
         default = dict(default or {},
@@ -756,11 +773,20 @@ class MassMailing(osv.Model):
         already_mailed_res_ids = [record['res_id'] for record in already_mailed]
         return list(set(res_ids) - set(already_mailed_res_ids))
 
-    def send_mail(self, cr, uid, ids, context=None):
+    def send_mail(self, cr, uid, ids, auto_commit=True, context=None):
+        """ Send the mailings to their remaining recipients, by chunks of
+        ``mass_mailing.chunk_size`` recipients (system parameter). The links of
+        a mailing are converted into tracked links once, and kept for the next
+        chunks and sendings. With ``auto_commit``, each chunk is committed with
+        the progress of the mailing, so that an interrupted sending resumes with
+        the recipients that have not been mailed yet.
+        """
         author_id = self.pool['res.users'].browse(cr, uid, uid, context=context).partner_id.id
+        chunk_size = int(self.pool['ir.config_parameter'].get_param(
+            cr, SUPERUSER_ID, 'mass_mailing.chunk_size', 0)) or self._chunk_size
         for mailing in self.browse(cr, uid, ids, context=context):
             # instantiate an email composer + send emails
-            res_ids = self.get_remaining_recipients(cr, uid, mailing, context=context)
+            res_ids = sorted(self.get_remaining_recipients(cr, uid, mailing, context=context))
             if not res_ids:
                 raise UserError(_('Please select recipients.'))
 
@@ -769,13 +795,15 @@ class MassMailing(osv.Model):
             else:
                 comp_ctx = {'active_ids': res_ids}
 
-            # Convert links in absolute URLs before the application of the shortener
-            self.write(cr, uid, [mailing.id], {'body_html': self.pool['mail.template']._replace_local_links(cr, uid, mailing.body_html, context)}, context=context)
+            if not mailing.body_converted:
+                # Convert links in absolute URLs before the application of the shortener
+                self.write(cr, uid, [mailing.id], {'body_html': self.pool['mail.template']._replace_local_links(cr, uid, mailing.body_html, context)}, context=context)
+                self.write(cr, uid, [mailing.id], {'body_converted': self.convert_links(cr, uid, [mailing.id], context=context)[mailing.id]}, context=context)
 
             composer_values = {
                 'author_id': author_id,
                 'attachment_ids': [(4, attachment.id) for attachment in mailing.attachment_ids],
-                'body': self.convert_links(cr, uid, [mailing.id], context=context)[mailing.id],
+                'body': mailing.body_converted,
                 'subject': mailing.name,
                 'model': mailing.mailing_model,
                 'email_from': mailing.email_from,
@@ -788,8 +816,18 @@ class MassMailing(osv.Model):
             if mailing.reply_to_mode == 'email':
                 composer_values['reply_to'] = mailing.reply_to
 
+            processed = self.pool['mail.mail.statistics'].search_count(cr, uid, [('mass_mailing_id', '=', mailing.id)], context=context)
+            self.write(cr, uid, [mailing.id], {'expected': processed + len(res_ids), 'processed': processed}, context=context)
+
             composer_id = self.pool['mail.compose.message'].create(cr, uid, composer_values, context=comp_ctx)
-            self.pool['mail.compose.message'].send_mail(cr, uid, [composer_id], auto_commit=True, context=comp_ctx)
+            for index in xrange(0, len(res_ids), chunk_size):
+                chunk_ids = res_ids[index:index + chunk_size]
+                self.pool['mail.compose.message'].send_mail(cr, uid, [composer_id], auto_commit=auto_commit,
+                                                            context=dict(comp_ctx, active_ids=chunk_ids))
+                processed += len(chunk_ids)
+                self.write(cr, uid, [mailing.id], {'processed': processed}, context=context)
+                if auto_commit:
+                    cr.commit()
             self.write(cr, uid, [mailing.id], {'state': 'done'}, context=context)
         return True
 
@@ -9,3 +9,37 @@ class test_message_compose(TestMail):
     def test_OO_mail_mail_tracking(self):
         """ Tests designed for mail_mail tracking (opened, replied, bounced) """
         pass
+
+    def test_send_mail_chunks(self):
+        """ Mailings are sent by chunks, and resume with the remaining recipients """
+        self.env['ir.config_parameter'].set_param('mass_mailing.chunk_size', '2')
+        mailing_list = self.env['mail.mass_mailing.list'].create({'name': 'Chunks'})
+        Contact = self.env['mail.mass_mailing.contact']
+        for index in range(5):
+            Contact.create({'name': 'Contact %d' % index, 'email': 'contact%d@example.com' % index, 'list_id': mailing_list.id})
+        mailing = self.env['mail.mass_mailing'].create({
+            'name': 'Chunks',
+            'body_html': '<p>Hello <a href="http://www.example.com/chunks">there</a></p>',
+            'mailing_model': 'mail.mass_mailing.contact',
+            'mailing_domain': "[('list_id', 'in', [%d])]" % mailing_list.id,
+            'reply_to_mode': 'email',
+        })
+
+        mailing.send_mail(auto_commit=False)
+        self.assertEqual((mailing.expected, mailing.processed, mailing.state), (5, 5, 'done'))
+        self.assertEqual(len(mailing.statistics_ids), 5)
+        self.assertIn('/r/', mailing.body_converted)
+        trackers = self.env['link.tracker'].search([('mass_mailing_id', '=', mailing.id)])
+        self.assertEqual(len(trackers), 1, 'links should be converted once per mailing')
+
+        # new recipients are mailed with the same tracked links
+        for index in range(5, 7):
+            Contact.create({'name': 'Contact %d' % index, 'email': 'contact%d@example.com' % index, 'list_id': mailing_list.id})
+        mailing.send_mail(auto_commit=False)
+        self.assertEqual((mailing.expected, mailing.processed), (7, 7))
+        self.assertEqual(len(mailing.statistics_ids), 7)
+        self.assertEqual(self.env['link.tracker'].search([('mass_mailing_id', '=', mailing.id)]), trackers)
+
+        # changing the body resets the tracked links
+        mailing.write({'body_html': '<p>Bye</p>'})
+        self.assertFalse(mailing.body_converted)
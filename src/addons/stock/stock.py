@@ -2126,17 +2126,21 @@ class stock_move(osv.osv):
         self.pool['procurement.order'].run(cr, uid, res, context=context)
         return res
 
+    @api.create_batchable
     def create(self, cr, uid, vals, context=None):
         if context is None:
             context = {}
         picking_obj = self.pool['stock.picking']
-        track = not context.get('mail_notrack') and vals.get('picking_id')
-        if track:
-            picking = picking_obj.browse(cr, uid, vals['picking_id'], context=context)
-            initial_values = {picking.id: {'state': picking.state}}
+        picking_ids = []
+        if not context.get('mail_notrack'):
+            vals_list = vals if isinstance(vals, list) else [vals]
+            picking_ids = list(set(v['picking_id'] for v in vals_list if v.get('picking_id')))
+        if picking_ids:
+            pickings = picking_obj.browse(cr, uid, picking_ids, context=context)
+            initial_values = dict((picking.id, {'state': picking.state}) for picking in pickings)
         res = super(stock_move, self).create(cr, uid, vals, context=context)
-        if track:
-            picking_obj.message_track(cr, uid, [vals['picking_id']], picking_obj.fields_get(cr, uid, ['state'], context=context), initial_values, context=context)
+        if picking_ids:
+            picking_obj.message_track(cr, uid, picking_ids, picking_obj.fields_get(cr, uid, ['state'], context=context), initial_values, context=context)
         return res
 
     def write(self, cr, uid, ids, vals, context=None):
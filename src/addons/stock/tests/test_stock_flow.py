@@ -1234,4 +1234,27 @@ class TestStockFlow(TestStockCommon):
         self.assertEqual(sum([x.qty for x in quants if not x.lot_id]), 0.0, 'Wrong sum of quants with no lot')
         self.assertEqual(sum([x.qty for x in quants if x.lot_id.id == lot1.id]), 1.0, 'Wrong sum of quants with lot 1')
         self.assertEqual(sum([x.qty for x in quants if x.lot_id.id == lot2.id]), 1.0, 'Wrong sum of quants with lot 2')
-        self.assertEqual(sum([x.qty for x in quants if x.lot_id.id == lot3.id]), 2.0, 'Wrong sum of quants with lot 3')
\ No newline at end of file
+        self.assertEqual(sum([x.qty for x in quants if x.lot_id.id == lot3.id]), 2.0, 'Wrong sum of quants with lot 3')
+
+    def test_40_load_moves(self):
+        """ load() creates the moves of a picking together. """
+        self.assertTrue(self.MoveObj._create_batchable())
+        picking_in = self.PickingObj.create({
+            'partner_id': self.partner_delta_id,
+            'picking_type_id': self.picking_type_in,
+            'location_id': self.supplier_location,
+            'location_dest_id': self.stock_location})
+        fields = ['name', 'product_id/.id', 'product_uom_qty', 'product_uom/.id',
+                  'picking_id/.id', 'location_id/.id', 'location_dest_id/.id']
+        rows = [
+            [product.name, str(product.id), '2', str(product.uom_id.id),
+             str(picking_in.id), str(self.supplier_location), str(self.stock_location)]
+            for product in (self.productA, self.productB)
+        ]
+        result = self.MoveObj.load(fields, rows)
+        self.assertFalse(result['messages'])
+        moves = self.MoveObj.browse(result['ids'])
+        self.assertEqual(moves.mapped('product_id.id'), [self.productA.id, self.productB.id])
+        self.assertEqual(picking_in.move_lines, moves)
+        picking_in.action_confirm()
+        self.assertEqual(picking_in.state, 'assigned', 'Incoming shipment state should be assigned.')
@@ -1301,6 +1301,9 @@ class Export(http.Controller):
 
 class ExportFormat(object):
     raw_data = False
+    # number of records exported at once; the cache is invalidated between
+    # batches, so that memory does not grow with the number of records
+    batch_size = 1000
 
     @property
     def content_type(self):
@@ -1324,6 +1327,47 @@ class ExportFormat(object):
         """
         raise NotImplementedError()
 
+    def stream_data(self, fields, batches):
+        """ Streaming variant of :meth:`from_data`: ``batches`` is an iterable
+        of lists of rows, and the result is an iterable of byte chunks. By
+        default, the whole output is built with :meth:`from_data`.
+        """
+        rows = [row for batch in batches for row in batch]
+        yield self.from_data(fields, rows)
+
+    def export_batches(self, model, ids, domain, field_names, context):
+        """ Generate the export data of the given records, by batches of
+        :attr:`batch_size` rows. The data is read in a cursor of its own, as
+        the generator is consumed after the request's cursor is closed. The
+        first batch is read right away, so that access errors are reported
+        before the response starts.
+        """
+        # the request is no longer available when the generator runs
+        db, uid = request.db, request.uid
+
+        def generate():
+            with openerp.registry(db).cursor() as cr:
+                # the batches may be read inside or outside of the request
+                with Environment.manage():
+                    Model = Environment(cr, uid, context)[model]
+                    if ids:
+                        batches = (Model.browse(ids[index:index + self.batch_size])
+                                   for index in xrange(0, len(ids), self.batch_size))
+                    else:
+                        batches = Model._search_batches(domain, batch_size=self.batch_size)
+                while True:
+                    with Environment.manage():
+                        records = next(batches, None)
+                        if records is None:
+                            return
+                        records.check_access_rule('read')
+                        rows = records.export_data(field_names, self.raw_data).get('datas', [])
+                        records.invalidate_cache()
+                    yield rows
+
+        batches = generate()
+        return itertools.chain([next(batches, [])], batches)
+
     def base(self, data, token):
         params = json.loads(data)
         model, fields, ids, domain, import_compat = \
@@ -1331,27 +1375,27 @@ class ExportFormat(object):
                                 'import_compat')(
                 params)
 
-        Model = request.session.model(model)
         context = dict(request.context or {}, **params.get('context', {}))
-        ids = ids or Model.search(domain, offset=0, limit=False, order=False, context=context)
+        request.env[model].check_access_rights('read')
 
         if not request.env[model]._is_an_ordinary_table():
             fields = [field for field in fields if field['name'] != 'id']
 
         field_names = map(operator.itemgetter('name'), fields)
-        import_data = Model.export_data(ids, field_names, self.raw_data, context=context).get('datas',[])
+        batches = self.export_batches(model, ids, domain, field_names, context)
 
         if import_compat:
             columns_headers = field_names
         else:
             columns_headers = [val['label'].strip() for val in fields]
 
-
-        return request.make_response(self.from_data(columns_headers, import_data),
+        response = request.make_response(self.stream_data(columns_headers, batches),
             headers=[('Content-Disposition',
                             content_disposition(self.filename(model))),
                      ('Content-Type', self.content_type)],
             cookies={'fileToken': token})
+        response.direct_passthrough = True
+        return response
 
 class CSVExport(ExportFormat, http.Controller):
 
@@ -1368,32 +1412,41 @@ class CSVExport(ExportFormat, http.Controller):
         return base + '.csv'
 
     def from_data(self, fields, rows):
+        return ''.join(self.stream_data(fields, [rows]))
+
+    def stream_data(self, fields, batches):
         fp = StringIO()
         writer = csv.writer(fp, quoting=csv.QUOTE_ALL)
 
         writer.writerow([name.encode('utf-8') for name in fields])
 
-        for data in rows:
-            row = []
-            for d in data:
-                if isinstance(d, unicode):
-                    try:
-                        d = d.encode('utf-8')
-                    except UnicodeError:
-                        pass
-                if d is False: d = None
-
-                # Spreadsheet apps tend to detect formulas on leading =, + and -
-                if type(d) is str and d.startswith(('=', '-', '+')):
-                    d = "'" + d
-
-                row.append(d)
-            writer.writerow(row)
+        for rows in batches:
+            for data in rows:
+                row = []
+                for d in data:
+                    if isinstance(d, unicode):
+                        try:
+                            d = d.encode('utf-8')
+                        except UnicodeError:
+                            pass
+                    if d is False: d = None
+
+                    # Spreadsheet apps tend to detect formulas on leading =, + and -
+                    if type(d) is str and d.startswith(('=', '-', '+')):
+                        d = "'" + d
+
+                    row.append(d)
+                writer.writerow(row)
+
+            # flush the rows of the batch to the response
+            yield fp.getvalue()
+            fp.seek(0)
+            fp.truncate()
 
-        fp.seek(0)
-        data = fp.read()
+        data = fp.getvalue()
         fp.close()
-        return data
+        if data:
+            yield data
 
 class ExcelExport(ExportFormat, http.Controller):
     # Excel needs raw data to correctly handle numbers and date values
@@ -1412,6 +1465,11 @@ class ExcelExport(ExportFormat, http.Controller):
         return base + '.xls'
 
     def from_data(self, fields, rows):
+        return ''.join(self.stream_data(fields, [rows]))
+
+    def stream_data(self, fields, batches):
+        # the xls format cannot be written progressively: the rows are added
+        # to the workbook batch by batch, and the file is output at the end
         workbook = xlwt.Workbook()
         worksheet = workbook.add_sheet('Sheet 1')
 
@@ -1423,23 +1481,28 @@ class ExcelExport(ExportFormat, http.Controller):
         date_style = xlwt.easyxf('align: wrap yes', num_format_str='YYYY-MM-DD')
         datetime_style = xlwt.easyxf('align: wrap yes', num_format_str='YYYY-MM-DD HH:mm:SS')
 
-        for row_index, row in enumerate(rows):
-            for cell_index, cell_value in enumerate(row):
-                cell_style = base_style
-                if isinstance(cell_value, basestring):
-                    cell_value = re.sub("\r", " ", cell_value)
-                elif isinstance(cell_value, datetime.datetime):
-                    cell_style = datetime_style
-                elif isinstance(cell_value, datetime.date):
-                    cell_style = date_style
-                worksheet.write(row_index + 1, cell_index, cell_value, cell_style)
+        row_index = 0
+        for rows in batches:
+            for row in rows:
+                row_index += 1
+                for cell_index, cell_value in enumerate(row):
+                    cell_style = base_style
+                    if isinstance(cell_value, basestring):
+                        cell_value = re.sub("\r", " ", cell_value)
+                    elif isinstance(cell_value, datetime.datetime):
+                        cell_style = datetime_style
+                    elif isinstance(cell_value, datetime.date):
+                        cell_style = date_style
+                    worksheet.write(row_index, cell_index, cell_value, cell_style)
+            # serialize the cells of the batch, and release them
+            worksheet.flush_row_data()
 
         fp = StringIO()
         workbook.save(fp)
         fp.seek(0)
         data = fp.read()
         fp.close()
-        return data
+        yield data
 
 class Reports(http.Controller):
     POLLING_DELAY = 0.25
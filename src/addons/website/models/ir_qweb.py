@@ -27,12 +27,15 @@ class QWeb(orm.AbstractModel):
     ]
 
     def render_attribute(self, element, name, value, qwebcontext):
-        context = qwebcontext.context or {}
-        if not context.get('rendering_bundle'):
-            if name == self.URL_ATTRS.get(element.tag) and qwebcontext.get('url_for'):
-                value = qwebcontext.get('url_for')(value)
-            elif request and getattr(request, 'website', None) and request.website.cdn_activated and (name == self.URL_ATTRS.get(element.tag) or name == self.CDN_TRIGGERS.get(element.tag)):
-                value = request.website.get_cdn_url(value)
+        # check the attribute first, looking up the request is comparatively slow
+        url_attr = name == self.URL_ATTRS.get(element.tag)
+        if url_attr or name == self.CDN_TRIGGERS.get(element.tag):
+            context = qwebcontext.context or {}
+            if not context.get('rendering_bundle'):
+                if url_attr and qwebcontext.get('url_for'):
+                    value = qwebcontext.get('url_for')(value)
+                elif request and getattr(request, 'website', None) and request.website.cdn_activated:
+                    value = request.website.get_cdn_url(value)
         return super(QWeb, self).render_attribute(element, name, value, qwebcontext)
 
     def render_text(self, text, element, qwebcontext):
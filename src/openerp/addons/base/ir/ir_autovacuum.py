@@ -30,4 +30,5 @@ class AutoVacuum(models.TransientModel):
     def power_on(self, cr, uid, *args, **kwargs):
         self._gc_transient_models(cr, uid, *args, **kwargs)
         self._gc_user_logs(cr, uid, *args, **kwargs)
+        self.pool['ir.cron.execution']._gc_executions(cr, uid)
         return True
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
+import calendar
 import logging
 import threading
 import time
@@ -57,7 +58,12 @@ class ir_cron(osv.osv):
         'model': fields.char('Object', help="Model name on which the method to be called is located, e.g. 'res.partner'."),
         'function': fields.char('Method', help="Name of the method to be called when this job is processed."),
         'args': fields.text('Arguments', help="Arguments to be passed to the method, e.g. (uid,)."),
-        'priority': fields.integer('Priority', help='The priority of the job, as an integer: 0 means higher priority, 10 means lower priority.')
+        'priority': fields.integer('Priority', help='The priority of the job, as an integer: 0 means higher priority, 10 means lower priority.'),
+        'timeout': fields.integer('Timeout', help="Maximum duration of an execution, in seconds (0 means no limit). "
+                                                  "The scheduler stops waiting for the jobs that run longer. "
+                                                  "The cron workers of the multi-process mode process a job until it "
+                                                  "completes or reaches their time limits."),
+        'execution_ids': fields.one2many('ir.cron.execution', 'cron_id', 'Executions', readonly=True),
     }
 
     _defaults = {
@@ -68,6 +74,7 @@ class ir_cron(osv.osv):
         'interval_type' : 'months',
         'numbercall' : 1,
         'active' : 1,
+        'timeout': 0,
     }
 
     def _check_args(self, cr, uid, ids, context=None):
@@ -114,6 +121,7 @@ class ir_cron(osv.osv):
         :param method_name: name of the method to call when this job is processed.
         :param args: arguments of the method (without the usual self, cr, uid).
         :param job_id: job id.
+        :return: ``False`` if the method raised an exception
         """
         try:
             args = str2tuple(args)
@@ -139,15 +147,21 @@ class ir_cron(osv.osv):
                 _logger.warning(msg)
         except Exception, e:
             self._handle_callback_exception(cr, uid, model_name, method_name, args, job_id, e)
+            return False
+        return True
 
     def _process_job(self, job_cr, job, cron_cr):
-        """ Run a given job taking care of the repetition.
+        """ Run a given job taking care of the repetition, and record the
+        execution.
 
         :param job_cr: cursor to use to execute the job, safe to commit/rollback
         :param job: job to be run (as a dictionary).
         :param cron_cr: cursor holding lock on the cron job row, to use to update the next exec date,
             must not be committed/rolled back!
         """
+        start = time.time()
+        calls = 0
+        failed = False
         try:
             with api.Environment.manage():
                 now = fields.datetime.context_timestamp(job_cr, job['user_id'], datetime.now())
@@ -159,7 +173,9 @@ class ir_cron(osv.osv):
                     if numbercall > 0:
                         numbercall -= 1
                     if not ok or job['doall']:
-                        self._callback(job_cr, job['user_id'], job['model'], job['function'], job['args'], job['id'])
+                        calls += 1
+                        if self._callback(job_cr, job['user_id'], job['model'], job['function'], job['args'], job['id']) is False:
+                            failed = True
                     if numbercall:
                         nextcall += _intervalTypes[job['interval_type']](job['interval_number'])
                     ok = True
@@ -171,37 +187,68 @@ class ir_cron(osv.osv):
                 self.invalidate_cache(job_cr, SUPERUSER_ID)
 
         finally:
+            duration = time.time() - start
+            if failed:
+                state = 'failed'
+            elif job.get('timeout') and duration > job['timeout']:
+                state = 'timeout'
+            else:
+                state = 'done'
+            try:
+                with cron_cr.savepoint():
+                    cron_cr.execute("""INSERT INTO ir_cron_execution (cron_id, start, duration, calls, state, worker)
+                                       VALUES (%s, %s, %s, %s, %s, %s)""",
+                                    (job['id'], datetime.utcfromtimestamp(start).strftime(DEFAULT_SERVER_DATETIME_FORMAT),
+                                     duration, calls, state, threading.current_thread().name))
+            except psycopg2.Error:
+                # the module base may not be up-to-date yet
+                _logger.warning("Could not record the execution of cron job %s", job['id'], exc_info=True)
+            self._notify_scheduler(cron_cr)
             job_cr.commit()
             cron_cr.commit()
 
-    @classmethod
-    def _acquire_job(cls, db_name):
-        # TODO remove 'check' argument from addons/base_action_rule/base_action_rule.py
-        """ Try to process one cron job.
-
-        This selects in database all the jobs that should be processed. It then
-        tries to lock each of them and, if it succeeds, run the cron job (if it
-        doesn't succeed, it means the job was already locked to be taken care
-        of by another thread) and return.
+    def _notify_scheduler(self, cr):
+        """ Wake up the cron schedulers of all the servers once the current
+        transaction is committed, so that they look again at the jobs of the
+        database (see :mod:`openerp.service.cron`).
+        """
+        dbname = cr.dbname
+        def notify():
+            try:
+                with openerp.sql_db.db_connect('postgres').cursor() as pg_cr:
+                    pg_cr.execute("NOTIFY cron_trigger, %s", (dbname,))
+            except Exception:
+                _logger.warning("Could not notify the cron schedulers for database %s", dbname, exc_info=True)
+        cr.after('commit', notify)
 
-        If a job was processed, returns True, otherwise returns False.
+    @classmethod
+    def _get_due_jobs(cls, db_name):
+        """ Return the jobs of database ``db_name`` that should be processed
+        now, as dictionaries ordered by priority, and the time of the next call
+        of the other jobs, as a POSIX timestamp, or ``None`` if there is no
+        other job to process.
         """
         db = openerp.sql_db.db_connect(db_name)
-        threading.current_thread().dbname = db_name
         cr = db.cursor()
-        jobs = []
         try:
             # Make sure the database we poll has the same version as the code of base
             cr.execute("SELECT 1 FROM ir_module_module WHERE name=%s AND latest_version=%s", ('base', BASE_VERSION))
-            if cr.fetchone():
-                # Careful to compare timestamps with 'UTC' - everything is UTC as of v6.1.
-                cr.execute("""SELECT * FROM ir_cron
-                              WHERE numbercall != 0
-                                  AND active AND nextcall <= (now() at time zone 'UTC')
-                              ORDER BY priority""")
-                jobs = cr.dictfetchall()
-            else:
+            if not cr.fetchone():
                 _logger.warning('Skipping database %s as its base version is not %s.', db_name, BASE_VERSION)
+                return [], None
+            # Careful to compare timestamps with 'UTC' - everything is UTC as of v6.1.
+            cr.execute("""SELECT * FROM ir_cron
+                          WHERE numbercall != 0
+                              AND active AND nextcall <= (now() at time zone 'UTC')
+                          ORDER BY priority""")
+            jobs = cr.dictfetchall()
+            cr.execute("""SELECT min(nextcall) FROM ir_cron
+                          WHERE numbercall != 0
+                              AND active AND nextcall > (now() at time zone 'UTC')""")
+            nextcall = cr.fetchone()[0]
+            if nextcall:
+                nextcall = calendar.timegm(time.strptime(nextcall, DEFAULT_SERVER_DATETIME_FORMAT))
+            return jobs, nextcall
         except psycopg2.ProgrammingError, e:
             if e.pgcode == '42P01':
                 # Class 42 — Syntax Error or Access Rule Violation; 42P01: undefined_table
@@ -209,55 +256,73 @@ class ir_cron(osv.osv):
                 _logger.warning('Tried to poll an undefined table on database %s.', db_name)
             else:
                 raise
-        except Exception:
-            _logger.warning('Exception in cron:', exc_info=True)
         finally:
             cr.close()
+        return [], None
 
-        for job in jobs:
-            lock_cr = db.cursor()
+    @classmethod
+    def _run_job(cls, db_name, job):
+        """ Process the cron job ``job`` (a dictionary) of database ``db_name``,
+        unless it has already been processed, or is being processed by
+        another thread or process. Return whether the job was processed.
+        """
+        db = openerp.sql_db.db_connect(db_name)
+        threading.current_thread().dbname = db_name
+        lock_cr = db.cursor()
+        try:
+            # Try to grab an exclusive lock on the job row from within the task transaction
+            # Restrict to the same conditions as for the search since the job may have already
+            # been run by an other thread when cron is running in multi thread
+            lock_cr.execute("""SELECT *
+                               FROM ir_cron
+                               WHERE numbercall != 0
+                                  AND active
+                                  AND nextcall <= (now() at time zone 'UTC')
+                                  AND id=%s
+                               FOR UPDATE NOWAIT""",
+                           (job['id'],), log_exceptions=False)
+
+            locked_job = lock_cr.fetchone()
+            if not locked_job:
+                _logger.debug("Job `%s` already executed by another process/thread. skipping it", job['name'])
+                return False
+            # Got the lock on the job row, run its code
+            _logger.debug('Starting job `%s`.', job['name'])
+            job_cr = db.cursor()
             try:
-                # Try to grab an exclusive lock on the job row from within the task transaction
-                # Restrict to the same conditions as for the search since the job may have already
-                # been run by an other thread when cron is running in multi thread
-                lock_cr.execute("""SELECT *
-                                   FROM ir_cron
-                                   WHERE numbercall != 0
-                                      AND active
-                                      AND nextcall <= (now() at time zone 'UTC')
-                                      AND id=%s
-                                   FOR UPDATE NOWAIT""",
-                               (job['id'],), log_exceptions=False)
-
-                locked_job = lock_cr.fetchone()
-                if not locked_job:
-                    _logger.debug("Job `%s` already executed by another process/thread. skipping it", job['name'])
-                    continue
-                # Got the lock on the job row, run its code
-                _logger.debug('Starting job `%s`.', job['name'])
-                job_cr = db.cursor()
-                try:
-                    registry = openerp.registry(db_name)
-                    registry[cls._name]._process_job(job_cr, job, lock_cr)
-                except Exception:
-                    _logger.exception('Unexpected exception while processing cron job %r', job)
-                finally:
-                    job_cr.close()
-
-            except psycopg2.OperationalError, e:
-                if e.pgcode == '55P03':
-                    # Class 55: Object not in prerequisite state; 55P03: lock_not_available
-                    _logger.debug('Another process/thread is already busy executing job `%s`, skipping it.', job['name'])
-                    continue
-                else:
-                    # Unexpected OperationalError
-                    raise
+                registry = openerp.registry(db_name)
+                registry[cls._name]._process_job(job_cr, job, lock_cr)
+            except Exception:
+                _logger.exception('Unexpected exception while processing cron job %r', job)
             finally:
-                # we're exiting due to an exception while acquiring the lock
-                lock_cr.close()
+                job_cr.close()
+            return True
+
+        except psycopg2.OperationalError, e:
+            if e.pgcode == '55P03':
+                # Class 55: Object not in prerequisite state; 55P03: lock_not_available
+                _logger.debug('Another process/thread is already busy executing job `%s`, skipping it.', job['name'])
+                return False
+            else:
+                # Unexpected OperationalError
+                raise
+        finally:
+            # we're exiting due to an exception while acquiring the lock
+            lock_cr.close()
+            if hasattr(threading.current_thread(), 'dbname'): # cron job could have removed it as side-effect
+                del threading.current_thread().dbname
 
-        if hasattr(threading.current_thread(), 'dbname'): # cron job could have removed it as side-effect
-            del threading.current_thread().dbname
+    @classmethod
+    def _acquire_job(cls, db_name):
+        # TODO remove 'check' argument from addons/base_action_rule/base_action_rule.py
+        """ Process the cron jobs of ``db_name`` that should be processed now,
+        one after the other, skipping the ones being processed by another
+        thread or process. The servers use :mod:`openerp.service.cron`
+        instead, which processes the jobs in parallel.
+        """
+        jobs, nextcall = cls._get_due_jobs(db_name)
+        for job in jobs:
+            cls._run_job(db_name, job)
 
     def _try_lock(self, cr, uid, ids, context=None):
         """Try to grab a dummy exclusive write-lock to the rows with the given ids,
@@ -274,16 +339,19 @@ class ir_cron(osv.osv):
 
     def create(self, cr, uid, vals, context=None):
         res = super(ir_cron, self).create(cr, uid, vals, context=context)
+        self._notify_scheduler(cr)
         return res
 
     def write(self, cr, uid, ids, vals, context=None):
         self._try_lock(cr, uid, ids, context)
         res = super(ir_cron, self).write(cr, uid, ids, vals, context=context)
+        self._notify_scheduler(cr)
         return res
 
     def unlink(self, cr, uid, ids, context=None):
         self._try_lock(cr, uid, ids, context)
         res = super(ir_cron, self).unlink(cr, uid, ids, context=context)
+        self._notify_scheduler(cr)
         return res
 
     def try_write(self, cr, uid, ids, values, context=None):
@@ -294,10 +362,38 @@ class ir_cron(osv.osv):
         except psycopg2.OperationalError:
             pass
         else:
-            return super(ir_cron, self).write(cr, uid, ids, values, context=context)
+            res = super(ir_cron, self).write(cr, uid, ids, values, context=context)
+            self._notify_scheduler(cr)
+            return res
         return False
 
     def toggle(self, cr, uid, ids, model, domain, context=None):
         active = bool(self.pool[model].search_count(cr, uid, domain, context=context))
 
         return self.try_write(cr, uid, ids, {'active': active}, context=context)
+
+
+class ir_cron_execution(osv.osv):
+    """ Execution of a cron job, with its run-time metrics. """
+    _name = 'ir.cron.execution'
+    _description = 'Scheduled Action Execution'
+    _order = 'id desc'
+    _log_access = False
+    _columns = {
+        'cron_id': fields.many2one('ir.cron', 'Scheduled Action', required=True, select=True, ondelete='cascade'),
+        'start': fields.datetime('Start', readonly=True),
+        'duration': fields.float('Duration', readonly=True, help="Duration of the execution, in seconds."),
+        'calls': fields.integer('Calls', readonly=True, help="Number of calls of the method; missed calls are repeated if the job says so."),
+        'state': fields.selection([('done', 'Done'), ('failed', 'Failed'), ('timeout', 'Timed Out')], 'Status', readonly=True),
+        'worker': fields.char('Worker', readonly=True, help="Thread that processed the job."),
+    }
+
+    def _gc_executions(self, cr, uid, keep=100):
+        """ Delete the executions of each job but the ``keep`` most recent ones. """
+        cr.execute("""DELETE FROM ir_cron_execution WHERE id IN (
+                          SELECT id FROM (
+                              SELECT id, row_number() OVER (PARTITION BY cron_id ORDER BY id DESC) AS rank
+                              FROM ir_cron_execution
+                          ) AS executions WHERE rank > %s
+                      )""", (keep,))
+        _logger.info("GC'd %d cron executions", cr.rowcount)
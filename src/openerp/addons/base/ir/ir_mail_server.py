@@ -366,9 +366,60 @@ class ir_mail_server(osv.osv):
         if postmaster and domain:
             return '%s@%s' % (postmaster, domain)
 
+    def _get_smtp_params(self, cr, uid, mail_server_id=None, smtp_server=None, smtp_port=None,
+                         smtp_user=None, smtp_password=None, smtp_encryption=None, smtp_debug=False,
+                         context=None):
+        """Return the parameters of the SMTP server to use, as a tuple
+           ``(smtp_server, smtp_port, smtp_user, smtp_password, smtp_encryption, smtp_debug)``,
+           chosen as explained in :meth:`send_email`.
+        """
+        # Get SMTP Server Details from Mail Server
+        mail_server = None
+        if mail_server_id:
+            mail_server = self.browse(cr, SUPERUSER_ID, mail_server_id)
+        elif not smtp_server:
+            mail_server_ids = self.search(cr, SUPERUSER_ID, [], order='sequence', limit=1)
+            if mail_server_ids:
+                mail_server = self.browse(cr, SUPERUSER_ID, mail_server_ids[0])
+
+        if mail_server:
+            smtp_server = mail_server.smtp_host
+            smtp_user = mail_server.smtp_user
+            smtp_password = mail_server.smtp_pass
+            smtp_port = mail_server.smtp_port
+            smtp_encryption = mail_server.smtp_encryption
+            smtp_debug = smtp_debug or mail_server.smtp_debug
+        else:
+            # we were passed an explicit smtp_server or nothing at all
+            smtp_server = smtp_server or tools.config.get('smtp_server')
+            smtp_port = tools.config.get('smtp_port', 25) if smtp_port is None else smtp_port
+            smtp_user = smtp_user or tools.config.get('smtp_user')
+            smtp_password = smtp_password or tools.config.get('smtp_password')
+            if smtp_encryption is None and tools.config.get('smtp_ssl'):
+                smtp_encryption = 'starttls' # STARTTLS is the new meaning of the smtp_ssl flag as of v7.0
+
+        if not smtp_server:
+            raise UserError(_("Missing SMTP Server")+ "\n" + _("Please define at least one SMTP server, or provide the SMTP parameters explicitly."))
+        return smtp_server, smtp_port, smtp_user, smtp_password, smtp_encryption, smtp_debug
+
+    def connect_server(self, cr, uid, mail_server_id=None, context=None):
+        """Returns a new SMTP connection to the server that :meth:`send_email`
+           uses for ``mail_server_id``, to be given to it as ``smtp_session``
+           in order to send many emails through the same connection. Returns
+           ``None`` when :meth:`send_email` does not need a connection: in
+           testing mode, or when the server is a maildir.
+        """
+        if getattr(threading.currentThread(), 'testing', False):
+            return None
+        smtp_server, smtp_port, smtp_user, smtp_password, smtp_encryption, smtp_debug = \
+            self._get_smtp_params(cr, uid, mail_server_id, context=context)
+        if smtp_server.startswith('maildir:/'):
+            return None
+        return self.connect(smtp_server, smtp_port, smtp_user, smtp_password, smtp_encryption or False, smtp_debug)
+
     def send_email(self, cr, uid, message, mail_server_id=None, smtp_server=None, smtp_port=None,
                    smtp_user=None, smtp_password=None, smtp_encryption=None, smtp_debug=False,
-                   context=None):
+                   context=None, smtp_session=None):
         """Sends an email directly (no queuing).
 
         No retries are done, the caller should handle MailDeliveryException in order to ensure that
@@ -391,6 +442,8 @@ class ir_mail_server(osv.osv):
         :param smtp_user: optional SMTP user, if mail_server_id is not passed
         :param smtp_password: optional SMTP password to use, if mail_server_id is not passed
         :param smtp_debug: optional SMTP debug flag, if mail_server_id is not passed
+        :param smtp_session: optional SMTP connection returned by :meth:`connect_server`,
+                             used instead of a new connection; it is left open
         :return: the Message-ID of the message that was just sent, if successfully sent, otherwise raises
                  MailDeliveryException and logs root cause.
         """
@@ -429,37 +482,18 @@ class ir_mail_server(osv.osv):
             _test_logger.info("skip sending email in test mode")
             return message['Message-Id']
 
-        # Get SMTP Server Details from Mail Server
-        mail_server = None
-        if mail_server_id:
-            mail_server = self.browse(cr, SUPERUSER_ID, mail_server_id)
-        elif not smtp_server:
-            mail_server_ids = self.search(cr, SUPERUSER_ID, [], order='sequence', limit=1)
-            if mail_server_ids:
-                mail_server = self.browse(cr, SUPERUSER_ID, mail_server_ids[0])
-
-        if mail_server:
-            smtp_server = mail_server.smtp_host
-            smtp_user = mail_server.smtp_user
-            smtp_password = mail_server.smtp_pass
-            smtp_port = mail_server.smtp_port
-            smtp_encryption = mail_server.smtp_encryption
-            smtp_debug = smtp_debug or mail_server.smtp_debug
-        else:
-            # we were passed an explicit smtp_server or nothing at all
-            smtp_server = smtp_server or tools.config.get('smtp_server')
-            smtp_port = tools.config.get('smtp_port', 25) if smtp_port is None else smtp_port
-            smtp_user = smtp_user or tools.config.get('smtp_user')
-            smtp_password = smtp_password or tools.config.get('smtp_password')
-            if smtp_encryption is None and tools.config.get('smtp_ssl'):
-                smtp_encryption = 'starttls' # STARTTLS is the new meaning of the smtp_ssl flag as of v7.0
-
-        if not smtp_server:
-            raise UserError(_("Missing SMTP Server")+ "\n" + _("Please define at least one SMTP server, or provide the SMTP parameters explicitly."))
+        if smtp_session is None:
+            smtp_server, smtp_port, smtp_user, smtp_password, smtp_encryption, smtp_debug = \
+                self._get_smtp_params(cr, uid, mail_server_id, smtp_server, smtp_port, smtp_user,
+                                      smtp_password, smtp_encryption, smtp_debug, context=context)
 
         try:
             message_id = message['Message-Id']
 
+            if smtp_session is not None:
+                smtp_session.sendmail(smtp_from, smtp_to_list, message.as_string())
+                return message_id
+
             # Add email in Maildir if smtp_server contains maildir.
             if smtp_server.startswith('maildir:/'):
                 from mailbox import Maildir
@@ -476,6 +510,8 @@ class ir_mail_server(osv.osv):
                 if smtp is not None:
                     smtp.quit()
         except Exception, e:
+            if smtp_session is not None:
+                smtp_server = getattr(smtp_session, '_host', smtp_server)
             msg = _("Mail delivery failed via SMTP server '%s'.\n%s: %s") % (tools.ustr(smtp_server),
                                                                              e.__class__.__name__,
                                                                              tools.ustr(e))
@@ -885,6 +885,18 @@ class ir_model_access(osv.osv):
         res = super(ir_model_access, self).unlink(cr, uid, ids, context=context)
         return res
 
+class ir_model_data_loads(dict):
+    """ The external identifiers loaded during a module update, as a dict
+    ``{(module, name): (model, res_id)}``. The keys added while ``recorded``
+    is a set are also added to it.
+    """
+    recorded = None
+
+    def __setitem__(self, key, value):
+        if self.recorded is not None:
+            self.recorded.add(key)
+        dict.__setitem__(self, key, value)
+
 class ir_model_data(osv.osv):
     """Holds external identifier keys for records in the database.
        This has two main uses:
@@ -948,7 +960,9 @@ class ir_model_data(osv.osv):
         osv.osv.__init__(self, pool, cr)
         # also stored in pool to avoid being discarded along with this osv instance
         if getattr(pool, 'model_data_reference_ids', None) is None:
-            self.pool.model_data_reference_ids = {}
+            self.pool.model_data_reference_ids = ir_model_data_loads()
+        if getattr(pool, 'model_data_prefetched', None) is None:
+            self.pool.model_data_prefetched = {}
         # put loads on the class, in order to share it among all instances
         type(self).loads = self.pool.model_data_reference_ids
 
@@ -969,6 +983,9 @@ class ir_model_data(osv.osv):
         Return (id, res_model, res_id) or raise ValueError if not found
         """
         module, name = xmlid.split('.', 1)
+        data = self.pool.model_data_prefetched.get((module, name))
+        if data:
+            return data[:3]
         ids = self.search(cr, uid, [('module','=',module), ('name','=', name)])
         if not ids:
             raise ValueError('External ID not found in the system: %s' % (xmlid))
@@ -1034,6 +1051,57 @@ class ir_model_data(osv.osv):
         """
         return self.xmlid_to_object(cr, uid, "%s.%s" % (module, xml_id), raise_if_not_found=True, context=context)
 
+    def _prefetch_xmlids(self, cr, uid, xmlids):
+        """ Look up the external identifiers ``xmlids`` at once, for the calls
+        to :meth:`xmlid_lookup` and :meth:`_update` that follow, until
+        :meth:`_clear_prefetched` or :meth:`clear_caches` is called. Only the
+        identifiers of existing records are kept.
+        """
+        names_by_module = defaultdict(set)
+        for xmlid in xmlids:
+            module, _sep, name = xmlid.partition('.')
+            if name:
+                names_by_module[module].add(name)
+        rows = []
+        for module, names in names_by_module.iteritems():
+            for sub_names in cr.split_for_in_conditions(names):
+                cr.execute("""SELECT id, module, name, model, res_id, noupdate FROM ir_model_data
+                              WHERE module=%s AND name IN %s AND res_id IS NOT NULL""",
+                           (module, sub_names))
+                rows.extend(cr.fetchall())
+        res_ids_by_model = defaultdict(set)
+        for row in rows:
+            res_ids_by_model[row[3]].add(row[4])
+        existing = set()
+        for model, res_ids in res_ids_by_model.iteritems():
+            if model not in self.pool or not self.pool[model]._auto:
+                continue
+            for sub_ids in cr.split_for_in_conditions(res_ids):
+                cr.execute('SELECT id FROM "%s" WHERE id IN %%s' % self.pool[model]._table, (sub_ids,))
+                existing.update((model, res_id) for res_id, in cr.fetchall())
+        prefetched = self.pool.model_data_prefetched
+        for imd_id, module, name, model, res_id, noupdate in rows:
+            if (model, res_id) in existing:
+                prefetched[(module, name)] = (imd_id, model, res_id, noupdate)
+
+    def _clear_prefetched(self):
+        self.pool.model_data_prefetched.clear()
+
+    def _restore_loads(self, cr, uid, xmlids):
+        """ Mark the external identifiers ``xmlids`` as loaded, as if the data
+        that defines them had been loaded again.
+        """
+        names_by_module = defaultdict(set)
+        for module, name in xmlids:
+            names_by_module[module].add(name)
+        for module, names in names_by_module.iteritems():
+            for sub_names in cr.split_for_in_conditions(names):
+                cr.execute("""SELECT name, model, res_id FROM ir_model_data
+                              WHERE module=%s AND name IN %s AND res_id IS NOT NULL""",
+                           (module, sub_names))
+                for name, model, res_id in cr.fetchall():
+                    self.loads[(module, name)] = (model, res_id)
+
     def _update_dummy(self,cr, uid, model, module, xml_id=False, store=True):
         if not xml_id:
             return False
@@ -1058,6 +1126,7 @@ class ir_model_data(osv.osv):
         :returns: itself
         """
         self.xmlid_lookup.clear_cache(self)
+        self._clear_prefetched()
         return self
 
     def unlink(self, cr, uid, ids, context=None):
@@ -1076,11 +1145,16 @@ class ir_model_data(osv.osv):
             module, xml_id = xml_id.split('.')
         action_id = False
         if xml_id:
-            cr.execute('''SELECT imd.id, imd.res_id, md.id, imd.model, imd.noupdate
-                          FROM ir_model_data imd LEFT JOIN %s md ON (imd.res_id = md.id)
-                          WHERE imd.module=%%s AND imd.name=%%s''' % model_obj._table,
-                          (module, xml_id))
-            results = cr.fetchall()
+            data = self.pool.model_data_prefetched.get((module, xml_id))
+            if data and data[1] == model:
+                imd_id2, real_model, res_id2, noupdate_imd = data
+                results = [(imd_id2, res_id2, res_id2, real_model, noupdate_imd)]
+            else:
+                cr.execute('''SELECT imd.id, imd.res_id, md.id, imd.model, imd.noupdate
+                              FROM ir_model_data imd LEFT JOIN %s md ON (imd.res_id = md.id)
+                              WHERE imd.module=%%s AND imd.name=%%s''' % model_obj._table,
+                              (module, xml_id))
+                results = cr.fetchall()
             for imd_id2,res_id2,real_id2,real_model,noupdate_imd in results:
                 # In update mode, do not update a record if it's ir.model.data is flagged as noupdate
                 if mode == 'update' and noupdate_imd:
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import __builtin__
 import collections
 import copy
 import cStringIO
@@ -30,7 +31,7 @@ import openerp.tools.lru
 from openerp.exceptions import QWebException
 from openerp.fields import Datetime
 from openerp.http import request
-from openerp.tools.safe_eval import safe_eval as eval
+from openerp.tools.safe_eval import safe_eval as eval, test_expr, _BUILTINS, _SAFE_OPCODES
 from openerp.osv import osv, orm, fields
 from openerp.tools import html_escape as escape
 from openerp.tools.misc import find_in_path
@@ -86,22 +87,51 @@ class FileSystemLoader(object):
                 arch = etree.tostring(root, encoding='utf-8', xml_declaration=True)
                 return arch
 
+class _EvalScope(dict):
+    """ Local namespace of an expression evaluated in a QWebContext: names are
+    looked up in the builtins of safe_eval, then in the context (except ``cr``
+    and ``loader``), and are ``None`` otherwise. The names assigned by the
+    expression are kept in the scope itself, so the context is never copied.
+    """
+    __slots__ = ['values']
+
+    def __init__(self, values):
+        super(_EvalScope, self).__init__()
+        self.values = values
+
+    def __missing__(self, key):
+        if key in _BUILTINS:
+            return _BUILTINS[key]
+        if key == 'cr' or key == 'loader':
+            return None
+        return self.values.get(key)
+
 class QWebContext(dict):
-    def __init__(self, cr, uid, data, loader=None, context=None):
+    def __init__(self, cr, uid, data, loader=None, context=None, nodes=None, codes=None):
         self.cr = cr
         self.uid = uid
         self.loader = loader
         self.context = context
+        # precompiled nodes of the template being rendered, see QWeb.compile_node()
+        self.nodes = nodes
+        # code objects of the expressions of the template being rendered
+        self.codes = codes
         dic = dict(data)
         super(QWebContext, self).__init__(dic)
         self['defined'] = lambda key: key in self
 
     def safe_eval(self, expr):
-        locals_dict = collections.defaultdict(lambda: None)
-        locals_dict.update(self)
-        locals_dict.pop('cr', None)
-        locals_dict.pop('loader', None)
-        return eval(expr, None, locals_dict, nocopy=True, locals_builtins=True)
+        """ Evaluate ``expr`` like safe_eval(). The expressions of a compiled
+        template are only checked and compiled once, then their code object is
+        evaluated directly.
+        """
+        codes = self.codes
+        code = codes.get(expr) if codes is not None else None
+        if code is None:
+            code = test_expr(expr, _SAFE_OPCODES)
+            if codes is not None:
+                codes[expr] = code
+        return __builtin__.eval(code, {'__builtins__': _BUILTINS}, _EvalScope(self))
 
     def copy(self):
         """ Clones the current context, conserving all data and metadata
@@ -109,11 +139,20 @@ class QWebContext(dict):
         """
         return QWebContext(self.cr, self.uid, dict.copy(self),
                            loader=self.loader,
-                           context=self.context)
+                           context=self.context,
+                           nodes=self.nodes,
+                           codes=self.codes)
 
     def __copy__(self):
         return self.copy()
 
+class _QWebNode(object):
+    """ Precompiled template element: the attributes of the element are sorted
+    out once, so that rendering the element does not look at them again.
+    """
+    __slots__ = ['element', 'tag', 'debug', 'groups', 'attributes',
+                 'template_attributes', 't_render', 'children', 'text', 'tail']
+
 class QWeb(orm.AbstractModel):
     """ Base QWeb rendering engine
 
@@ -147,6 +186,9 @@ class QWeb(orm.AbstractModel):
 
         self._render_tag = self.prefixed_methods('render_tag_')
         self._render_att = self.prefixed_methods('render_att_')
+        # static attributes can be rendered at compile time, unless
+        # render_attribute() depends on the rendering context
+        self._static_attributes = type(self).render_attribute.im_func is QWeb.render_attribute.im_func
 
     def prefixed_methods(self, prefix):
         """ Extracts all methods prefixed by ``prefix``, and returns a mapping
@@ -167,12 +209,44 @@ class QWeb(orm.AbstractModel):
         self._render_tag[tag] = func
 
     def get_template(self, name, qwebcontext):
+        return self._parse_template(name, self._load_template(name, qwebcontext), qwebcontext)
+
+    def get_compiled_template(self, name, qwebcontext):
+        """ Return the root element of template ``name``, the dict of the
+        precompiled nodes of its tree (see :meth:`compile_node`), and the dict
+        of the code objects of its expressions, filled while rendering.
+
+        The result is cached by template source: the template is only parsed
+        and compiled again when the loader returns another source for it, like
+        views do once modified, or when rendered in another language.
+        """
+        document = self._load_template(name, qwebcontext)
+        key = None
+        if isinstance(document, basestring) and document.startswith("<?xml"):
+            key = (name, document)
+            try:
+                return self.pool.qweb_cache[key]
+            except KeyError:
+                pass
+
+        element = self._parse_template(name, document, qwebcontext)
+        element.attrib.pop("name", False)
+        nodes = {}
+        self.compile_node(element, nodes)
+        codes = {}
+        if key is not None:
+            self.pool.qweb_cache[key] = element, nodes, codes
+        return element, nodes, codes
+
+    def _load_template(self, name, qwebcontext):
         origin_template = qwebcontext.get('__caller__') or qwebcontext['__stack__'][0]
         try:
-            document = qwebcontext.loader(name)
+            return qwebcontext.loader(name)
         except ValueError:
             raise_qweb_exception(QWebTemplateNotFound, message="Loader could not find template %r" % name, template=origin_template)
 
+    def _parse_template(self, name, document, qwebcontext):
+        origin_template = qwebcontext.get('__caller__') or qwebcontext['__stack__'][0]
         if hasattr(document, 'documentElement'):
             dom = document
         elif document.startswith("<?xml"):
@@ -249,55 +323,106 @@ class QWeb(orm.AbstractModel):
         qwebcontext['__stack__'] = stack
         qwebcontext['xmlid'] = str(stack[0]) # Temporary fix
 
-        element = self.get_template(id_or_xml_id, qwebcontext)
-        element.attrib.pop("name", False)
-        return self.render_node(element, qwebcontext, generated_attributes=qwebcontext.pop('generated_attributes', ''))
-
-    def render_node(self, element, qwebcontext, generated_attributes=''):
-        t_render = None
-        template_attributes = {}
+        element, nodes, codes = self.get_compiled_template(id_or_xml_id, qwebcontext)
+        qwebcontext.nodes = nodes
+        qwebcontext.codes = codes
+        return self._render_node(nodes[element], qwebcontext, generated_attributes=qwebcontext.pop('generated_attributes', ''))
 
-        debugger = element.get('t-debug')
-        if debugger is not None:
-            if openerp.tools.config['dev_mode']:
-                __import__(debugger).set_trace()  # pdb, ipdb, pudb, ...
-            else:
-                _logger.warning("@t-debug in template '%s' is only available in --dev mode" % qwebcontext['__template__'])
+    def compile_node(self, element, nodes):
+        """ Precompile ``element`` and its descendants, and return the node of
+        ``element``. The nodes are added to ``nodes``, a dict mapping elements
+        to their node.
+        """
+        node = nodes[element] = _QWebNode()
+        node.element = element
+        node.tag = unicode(element.tag)
+        node.debug = element.get('t-debug')
+        node.groups = None
+        node.attributes = attributes = []
+        node.template_attributes = template_attributes = {}
+        node.t_render = None
 
         for (attribute_name, attribute_value) in element.attrib.iteritems():
             attribute_name = unicode(attribute_name)
             if attribute_name == "groups":
-                cr = qwebcontext.get('request') and qwebcontext['request'].cr or None
-                uid = qwebcontext.get('request') and qwebcontext['request'].uid or None
-                can_see = self.user_has_groups(cr, uid, groups=attribute_value) if cr and uid else False
-                if not can_see:
-                    return element.tail and self.render_tail(element.tail, element, qwebcontext) or ''
+                node.groups = attribute_value
 
             attribute_value = attribute_value.encode("utf8")
 
             if attribute_name.startswith("t-"):
                 for attribute in self._render_att:
                     if attribute_name[2:].startswith(attribute):
-                        attrs = self._render_att[attribute](
-                            self, element, attribute_name, attribute_value, qwebcontext)
-                        for att, val in attrs:
-                            if not val: continue
-                            generated_attributes += self.render_attribute(element, att, val, qwebcontext)
+                        attributes.append((self._render_att[attribute], attribute_name, attribute_value))
                         break
                 else:
                     if attribute_name[2:] in self._render_tag:
-                        t_render = attribute_name[2:]
+                        node.t_render = attribute_name[2:]
                     template_attributes[attribute_name[2:]] = attribute_value
+            elif self._static_attributes:
+                # static attributes are rendered as (None, None, string)
+                static = _build_attribute(attribute_name, attribute_value)
+                if attributes and attributes[-1][:2] == (None, None):
+                    static = attributes.pop()[2] + static
+                attributes.append((None, None, static))
             else:
-                generated_attributes += self.render_attribute(element, attribute_name, attribute_value, qwebcontext)
+                attributes.append((None, attribute_name, attribute_value))
 
-        if t_render:
-            result = self._render_tag[t_render](self, element, template_attributes, generated_attributes, qwebcontext)
+        node.children = [
+            self.compile_node(child, nodes)
+            for child in element.iterchildren(tag=etree.Element)
+        ]
+        node.text = element.text
+        node.tail = element.tail
+        return node
+
+    def _get_node(self, element, qwebcontext):
+        """ Return the precompiled node of ``element`` in the template being
+        rendered, or compile it.
+        """
+        nodes = getattr(qwebcontext, 'nodes', None)
+        node = nodes.get(element) if nodes else None
+        if node is None:
+            node = self.compile_node(element, {})
+        return node
+
+    def render_node(self, element, qwebcontext, generated_attributes=''):
+        return self._render_node(self._get_node(element, qwebcontext), qwebcontext, generated_attributes)
+
+    def _render_node(self, node, qwebcontext, generated_attributes=''):
+        element = node.element
+
+        if node.debug is not None:
+            if openerp.tools.config['dev_mode']:
+                __import__(node.debug).set_trace()  # pdb, ipdb, pudb, ...
+            else:
+                _logger.warning("@t-debug in template '%s' is only available in --dev mode" % qwebcontext['__template__'])
+
+        if node.groups is not None:
+            cr = qwebcontext.get('request') and qwebcontext['request'].cr or None
+            uid = qwebcontext.get('request') and qwebcontext['request'].uid or None
+            can_see = self.user_has_groups(cr, uid, groups=node.groups) if cr and uid else False
+            if not can_see:
+                return node.tail and self.render_tail(node.tail, element, qwebcontext) or ''
+
+        for att, attribute_name, attribute_value in node.attributes:
+            if att is None:
+                if attribute_name is None:
+                    generated_attributes += attribute_value
+                else:
+                    generated_attributes += self.render_attribute(element, attribute_name, attribute_value, qwebcontext)
+                continue
+            for name, value in att(self, element, attribute_name, attribute_value, qwebcontext):
+                if not value: continue
+                generated_attributes += self.render_attribute(element, name, value, qwebcontext)
+
+        if node.t_render:
+            # tags may alter their template attributes
+            result = self._render_tag[node.t_render](self, element, dict(node.template_attributes), generated_attributes, qwebcontext)
         else:
-            result = self.render_element(element, template_attributes, generated_attributes, qwebcontext)
+            result = self._render_element(node, node.template_attributes, generated_attributes, qwebcontext)
 
-        if element.tail:
-            result += self.render_tail(element.tail, element, qwebcontext)
+        if node.tail:
+            result += self.render_tail(node.tail, element, qwebcontext)
 
         if isinstance(result, unicode):
             return result.encode('utf-8')
@@ -309,14 +434,19 @@ class QWeb(orm.AbstractModel):
         # generated_attributes: generated attributes
         # qwebcontext: values
         # inner: optional innerXml
-        name = unicode(element.tag)
+        node = self._get_node(element, qwebcontext)
+        return self._render_element(node, template_attributes, generated_attributes, qwebcontext, inner)
+
+    def _render_element(self, node, template_attributes, generated_attributes, qwebcontext, inner=None):
+        element = node.element
+        name = node.tag
         if inner:
             g_inner = inner.encode('utf-8') if isinstance(inner, unicode) else inner
         else:
-            g_inner = [] if element.text is None else [self.render_text(element.text, element, qwebcontext)]
-            for current_node in element.iterchildren(tag=etree.Element):
+            g_inner = [] if node.text is None else [self.render_text(node.text, element, qwebcontext)]
+            for child in node.children:
                 try:
-                    g_inner.append(self.render_node(current_node, qwebcontext,
+                    g_inner.append(self._render_node(child, qwebcontext,
                         generated_attributes= name == "t" and generated_attributes or ''))
                 except QWebException:
                     raise
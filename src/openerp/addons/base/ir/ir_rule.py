@@ -8,6 +8,15 @@ from openerp.osv import fields, osv, expression
 from openerp.tools.safe_eval import safe_eval as eval
 from openerp.tools.misc import unquote as unquote
 
+def _freeze(value):
+    """ Return a hashable version of a domain or of a value in a domain. The
+        type of values is kept, as ``1`` and ``True`` are not the same in SQL.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return (type(value), value)
+
+
 class ir_rule(osv.osv):
     _name = 'ir.rule'
     _order = 'name'
@@ -85,40 +94,59 @@ class ir_rule(osv.osv):
         (_check_model_name, 'Rules can not be applied on the Record Rules model.', ['model_id']),
     ]
 
-    @tools.ormcache('uid', 'model_name', 'mode')
-    def _compute_domain(self, cr, uid, model_name, mode="read"):
+    @tools.ormcache('model_name', 'mode')
+    def _get_rules(self, cr, uid, model_name, mode="read"):
+        """ Return the active rules of ``model_name`` for ``mode``, as a tuple
+            of triples ``(rule_id, domain_force, group_ids)``, where
+            ``group_ids`` is empty for global rules. The result does not depend
+            on the user.
+        """
         if mode not in self._MODES:
             raise ValueError('Invalid mode: %r' % (mode,))
-
-        if uid == SUPERUSER_ID:
-            return None
-        cr.execute("""SELECT r.id
+        cr.execute("""SELECT r.id, r.domain_force, array_agg(g_rel.group_id)
                 FROM ir_rule r
                 JOIN ir_model m ON (r.model_id = m.id)
+                LEFT JOIN rule_group_rel g_rel ON (g_rel.rule_group_id = r.id)
                 WHERE m.model = %s
                 AND r.active is True
                 AND r.perm_""" + mode + """
-                AND (r.id IN (SELECT rule_group_id FROM rule_group_rel g_rel
-                            JOIN res_groups_users_rel u_rel ON (g_rel.group_id = u_rel.gid)
-                            WHERE u_rel.uid = %s) OR r.global)""", (model_name, uid))
-        rule_ids = [x[0] for x in cr.fetchall()]
-        if rule_ids:
-            # browse user as super-admin root to avoid access errors!
-            user = self.pool.get('res.users').browse(cr, SUPERUSER_ID, uid)
+                GROUP BY r.id
+                ORDER BY r.id""", (model_name,))
+        return tuple(
+            (rule_id, domain_force, frozenset(gid for gid in group_ids if gid))
+            for rule_id, domain_force, group_ids in cr.fetchall()
+        )
+
+    @tools.ormcache('uid')
+    def _get_user_groups(self, cr, uid):
+        """ Return the ids of the groups of the user ``uid``. """
+        cr.execute("SELECT gid FROM res_groups_users_rel WHERE uid=%s", (uid,))
+        return frozenset(row[0] for row in cr.fetchall())
+
+    @tools.ormcache('uid', 'model_name', 'mode')
+    def _compute_domain(self, cr, uid, model_name, mode="read"):
+        if mode not in self._MODES:
+            raise ValueError('Invalid mode: %r' % (mode,))
+
+        if uid == SUPERUSER_ID:
+            return None
+        rules = self._get_rules(cr, uid, model_name, mode)
+        if rules:
+            user_groups = self._get_user_groups(cr, uid)
+            rules = [rule for rule in rules if not rule[2] or rule[2] & user_groups]
+        if rules:
+            eval_context = self._eval_context(cr, uid)
             global_domains = []                 # list of domains
-            group_domains = {}                  # map: group -> list of domains
-            for rule in self.browse(cr, SUPERUSER_ID, rule_ids):
-                # read 'domain' as UID to have the correct eval context for the rule.
-                rule_domain = self.read(cr, uid, [rule.id], ['domain'])[0]['domain']
-                dom = expression.normalize_domain(rule_domain)
-                for group in rule.groups:
-                    if group in user.groups_id:
-                        group_domains.setdefault(group, []).append(dom)
-                if not rule.groups:
+            group_domains = []                  # list of domains
+            for rule_id, domain_force, group_ids in rules:
+                dom = expression.normalize_domain(eval(domain_force, eval_context) if domain_force else [])
+                if group_ids:
+                    group_domains.append(dom)
+                else:
                     global_domains.append(dom)
             # combine global domains and group domains
             if group_domains:
-                group_domain = expression.OR(map(expression.OR, group_domains.values()))
+                group_domain = expression.OR(group_domains)
             else:
                 group_domain = []
             domain = expression.AND(global_domains + [group_domain])
@@ -129,16 +157,52 @@ class ir_rule(osv.osv):
         """ Deprecated, use `clear_caches` instead. """
         self.clear_caches()
 
+    def _compile_domain(self, cr, model_name, domain):
+        """ Return the SQL fragments ``(where_clause, where_clause_params,
+            tables)`` implementing ``domain`` on ``model_name``.
+
+            The operator ``child_of`` is translated into a subquery, so that
+            the fragments of most rules do not depend on the database contents.
+            Such fragments are kept in the registry's rule cache, and are
+            shared by the users whose rules give the same domain, i.e., the
+            users with the same groups and the same values for the fields used
+            in the rules. Clearing the ormcache does not invalidate them.
+        """
+        try:
+            key = (model_name, _freeze(domain))
+            hash(key)
+        except TypeError:
+            key = (model_name, None)
+        try:
+            where_clause, where_clause_params, tables = self.pool.rule_cache[key]
+            return list(where_clause), list(where_clause_params), list(tables)
+        except KeyError:
+            pass
+
+        # _where_calc is called as superuser. This means that rules can
+        # involve objects on which the real uid has no acces rights.
+        # This means also there is no implicit restriction (e.g. an object
+        # references another object the user can't see).
+        count = cr.sql_log_count
+        query = self.pool[model_name]._where_calc(cr, SUPERUSER_ID, domain, active_test=False,
+                                                  context={'hierarchy_subquery': True})
+        if key[1] is not None and cr.sql_log_count == count:
+            # the SQL does not depend on the database contents
+            self.pool.rule_cache[key] = (tuple(query.where_clause), tuple(query.where_clause_params),
+                                         tuple(query.tables))
+        return query.where_clause, query.where_clause_params, query.tables
+
     def domain_get(self, cr, uid, model_name, mode='read', context=None):
+        start = time.time()
         dom = self._compute_domain(cr, uid, model_name, mode)
         if dom:
-            # _where_calc is called as superuser. This means that rules can
-            # involve objects on which the real uid has no acces rights.
-            # This means also there is no implicit restriction (e.g. an object
-            # references another object the user can't see).
-            query = self.pool[model_name]._where_calc(cr, SUPERUSER_ID, dom, active_test=False)
-            return query.where_clause, query.where_clause_params, query.tables
-        return [], [], ['"' + self.pool[model_name]._table + '"']
+            result = self._compile_domain(cr, model_name, dom)
+        else:
+            result = [], [], ['"' + self.pool[model_name]._table + '"']
+        stat = self.pool.rule_stats[model_name]
+        stat[0] += 1
+        stat[1] += time.time() - start
+        return result
 
     def unlink(self, cr, uid, ids, context=None):
         res = super(ir_rule, self).unlink(cr, uid, ids, context=context)
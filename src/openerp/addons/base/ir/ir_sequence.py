@@ -2,14 +2,18 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 import logging
 import pytz
+import threading
 import time
 
 from datetime import datetime, timedelta
-from openerp import _, api, fields, models
+from openerp import _, api, fields, models, tools
 from openerp.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+# protects the numbers preallocated by the current process
+_blocks_lock = threading.Lock()
+
 
 def _create_sequence(cr, seq_name, number_increment, number_next):
     """ Create a PostreSQL sequence.
@@ -52,16 +56,31 @@ def _alter_sequence(cr, seq_name, number_increment=None, number_next=None):
         statement += " RESTART WITH %d" % (number_next, )
     cr.execute(statement)
 
-def _select_nextval(cr, seq_name):
-    cr.execute("SELECT nextval('%s')" % seq_name)
-    return cr.fetchone()
+def _select_nextval(cr, seq_name, count=1):
+    cr.execute("SELECT nextval('%s') FROM generate_series(1, %%s)" % seq_name, (count,))
+    return [row[0] for row in cr.fetchall()]
 
-def _update_nogap(self, number_increment):
-    number_next = self.number_next
+def _select_nextval_block(seq, seq_name, count=1):
+    """ Return ``count`` numbers of the PostgreSQL sequence ``seq_name``. They
+    are taken from the numbers preallocated by the current process when the
+    sequence ``seq`` has a block size.
+    """
+    if not seq.block_size:
+        return _select_nextval(seq.env.cr, seq_name, count)
+    with _blocks_lock:
+        block = seq.pool.sequence_blocks.setdefault(seq_name, [])
+        if len(block) < count:
+            block.extend(_select_nextval(seq.env.cr, seq_name, max(seq.block_size, count - len(block))))
+        numbers = block[:count]
+        del block[:count]
+    return numbers
+
+def _update_nogap(self, number_increment, count=1):
     self.env.cr.execute("SELECT number_next FROM %s WHERE id=%s FOR UPDATE NOWAIT" % (self._table, self.id))
-    self.env.cr.execute("UPDATE %s SET number_next=number_next+%s WHERE id=%s " % (self._table, number_increment, self.id))
+    number_next = self.env.cr.fetchone()[0]
+    self.env.cr.execute("UPDATE %s SET number_next=number_next+%s WHERE id=%s " % (self._table, number_increment * count, self.id))
     self.invalidate_cache(['number_next'], [self.id])
-    return number_next
+    return [number_next + index * number_increment for index in xrange(count)]
 
 
 class ir_sequence(models.Model):
@@ -120,6 +139,11 @@ class ir_sequence(models.Model):
     company_id = fields.Many2one('res.company', 'Company',
                                  default=lambda s: s.env['res.company']._company_default_get('ir.sequence'))
     use_date_range = fields.Boolean('Use subsequences per date_range')
+    block_size = fields.Integer('Preallocated Numbers', default=0,
+                                help="For the Standard implementation, number of numbers that each server process "
+                                "reserves at once, and then assigns without querying the database. The numbers are "
+                                "then no longer assigned in increasing order, and the unused ones are lost when the "
+                                "process stops.")
     date_range_ids = fields.One2many('ir.sequence.date_range', 'sequence_id', 'Subsequences')
 
     def init(self, cr):
@@ -144,11 +168,13 @@ class ir_sequence(models.Model):
         seq = super(ir_sequence, self).create(values)
         if values.get('implementation', 'standard') == 'standard':
             _create_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, values.get('number_increment', 1), values.get('number_next', 1))
+        self._clear_sequence_caches()
         return seq
 
     @api.multi
     def unlink(self):
         _drop_sequence(self.env.cr, ["ir_sequence_%03d" % x.id for x in self])
+        self._clear_sequence_caches()
         return super(ir_sequence, self).unlink()
 
     @api.multi
@@ -178,16 +204,43 @@ class ir_sequence(models.Model):
                     _create_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, i, n)
                     for sub_seq in seq.date_range_ids:
                         _create_sequence(self.env.cr, "ir_sequence_%03d_%03d" % (seq.id, sub_seq.id), i, n)
+        self._clear_sequence_caches()
         return super(ir_sequence, self).write(values)
 
-    def _next_do(self):
+    def _clear_sequence_caches(self):
+        """ Invalidate the sequences resolved by :meth:`_get_sequence_id` and
+        the numbers preallocated for the PostgreSQL sequences, in all the
+        processes. The sequences resolved in the current transaction are
+        invalidated again if it is rolled back.
+        """
+        def clear():
+            self.clear_caches()
+            with _blocks_lock:
+                self.pool.sequence_blocks.clear()
+        clear()
+        self.env.cr.after('rollback', clear)
+
+    def _next_do(self, count=None):
         if self.implementation == 'standard':
-            number_next = _select_nextval(self.env.cr, 'ir_sequence_%03d' % self.id)
+            numbers = _select_nextval_block(self, 'ir_sequence_%03d' % self.id, count or 1)
         else:
-            number_next = _update_nogap(self, self.number_increment)
-        return self.get_next_char(number_next)
+            numbers = _update_nogap(self, self.number_increment, count or 1)
+        return self._format_numbers(numbers, count)
+
+    def _format_numbers(self, numbers, count=None):
+        """ Return the interpolated string of the first number of ``numbers``,
+        or the list of those of all the numbers if ``count`` is given.
+        """
+        if count is None:
+            return self.get_next_char(numbers[0])
+        prefix, suffix = self._get_prefix_suffix()
+        return [prefix + '%%0%sd' % self.padding % number + suffix for number in numbers]
 
     def get_next_char(self, number_next):
+        interpolated_prefix, interpolated_suffix = self._get_prefix_suffix()
+        return interpolated_prefix + '%%0%sd' % self.padding % number_next + interpolated_suffix
+
+    def _get_prefix_suffix(self):
         def _interpolate(s, d):
             if s:
                 return s % d
@@ -218,7 +271,7 @@ class ir_sequence(models.Model):
             interpolated_suffix = _interpolate(self.suffix, d)
         except ValueError:
             raise UserError(_('Invalid prefix or suffix for sequence \'%s\'') % (self.get('name')))
-        return interpolated_prefix + '%%0%sd' % self.padding % number_next + interpolated_suffix
+        return interpolated_prefix, interpolated_suffix
 
     def _create_date_range_seq(self, date):
         year = fields.Date.from_string(date).strftime('%Y')
@@ -239,10 +292,11 @@ class ir_sequence(models.Model):
         })
         return seq_date_range
 
-    def _next(self):
-        """ Returns the next number in the preferred sequence in all the ones given in self."""
+    def _next(self, count=None):
+        """ Returns the next number in the preferred sequence in all the ones given in self,
+        or the list of the ``count`` next numbers if ``count`` is given."""
         if not self.use_date_range:
-            return self._next_do()
+            return self._next_do(count)
         # date mode
         dt = fields.Date.today()
         if self.env.context.get('ir_sequence_date'):
@@ -250,7 +304,7 @@ class ir_sequence(models.Model):
         seq_date = self.env['ir.sequence.date_range'].search([('sequence_id', '=', self.id), ('date_from', '<=', dt), ('date_to', '>=', dt)], limit=1)
         if not seq_date:
             seq_date = self._create_date_range_seq(dt)
-        return seq_date.with_context(ir_sequence_date_range=seq_date.date_from)._next()
+        return seq_date.with_context(ir_sequence_date_range=seq_date.date_from)._next(count)
 
     @api.multi
     def next_by_id(self):
@@ -259,29 +313,46 @@ class ir_sequence(models.Model):
         return self._next()
 
     @api.model
-    def next_by_code(self, sequence_code):
+    @tools.ormcache('self.env.uid', 'sequence_code', 'company_id')
+    def _get_sequence_id(self, sequence_code, company_id):
+        """ Return the id of the sequence with code ``sequence_code`` available
+            to the current user, preferably the one of company ``company_id``,
+            or ``False``.
+        """
+        company_ids = self.env['res.company'].search([]).ids + [False]
+        seq_ids = self.search(['&', ('code', '=', sequence_code), ('company_id', 'in', company_ids)])
+        preferred_sequences = [s for s in seq_ids if s.company_id and s.company_id.id == company_id]
+        seq_id = preferred_sequences[0] if preferred_sequences else seq_ids[:1]
+        return seq_id.id
+
+    @api.model
+    def next_by_code(self, sequence_code, **kwargs):
         """ Draw an interpolated string using a sequence with the requested code.
             If several sequences with the correct code are available to the user
             (multi-company cases), the one from the user's current company will
             be used.
 
+            :param int count: keyword-only, the number of strings to draw at
+                once; the list of the strings is then returned
             :param dict context: context dictionary may contain a
                 ``force_company`` key with the ID of the company to
                 use instead of the user's current company for the
                 sequence selection. A matching sequence for that
                 specific company will get higher priority.
         """
+        # count is keyword-only, so that the context may still be passed as
+        # the last positional argument in the traditional style
+        count = kwargs.pop('count', None)
+        if kwargs:
+            raise TypeError("next_by_code() got unexpected keyword arguments %s" % ", ".join(kwargs))
         self.check_access_rights('read')
-        company_ids = self.env['res.company'].search([]).ids + [False]
-        seq_ids = self.search(['&', ('code', '=', sequence_code), ('company_id', 'in', company_ids)])
-        if not seq_ids:
-            return False
         force_company = self.env.context.get('force_company')
         if not force_company:
             force_company = self.env.user.company_id.id
-        preferred_sequences = [s for s in seq_ids if s.company_id and s.company_id.id == force_company]
-        seq_id = preferred_sequences[0] if preferred_sequences else seq_ids[0]
-        return seq_id._next()
+        seq_id = self._get_sequence_id(sequence_code, force_company)
+        if not seq_id:
+            return False
+        return self.browse(seq_id)._next(count)
 
     @api.model
     def get_id(self, sequence_code_or_id, code_or_id='id'):
@@ -342,12 +413,12 @@ class ir_sequence_date_range(models.Model):
                                         help="Next number that will be used. This number can be incremented "
                                         "frequently so the displayed value might already be obsolete")
 
-    def _next(self):
+    def _next(self, count=None):
         if self.sequence_id.implementation == 'standard':
-            number_next = _select_nextval(self.env.cr, 'ir_sequence_%03d_%03d' % (self.sequence_id.id, self.id))
+            numbers = _select_nextval_block(self.sequence_id, 'ir_sequence_%03d_%03d' % (self.sequence_id.id, self.id), count or 1)
         else:
-            number_next = _update_nogap(self, self.sequence_id.number_increment)
-        return self.sequence_id.get_next_char(number_next)
+            numbers = _update_nogap(self, self.sequence_id.number_increment, count or 1)
+        return self.sequence_id._format_numbers(numbers, count)
 
     @api.multi
     def _alter_sequence(self, number_increment=None, number_next=None):
@@ -374,4 +445,5 @@ class ir_sequence_date_range(models.Model):
         if values.get('number_next'):
             seq_to_alter = self.filtered(lambda seq: seq.sequence_id.implementation == 'standard')
             seq_to_alter._alter_sequence(number_next=values.get('number_next'))
+            self.mapped('sequence_id')._clear_sequence_caches()
         return super(ir_sequence_date_range, self).write(values)
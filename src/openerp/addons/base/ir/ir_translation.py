@@ -372,6 +372,26 @@ class ir_translation(osv.osv):
             return tools.ustr(source)
         return trad
 
+    def _get_code_catalog(self, cr, uid, lang):
+        """ Return the translations of type ``code`` and ``sql_constraint`` in
+        ``lang``, as a dict ``{source: value}``. The catalog is read once per
+        registry and language, and kept until the translations are modified.
+        """
+        catalogs = self.pool.translation_catalogs
+        catalog = catalogs.get(lang)
+        if catalog is None:
+            cr.execute("""SELECT src, value
+                          FROM ir_translation
+                          WHERE lang=%s AND type IN ('code', 'sql_constraint') AND value != ''
+                          ORDER BY id""", (lang,))
+            catalog = catalogs[lang] = dict(cr.fetchall())
+        return catalog
+
+    def clear_caches(self):
+        """ Clear the caches, including the catalogs of code translations. """
+        super(ir_translation, self).clear_caches()
+        self.pool.translation_catalogs.clear()
+
     def _get_source(self, cr, uid, name, types, lang, source=None, res_id=None):
         """
         Returns the translation for the given combination of name, type, language
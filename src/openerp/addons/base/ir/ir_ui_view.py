@@ -29,12 +29,18 @@ from openerp.tools.parse_version import parse_version
 from openerp.tools.safe_eval import safe_eval as eval
 from openerp.tools.view_validation import valid_view
 from openerp.tools import misc
+from openerp.tools.misc import frozendict
 from openerp.tools.translate import TRANSLATED_ATTRS, encode, xml_translate, _
 
 _logger = logging.getLogger(__name__)
 
 MOVABLE_BRANDING = ['data-oe-model', 'data-oe-id', 'data-oe-field', 'data-oe-xpath', 'data-oe-source-id']
 
+# the number of (language, groups) profiles and of combined views that are
+# prepared after a module update, kept to a small part of the ormcache
+PREWARM_PROFILES = 4
+PREWARM_VIEWS = 1024
+
 def keep_query(*keep_params, **additional_params):
     """
     Generate a query string keeping the current request querystring's parameters specified
@@ -626,7 +632,94 @@ class view(osv.osv):
         * Returns the view with all requested fields
           .. note:: ``arch`` is always added to the fields list even if not
                     requested (similar to ``id``)
+
+        The result is cached, unless modules are being loaded, views are being
+        checked, or in dev mode.
+        """
+        if context is None: context = {}
+        if config['dev_mode'] or self.pool._init or \
+                'check_view_ids' in context or context.get('load_all_views'):
+            return self._read_combined(cr, uid, view_id, fields, context=context)
+        version = self._get_combined_version(cr, uid, view_id)
+        if version is None:
+            return self._read_combined(cr, uid, view_id, fields, context=context)
+        if fields:
+            fields = tuple(sorted({'arch', 'model'}.union(fields)))
+        view = self._read_combined_cached(cr, uid, view_id, fields, context.get('lang'),
+                                          bool(context.get('inherit_branding')), version)
+        return dict(view)
+
+    def _get_combined_version(self, cr, uid, view_id):
+        """ Return a value that changes whenever the combination of ``view_id``
+        may change for ``uid``: the last modification and the number of the
+        views of its model, and the groups of ``uid`` among those restricting
+        these views. Return ``None`` if the view has no model.
+        """
+        cr.execute("""SELECT max(v.write_date), count(v.id), array(
+                              SELECT DISTINCT r.group_id
+                                FROM ir_ui_view_group_rel r
+                                JOIN ir_ui_view w ON (w.id = r.view_id)
+                                JOIN res_groups_users_rel u ON (u.gid = r.group_id AND u.uid = %s)
+                               WHERE w.model = m.model
+                            ORDER BY r.group_id)
+                        FROM ir_ui_view m
+                        JOIN ir_ui_view v ON (v.model = m.model)
+                       WHERE m.id = %s
+                    GROUP BY m.model""", (uid, view_id))
+        row = cr.fetchone()
+        return row and (row[0], row[1], tuple(row[2]))
+
+    @tools.ormcache('view_id', 'fields', 'lang', 'inherit_branding', 'version')
+    def _read_combined_cached(self, cr, uid, view_id, fields, lang, inherit_branding, version):
+        """ Return the combined view, shared by the users whose groups give the
+        same ``version`` (see :meth:`_get_combined_version`).
+        """
+        context = {'lang': lang, 'inherit_branding': inherit_branding}
+        return self._read_combined(cr, uid, view_id, fields and list(fields), context=context)
+
+    def _prewarm_combined_views(self, cr, uid, modules):
+        """ Combine the primary views of the models that have views in
+        ``modules`` for the most common languages and groups of the active
+        users, so that the first requests after a module update do not have
+        to. At most ``PREWARM_PROFILES`` profiles and ``PREWARM_VIEWS`` views
+        in total are combined.
         """
+        if not modules:
+            return
+        t0 = time.time()
+        cr.execute("""SELECT min(id), lang
+                        FROM (SELECT u.id, p.lang, array(SELECT gid FROM res_groups_users_rel
+                                                          WHERE uid = u.id ORDER BY gid) AS groups
+                                FROM res_users u JOIN res_partner p ON (p.id = u.partner_id)
+                               WHERE u.active) AS profiles
+                    GROUP BY lang, groups
+                    ORDER BY count(*) DESC, min(id)
+                       LIMIT %s""", (PREWARM_PROFILES,))
+        users = cr.fetchall()
+        if not users:
+            return
+        cr.execute("""SELECT v.id FROM ir_ui_view v
+                       WHERE v.mode = 'primary' AND v.type != 'qweb' AND v.active
+                         AND v.model IN (SELECT w.model
+                                           FROM ir_ui_view w
+                                           JOIN ir_model_data d ON (d.model = 'ir.ui.view' AND d.res_id = w.id)
+                                          WHERE d.module IN %s)
+                    ORDER BY v.priority, v.id
+                       LIMIT %s""", (tuple(modules), PREWARM_VIEWS // len(users)))
+        view_ids = [row[0] for row in cr.fetchall()]
+        for user_id, lang in users:
+            for view_id in view_ids:
+                try:
+                    with cr.savepoint():
+                        # the fields read by fields_view_get()
+                        self.read_combined(cr, user_id, view_id, ['id', 'name', 'field_parent', 'type', 'model', 'arch'],
+                                           context={'lang': lang})
+                except Exception:
+                    _logger.warning("Could not combine view %s", view_id, exc_info=True)
+        _logger.info("Combined %d views for %d users in %.2fs", len(view_ids), len(users), time.time() - t0)
+
+    def _read_combined(self, cr, uid, view_id, fields=None, context=None):
+        """ Compute the result of :meth:`read_combined`. """
         if context is None: context = {}
         context = context.copy()
 
@@ -650,7 +743,7 @@ class view(osv.osv):
         if not v.inherit_id:
             arch_tree = view_arch
         else:
-            parent_view = self.read_combined(
+            parent_view = self._read_combined(
                 cr, uid, v.inherit_id.id, fields=fields, context=context)
             arch_tree = etree.fromstring(parent_view['arch'])
             arch_tree = self.apply_inheritance_specs(
@@ -860,6 +953,23 @@ class view(osv.osv):
             button.set('readonly', str(int(not can_click)))
         return node
 
+    def postprocess_arch(self, cr, user, model, arch, view_id, context=None):
+        """ Return the result of :meth:`postprocess_and_fields` on the
+        architecture ``arch`` (a string). The result is cached per user and
+        context, unless modules are being loaded or in dev mode.
+        """
+        if context is None:
+            context = {}
+        if config['dev_mode'] or self.pool._init:
+            return self.postprocess_and_fields(cr, user, model, etree.fromstring(arch), view_id, context=context)
+        arch, fields = self._postprocess_arch_cached(cr, user, model, arch, view_id, frozendict(context), context=context)
+        # callers commonly alter the field descriptions
+        return arch, copy.deepcopy(fields)
+
+    @tools.ormcache('user', 'model', 'arch', 'view_id', 'frozen_context')
+    def _postprocess_arch_cached(self, cr, user, model, arch, view_id, frozen_context, context=None):
+        return self.postprocess_and_fields(cr, user, model, etree.fromstring(arch), view_id, context=context)
+
     def postprocess_and_fields(self, cr, user, model, node, view_id, context=None):
         """ Return an architecture and a description of all the fields.
 
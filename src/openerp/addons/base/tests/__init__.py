@@ -9,6 +9,7 @@ import test_ir_actions
 import test_ir_attachment
 import test_ir_http
 import test_ir_filters
+import test_ir_model_data
 import test_ir_sequence
 import test_ir_sequence_date_range
 import test_ir_values
@@ -29,3 +30,5 @@ import test_view_validation
 import test_views
 import test_xmlrpc
 import test_res_partner_bank
+import test_safe_eval
+import test_session_store
@@ -226,9 +226,9 @@ class test_expression(common.TransactionCase):
         sql_query = self.query_list[2].get_sql()
         self.assertIn('res_partner', sql_query[0],
             "_auto_join off: ('bank_ids.sanitized_acc_number', 'like', '..') third query incorrect main table")
-        self.assertIn('"res_partner"."id" in (%s)', sql_query[1],
+        self.assertIn('"res_partner"."id" = ANY (%s)', sql_query[1],
             "_auto_join off: ('bank_ids.sanitized_acc_number', 'like', '..') third query incorrect where condition")
-        self.assertEqual(set([p_aa]), set(sql_query[2]),
+        self.assertEqual(set([p_aa]), set(sql_query[2][0].values),
             "_auto_join off: ('bank_ids.sanitized_acc_number', 'like', '..') third query incorrect parameter")
 
         # Do: cascaded one2many without _auto_join
@@ -278,9 +278,9 @@ class test_expression(common.TransactionCase):
         sql_query = self.query_list[0].get_sql()
         self.assertIn('"res_partner"', sql_query[0],
             "_auto_join on: ('bank_ids.id', 'in', [..]) query incorrect main table")
-        self.assertIn('"res_partner__bank_ids"."id" in (%s,%s)', sql_query[1],
+        self.assertIn('"res_partner__bank_ids"."id" = ANY (%s)', sql_query[1],
             "_auto_join on: ('bank_ids.id', 'in', [..]) query incorrect where condition")
-        self.assertEqual(set([b_aa, b_ab]), set(sql_query[2]),
+        self.assertEqual(set([b_aa, b_ab]), set(sql_query[2][0].values),
             "_auto_join on: ('bank_ids.id', 'in', [..]) query incorrect parameter")
 
         # Do: 2 cascaded one2many with _auto_join, test final leaf is an id
@@ -300,13 +300,13 @@ class test_expression(common.TransactionCase):
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect join")
         self.assertIn('"res_partner_bank" as "res_partner__child_ids__bank_ids"', sql_query[0],
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect join")
-        self.assertIn('"res_partner__child_ids__bank_ids"."id" in (%s,%s)', sql_query[1],
+        self.assertIn('"res_partner__child_ids__bank_ids"."id" = ANY (%s)', sql_query[1],
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect where condition")
         self.assertIn('"res_partner"."id"="res_partner__child_ids"."parent_id"', sql_query[1],
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect join condition")
         self.assertIn('"res_partner__child_ids"."id"="res_partner__child_ids__bank_ids"."partner_id"', sql_query[1],
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect join condition")
-        self.assertEqual(set([b_aa, b_ba]), set(sql_query[2][-2:]),
+        self.assertEqual(set([b_aa, b_ba]), set(sql_query[2][-1].values),
             "_auto_join on: ('child_ids.bank_ids.id', 'in', [..]) query incorrect parameter")
 
         # --------------------------------------------------
@@ -350,7 +350,7 @@ class test_expression(common.TransactionCase):
             "_auto_join on for state_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect main table")
         self.assertIn('"res_country_state" as "res_partner__state_id"', sql_query[0],
             "_auto_join on for state_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect join")
-        self.assertIn('"res_partner__state_id"."country_id" in (%s)', sql_query[1],
+        self.assertIn('"res_partner__state_id"."country_id" = ANY (%s)', sql_query[1],
             "_auto_join on for state_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect where condition")
         self.assertIn('"res_partner"."state_id"="res_partner__state_id"."id"', sql_query[1],
             "_auto_join on for state_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect join condition")
@@ -385,7 +385,7 @@ class test_expression(common.TransactionCase):
         sql_query = self.query_list[1].get_sql()
         self.assertIn('"res_partner"', sql_query[0],
             "_auto_join on for country_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect main table")
-        self.assertIn('"res_partner"."state_id" in', sql_query[1],
+        self.assertIn('"res_partner"."state_id" = ANY (%s)', sql_query[1],
             "_auto_join on for country_id: ('state_id.country_id.code', 'like', '..') query 2 incorrect where condition")
 
         # Do: many2one with 2 _auto_join
@@ -520,6 +520,51 @@ class test_expression(common.TransactionCase):
         self.assertEqual(expression.distribute_not(source), expect,
             "distribute_not on long expression applied wrongly")
 
+    def test_41_optimize_domain(self):
+        Partner = self.registry('res.partner')
+
+        def optimize(domain):
+            return expression.optimize_domain(Partner, expression.normalize_domain(domain))
+
+        self.assertEqual(optimize(['|', ('id', '=', 1), ('id', 'in', [2, 3])]), [('id', 'in', [1, 2, 3])])
+        self.assertEqual(optimize([('id', 'in', [1, 2]), ('id', 'in', [2, 3])]), [('id', 'in', [2])])
+        self.assertEqual(optimize([('parent_id', 'not in', [1]), ('parent_id', 'not in', [2])]),
+                         [('parent_id', 'not in', [1, 2])])
+        self.assertEqual(optimize([('name', '=', 'A'), ('name', '=', 'A')]), [('name', '=', 'A')])
+        self.assertEqual(optimize(['|', ('name', '=', 'A'), (1, '=', 1)]), [(1, '=', 1)])
+        # not equivalent: null values satisfy 'not in', but not '!='
+        domain = ['|', ('parent_id', '!=', 1), ('parent_id', 'not in', [2])]
+        self.assertEqual(optimize(domain), domain)
+        # not equivalent: 0 is a null value for 'in'
+        domain = ['|', ('color', '=', 0), ('color', '=', 1)]
+        self.assertEqual(optimize(domain), domain)
+
+    def test_42_compiled_domain(self):
+        cr, uid = self.cr, self.uid
+        Partner = self.registry('res.partner')
+
+        e1 = expression.expression(cr, uid, [('id', 'in', [1, 2]), ('name', 'ilike', 'foo')], Partner, {})
+        query1, params1 = e1.to_sql()
+        self.assertIn('= ANY', query1)
+        self.assertEqual(params1, [expression.Array([1, 2]), '%foo%'])
+
+        # same shape: the query is reused, with the new parameters
+        e2 = expression.expression(cr, uid, [('id', 'in', [3, 4, 5]), ('name', 'ilike', 'bar')], Partner, {})
+        self.assertIsNotNone(e2._compiled)
+        query2, params2 = e2.to_sql()
+        self.assertEqual(query2, query1)
+        self.assertEqual(params2, [expression.Array([3, 4, 5]), '%bar%'])
+        self.assertEqual(e2.get_tables(), e1.get_tables())
+
+        # different shape
+        e3 = expression.expression(cr, uid, [('id', 'in', [3, False]), ('name', 'ilike', 'bar')], Partner, {})
+        self.assertIsNone(e3._compiled)
+        self.assertIn('IS NULL', e3.to_sql()[0])
+
+        # not compiled: depends on the database contents
+        domain = [('parent_id', 'child_of', [1])]
+        self.assertIsNone(expression.expression(cr, uid, domain, Partner, {}).get_shape()[0])
+
     def test_translate_search(self):
         Country = self.registry('res.country')
         be = self.ref('base.be')
@@ -0,0 +1,99 @@
+from StringIO import StringIO
+
+from mock import patch
+
+from openerp.modules import loading
+from openerp.tests import common
+from openerp import tools
+from openerp.tools.assertion_report import assertion_report
+from openerp.tools.convert import convert_xml_import, xml_import
+from lxml import etree
+
+
+class TestIrModelData(common.TransactionCase):
+
+    def setUp(self):
+        super(TestIrModelData, self).setUp()
+        self.IMD = self.env['ir.model.data']
+        self.addCleanup(self.IMD._clear_prefetched)
+
+    def test_prefetch(self):
+        """ Prefetched external identifiers are used by the lookups. """
+        group = self.env.ref('base.group_no_one')
+        self.IMD._prefetch_xmlids(['base.group_no_one', 'base.no_such_xmlid', 'no_module'])
+        self.assertEqual(self.registry.model_data_prefetched.keys(), [('base', 'group_no_one')])
+        self.IMD.xmlid_lookup.clear_cache(self.IMD)
+        self.assertEqual(self.IMD.xmlid_lookup('base.group_no_one')[1:], ('res.groups', group.id))
+
+        # identifiers are prefetched for existing records only
+        partner = self.env['res.partner'].create({'name': 'Prefetched'})
+        self.IMD.create({'module': 'test', 'name': 'partner', 'model': 'res.partner', 'res_id': partner.id})
+        self.cr.execute("DELETE FROM res_partner WHERE id=%s", (partner.id,))
+        self.IMD._prefetch_xmlids(['test.partner'])
+        self.assertNotIn(('test', 'partner'), self.registry.model_data_prefetched)
+
+        self.IMD.clear_caches()
+        self.assertFalse(self.registry.model_data_prefetched)
+
+    def test_convert(self):
+        """ The identifiers of an xml file are prefetched while it is loaded. """
+        xml = """<odoo>
+            <record id="partner" model="res.partner">
+                <field name="name">Converted</field>
+                <field name="parent_id" ref="base.main_partner"/>
+                <field name="category_id" eval="[(6, 0, [ref('base.res_partner_category_0')])]"/>
+            </record>
+            <menuitem id="menu" name="Converted" parent="base.menu_administration" groups="base.group_no_one,-base.group_portal"/>
+        </odoo>"""
+        importer = xml_import(self.cr, 'test', {}, 'init')
+        self.assertEqual(importer.collect_xmlids(etree.fromstring(xml)), {
+            'test.partner', 'base.main_partner', 'base.res_partner_category_0',
+            'test.menu', 'base.menu_administration', 'base.group_no_one', 'base.group_portal',
+        })
+
+        convert_xml_import(self.cr, 'test', StringIO(xml), mode='init')
+        self.assertFalse(self.registry.model_data_prefetched)
+        partner = self.env.ref('test.partner')
+        self.assertEqual(partner.parent_id, self.env.ref('base.main_partner'))
+
+        # loading it again updates the same records
+        xml = xml.replace('>Converted<', '>Updated<')
+        convert_xml_import(self.cr, 'test', StringIO(xml), mode='update')
+        self.assertEqual(self.env.ref('test.partner'), partner)
+        self.assertEqual(partner.name, 'Updated')
+
+
+class TestSkipUnchangedData(common.TransactionCase):
+    # the models of test_workflow are only loaded after base
+    at_install = False
+    post_install = True
+
+    def test_update_twice(self):
+        """ With --skip-unchanged-data, an unchanged data file is skipped on
+        update, and its records are not deleted as unreferenced. """
+        if not self.env['ir.module.module'].search([('name', '=', 'test_workflow'), ('state', '=', 'installed')]):
+            self.skipTest("test_workflow is not installed")
+        IMD = self.env['ir.model.data']
+        filenames = ['data.xml', 'ir.model.access.csv']
+        self.cr.execute("DELETE FROM ir_module_data_file WHERE module='test_workflow'")
+        xmlids = IMD.search([('module', '=', 'test_workflow')])
+        self.assertTrue(xmlids)
+
+        converted = []
+        convert_file = tools.convert_file
+
+        def convert(cr, module, filename, *args):
+            converted.append(filename)
+            return convert_file(cr, module, filename, *args)
+
+        with patch.object(tools, 'convert_file', convert), \
+                patch.dict(tools.config.options, skip_unchanged_data=True):
+            for index in range(2):
+                IMD.loads.clear()
+                loading._load_data_files(self.cr, 'test_workflow', filenames, {}, 'update', 'data', assertion_report())
+                self.assertEqual(converted, filenames, 'the files should be loaded once, then skipped')
+
+        IMD._process_end(['test_workflow'])
+        self.assertEqual(IMD.search([('module', '=', 'test_workflow')]), xmlids)
+        for xmlid in xmlids:
+            self.assertTrue(self.env[xmlid.model].browse(xmlid.res_id).exists(), '%s.%s' % (xmlid.module, xmlid.name))
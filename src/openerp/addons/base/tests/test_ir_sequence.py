@@ -223,5 +223,49 @@ class Test_ir_sequence_init(common.TransactionCase):
         read_sequence = sequence.next_by_id(cr, uid, seq_id)
         assert read_sequence == "0001", 'The actual sequence value must be 1. reading : %s' % read_sequence
 
+
+class Test_ir_sequence_batch(common.TransactionCase):
+
+    def test_count(self):
+        """ Draw several numbers at once. """
+        Sequence = self.env['ir.sequence']
+        Sequence.create({'code': 'test_sequence_batch', 'name': 'Test sequence', 'prefix': 'B', 'padding': 3})
+        Sequence.create({'code': 'test_sequence_batch_no_gap', 'name': 'Test sequence', 'prefix': 'N',
+                         'number_increment': 2, 'implementation': 'no_gap'})
+        self.assertEqual(Sequence.next_by_code('test_sequence_batch', count=3), ['B001', 'B002', 'B003'])
+        self.assertEqual(Sequence.next_by_code('test_sequence_batch'), 'B004')
+        self.assertEqual(Sequence.next_by_code('test_sequence_batch_no_gap', count=2), ['N1', 'N3'])
+        self.assertEqual(Sequence.next_by_code('test_sequence_batch_no_gap'), 'N5')
+        # traditional style, with the context as positional argument
+        self.assertEqual(self.registry('ir.sequence').next_by_code(self.cr, self.uid, 'test_sequence_batch', {}, count=2),
+                         ['B005', 'B006'])
+        self.assertFalse(Sequence.next_by_code('test_sequence_batch_missing', count=2))
+
+    def test_block(self):
+        """ Preallocate the numbers of a sequence by blocks. """
+        seq = self.env['ir.sequence'].create({'code': 'test_sequence_block', 'name': 'Test sequence', 'block_size': 10})
+        self.assertEqual([seq.next_by_id() for i in xrange(3)], ['1', '2', '3'])
+        self.assertEqual(self.registry.sequence_blocks['ir_sequence_%03d' % seq.id], range(4, 11))
+        self.assertEqual(seq._next(count=12), [str(n) for n in xrange(4, 16)])
+        # another process would start after the blocks of this one
+        self.registry.sequence_blocks.clear()
+        self.assertEqual(seq.next_by_id(), '21')
+        # changing the sequence discards the preallocated numbers
+        seq.write({'number_next': 100})
+        self.assertEqual(seq.next_by_id(), '100')
+
+    def test_resolution(self):
+        """ Sequences are resolved by code and company. """
+        Sequence = self.env['ir.sequence']
+        company = self.env['res.company'].create({'name': 'Test Sequence Company'})
+        self.env.user.company_ids += company
+        Sequence.create({'code': 'test_sequence_company', 'name': 'Test sequence', 'prefix': 'A',
+                         'company_id': False})
+        self.assertEqual(Sequence.next_by_code('test_sequence_company'), 'A1')
+        Sequence.create({'code': 'test_sequence_company', 'name': 'Test sequence', 'prefix': 'C',
+                         'company_id': company.id})
+        self.assertEqual(Sequence.with_context(force_company=company.id).next_by_code('test_sequence_company'), 'C1')
+        self.assertEqual(Sequence.next_by_code('test_sequence_company'), 'A2')
+
 if __name__ == "__main__":
     unittest.main()
@@ -76,6 +76,46 @@ class TestORM(common.TransactionCase):
         with self.assertRaises(Exception):
             self.partner.unlink(cr, uid2, [p1,p2])
 
+    def testRuleCache(self):
+        """ The SQL of a record rule is shared by the users with the same
+            groups, and is kept when the caches are cleared """
+        cr, uid, uid2 = self.cr, self.uid, self.uid2
+        company = self.registry('res.company')
+        main_company = self.users.browse(cr, uid, uid2).company_id.id
+        child_company = company.create(cr, uid, {'name': 'Child', 'parent_id': main_company})
+        other_company = company.create(cr, uid, {'name': 'Other'})
+        pa = self.partner.create(cr, uid, {'name': 'A', 'company_id': child_company})
+        pb = self.partner.create(cr, uid, {'name': 'B', 'company_id': other_company})
+        partner_model = self.registry('ir.model').search(cr, uid, [('model', '=', 'res.partner')])[0]
+        self.ir_rule.create(cr, uid, {'name': 'Partners of my companies',
+                                      'domain_force': "[('company_id', 'child_of', [user.company_id.id])]",
+                                      'model_id': partner_model})
+        employee_gid = self.ref('base.group_user')
+        uid3 = self.users.create(cr, uid, {'name': 'test user 3', 'login': 'test3',
+                                           'groups_id': [(6, 0, [employee_gid])]})
+
+        def entries():
+            return [key for key in self.registry.rule_cache.d if key[0] == 'res.partner']
+
+        partners = self.partner.search(cr, uid2, [('id', 'in', [pa, pb])])
+        self.assertEqual(partners, [pa])
+        cached = entries()
+        self.assertTrue(cached)
+        stat = self.registry.rule_stats['res.partner']
+        count = stat[0]
+
+        # another user with the same groups reuses the same SQL
+        self.users.write(cr, uid, [uid2], {'name': 'test user 2'})
+        partners = self.partner.search(cr, uid3, [('id', 'in', [pa, pb])])
+        self.assertEqual(partners, [pa])
+        self.assertEqual(entries(), cached)
+        self.assertGreater(stat[0], count)
+
+        # the hierarchy is evaluated by the query itself
+        company.write(cr, uid, [other_company], {'parent_id': main_company})
+        partners = self.partner.search(cr, uid2, [('id', 'in', [pa, pb])])
+        self.assertItemsEqual(partners, [pa, pb])
+
     def test_multi_read(self):
         record_id = self.partner.create(self.cr, UID, {'name': 'MyPartner1'})
         records = self.partner.read(self.cr, UID, [record_id])
@@ -166,6 +206,61 @@ class TestORM(common.TransactionCase):
                         ['date'], ['date:month', 'date:day'], lazy=False)
         self.assertEqual(len(rg), len(all_partners))
 
+    def test_create_batch(self):
+        """ create() inserts a list of values at once """
+        cr, uid = self.cr, self.uid
+        be = self.ref('base.be')
+        State = self.env['res.country.state']
+        self.assertTrue(State._create_batchable())
+        self.assertFalse(self.env['res.country']._create_batchable())
+
+        states = State.create([
+            {'name': 'Foo', 'code': 'FO', 'country_id': be},
+            {'name': 'Bar', 'code': 'BA', 'country_id': be},
+        ])
+        self.assertEqual(len(states), 2)
+        self.assertEqual(states.mapped('name'), ['Foo', 'Bar'])
+        self.assertEqual(states.mapped('create_uid').ids, [uid])
+
+        ids = self.registry('res.country.state').create(cr, uid, [{'name': 'Baz', 'code': 'BZ', 'country_id': be}])
+        self.assertEqual(State.browse(ids).mapped('code'), ['BZ'])
+
+    def test_create_batch_triggers(self):
+        """ create() collects the triggers of the fields given to each record """
+        Title = self.registry('res.partner.title')
+        calls = []
+        def _store_get_values(self, cr, uid, ids, fields, context):
+            calls.append((sorted(ids), sorted(fields)))
+            return _store_get_values.origin(self, cr, uid, ids, fields, context)
+        Title._patch_method('_store_get_values', _store_get_values)
+        self.addCleanup(Title._revert_method, '_store_get_values')
+
+        ids = Title.create(self.cr, self.uid, [
+            {'name': 'Foo', 'shortcut': 'F.'},
+            {'name': 'Bar'},
+            {'name': 'Baz', 'shortcut': 'B.'},
+        ])
+        self.assertItemsEqual(calls, [
+            (sorted([ids[0], ids[2]]), ['name', 'shortcut']),
+            ([ids[1]], ['name']),
+        ])
+
+    @mute_logger('openerp.models', 'openerp.sql_db')
+    def test_load_batch(self):
+        """ load() creates records together, and reports the failing rows """
+        cr, uid = self.cr, self.uid
+        State = self.registry('res.country.state')
+        fields = ['name', 'code', 'country_id/id']
+        result = State.load(cr, uid, fields, [['Foo', 'FO', 'base.be'], ['Bar', 'BA', 'base.be']])
+        self.assertFalse(result['messages'])
+        self.assertEqual(State.read(cr, uid, result['ids'], ['code']),
+                         [{'id': result['ids'][0], 'code': 'FO'}, {'id': result['ids'][1], 'code': 'BA'}])
+
+        result = State.load(cr, uid, fields, [['Foo', 'FO', 'base.be'], ['Bar', '', 'base.be']])
+        self.assertIs(result['ids'], False)
+        self.assertEqual(len(result['messages']), 1)
+        self.assertEqual(result['messages'][0]['record'], 1)
+
     def test_write_duplicate(self):
         cr, uid, p1 = self.cr, self.uid, self.p1
         self.partner.write(cr, uid, [p1, p1], {'name': 'X'})
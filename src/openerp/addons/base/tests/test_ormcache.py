@@ -1,6 +1,13 @@
 
+import os
+import stat
+import tempfile
+import unittest
+
 from openerp.tests import common
 from openerp.tools import get_cache_key_counter
+from openerp.tools import shared_cache
+from openerp.tools.shared_cache import SharedCache, SharedCacheServer
 
 class TestOrmcache(common.TransactionCase):
     def test_ormcache(self):
@@ -34,3 +41,89 @@ class TestOrmcache(common.TransactionCase):
         self.assertEqual(counter.hit, hit + 2)
         self.assertEqual(counter.miss, miss + 1)
         self.assertIn(key, cache)
+
+
+class TestSharedCache(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(tempfile.mkdtemp(), 'ormcache.sock')
+        self.server = SharedCacheServer(16, path)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.cache = SharedCache('db', path)
+        self.other = SharedCache('db', path)
+        self.addCleanup(shared_cache.rollback, 'db')
+
+    def test_shared(self):
+        """ Entries are visible to all the clients of the server. """
+        key = ('res.users', TestSharedCache.test_shared, 1)
+        self.assertNotIn(key, self.cache)
+        self.cache[key] = {'a': [1, 2]}
+        shared_cache.commit('db')
+        self.assertEqual(self.other[key], {'a': [1, 2]})
+        self.assertEqual(SharedCache('otherdb', self.server.path).get(key), None)
+
+        # unpicklable values are simply not cached
+        self.cache[('res.users', 'lambda')] = lambda: None
+        shared_cache.commit('db')
+        self.assertNotIn(('res.users', 'lambda'), self.other)
+
+    def test_transaction(self):
+        """ Entries are only published when the transaction commits. """
+        self.cache[('a',)] = 1
+        self.assertEqual(self.cache[('a',)], 1)
+        self.assertNotIn(('a',), self.other)
+        self.assertEqual(self.cache.keys(), [('a',)])
+
+        shared_cache.rollback('db')
+        self.assertNotIn(('a',), self.cache)
+
+        self.cache[('a',)] = 2
+        shared_cache.commit('otherdb')
+        self.assertNotIn(('a',), self.other)
+        shared_cache.commit('db')
+        self.assertEqual(self.other[('a',)], 2)
+        self.assertEqual(self.other.keys(), [('a',)])
+
+    def test_unavailable(self):
+        """ The clients work without the server, as an empty cache. """
+        self.cache[('a',)] = 1
+        shared_cache.commit('db')
+        self.server.stop()
+        cache = SharedCache('db', self.server.path)
+        self.assertNotIn(('a',), cache)
+        del cache[('a',)]
+        self.assertEqual(cache.keys(), [])
+        self.assertEqual(cache.stats()['client_miss'], 0)
+        self.assertTrue(cache.stats()['client_err'])
+
+    def test_socket_directory(self):
+        """ The default socket is only accessible to the user. """
+        server = SharedCacheServer(16)
+        server.start()
+        try:
+            directory = os.path.dirname(server.path)
+            self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0700)
+            cache = SharedCache('db', server.path)
+            cache[('a',)] = 1
+            shared_cache.commit('db')
+            self.assertEqual(cache[('a',)], 1)
+        finally:
+            server.stop()
+        self.assertFalse(os.path.exists(directory))
+
+    def test_clear(self):
+        """ Clearing is host-wide, and done once per signaling sequence. """
+        self.cache[('a',)] = 1
+        shared_cache.commit('db')
+        self.other.clear()
+        self.assertNotIn(('a',), self.cache)
+
+        self.cache[('a',)] = 1
+        shared_cache.commit('db')
+        with self.cache.signaled(42):
+            self.cache.clear()
+        self.cache[('a',)] = 2
+        shared_cache.commit('db')
+        with self.other.signaled(42):
+            self.other.clear()
+        self.assertEqual(self.cache[('a',)], 2)
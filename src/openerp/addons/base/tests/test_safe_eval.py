@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from openerp.tools import safe_eval as safe_eval_module
+from openerp.tools.safe_eval import safe_eval, const_eval, code_cache_stats
+
+
+class TestCodeCache(unittest.TestCase):
+    def setUp(self):
+        safe_eval_module._code_cache.clear()
+
+    def test_hit(self):
+        stats = code_cache_stats()
+        self.assertEqual(safe_eval("a + 1", {'a': 1}), 2)
+        self.assertEqual(safe_eval("a + 1", {'a': 41}), 42)
+        new_stats = code_cache_stats()
+        self.assertEqual(new_stats['entries'], 1)
+        self.assertEqual(new_stats['miss'], stats['miss'] + 1)
+        self.assertEqual(new_stats['hit'], stats['hit'] + 1)
+
+    def test_mode(self):
+        """ the same expression in another mode is compiled separately """
+        values = {}
+        safe_eval("x = 1", values, mode="exec", nocopy=True)
+        self.assertEqual(values['x'], 1)
+        with self.assertRaises(SyntaxError):
+            safe_eval("x = 1")
+
+    def test_opcodes(self):
+        """ an expression validated with a set of opcodes is not accepted
+        with a more restrictive one """
+        self.assertEqual(safe_eval("a", {'a': 1}), 1)
+        with self.assertRaises(ValueError):
+            const_eval("a")
+
+    def test_forbidden(self):
+        """ invalid expressions are rejected every time """
+        for _ in xrange(2):
+            with self.assertRaises(NameError):
+                safe_eval("a.__class__", {'a': 1})
+            with self.assertRaises(ValueError):
+                safe_eval("import os", mode="exec")
+        self.assertEqual(code_cache_stats()['entries'], 0)
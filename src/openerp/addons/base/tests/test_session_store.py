@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import time
+import unittest
+
+from openerp.http import OpenERPSession
+from openerp.tools.session_store import FilesystemSessionStore, SqliteSessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    store_class = FilesystemSessionStore
+    ttl = 100
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = self.store_class(self.path, self.ttl, OpenERPSession)
+
+    def create(self, **values):
+        session = self.store.new()
+        session.update(values)
+        self.store.save(session)
+        return session.sid
+
+    def test_save_get(self):
+        sid = self.create(login='admin')
+        self.assertEqual(self.store.get(sid).login, 'admin')
+        self.store.delete(self.store.get(sid))
+        self.assertIsNone(self.store.get(sid).login)
+
+    def test_active_session(self):
+        """ A session in use outlives the lifetime of the sessions, even if
+        its content does not change. """
+        active = self.create(login='active')
+        idle = self.create(login='idle')
+        # both sessions were last used 60 seconds ago
+        self.store._touch(active, time.time() + self.ttl - 60)
+        self.store._touch(idle, time.time() + self.ttl - 60)
+
+        session = self.store.get(active)
+        self.store.save(session)
+        self.store.gc(time.time() + self.ttl - 30)
+
+        self.assertEqual(self.store.get(active).login, 'active')
+        self.assertIsNone(self.store.get(idle).login)
+
+
+class TestSqliteSessionStore(TestSessionStore):
+    store_class = SqliteSessionStore
@@ -3,7 +3,8 @@
 
 from lxml.etree import XMLSyntaxError
 import unittest
-from openerp.tools.translate import quote, unquote, xml_translate, html_translate
+from openerp.tools.translate import quote, unquote, xml_translate, html_translate, _
+from openerp.tests.common import TransactionCase
 
 class TranslationToolsTestCase(unittest.TestCase):
 
@@ -167,3 +168,28 @@ class TranslationToolsTestCase(unittest.TestCase):
         self.assertEquals(result, """<i class="fa-check"/>""")
         result = html_translate(lambda term: term, source)
         self.assertEquals(result, source)
+
+
+class TestCodeTranslation(TransactionCase):
+
+    def test_code_catalog(self):
+        """ _() translates from the catalog of code translations, which is
+        reloaded when the translations change """
+        if not self.env['res.lang'].with_context(active_test=False).search([('code', '=', 'fr_FR')]):
+            self.env['res.lang'].load_lang('fr_FR')
+        context = {'lang': 'fr_FR'}
+        self.assertEqual(_("Code catalog test"), u"Code catalog test")
+        self.assertIn('fr_FR', self.registry.translation_catalogs)
+
+        self.env['ir.translation'].create({
+            'type': 'code',
+            'name': 'addons/base/tests/test_translate.py',
+            'lang': 'fr_FR',
+            'src': "Code catalog test",
+            'value': "Test du catalogue",
+        })
+        self.assertNotIn('fr_FR', self.registry.translation_catalogs)
+        self.assertEqual(_("Code catalog test"), u"Test du catalogue")
+        self.assertEqual(_("Code catalog test"), u"Test du catalogue")
+        context = {'lang': 'en_US'}
+        self.assertEqual(_("Code catalog test"), u"Code catalog test")
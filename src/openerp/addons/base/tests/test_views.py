@@ -6,9 +6,11 @@ import unittest
 
 from lxml import etree as ET
 from lxml.builder import E
+from mock import patch
 
 from psycopg2 import IntegrityError
 
+from openerp.addons.base.ir import ir_ui_view
 from openerp.tests import common
 import openerp.tools
 
@@ -1182,6 +1184,73 @@ class TestOptionalViews(ViewCase):
             )
         )
 
+class TestViewCache(ViewCase):
+    """ The combined and post-processed views are cached once the modules are
+    loaded.
+    """
+    at_install = False
+    post_install = True
+
+    def setUp(self):
+        super(TestViewCache, self).setUp()
+        # post_install tests run before the registry is marked as loaded
+        init = self.registry._init
+        self.registry._init = False
+        self.addCleanup(setattr, self.registry, '_init', init)
+        self.View = self.env['ir.ui.view']
+        self.base = self.View.create({
+            'model': 'ir.ui.view',
+            'arch': """<form><field name="name"/></form>""",
+        })
+
+    def extend(self, arch, **values):
+        return self.View.create(dict(values, model='ir.ui.view', inherit_id=self.base.id, arch=arch))
+
+    def combined_arch(self):
+        return self.View.read_combined(self.base.id, ['arch'])['arch']
+
+    def test_groups(self):
+        group = self.env['res.groups'].create({'name': 'View Cache Test'})
+        self.extend("""<field name="name" position="after"><field name="model"/></field>""",
+                    groups_id=[(6, 0, [group.id])])
+        self.assertNotIn('name="model"', self.combined_arch())
+        self.env.user.write({'groups_id': [(4, group.id)]})
+        self.assertIn('name="model"', self.combined_arch())
+
+    def test_modification(self):
+        self.assertNotIn('name="model"', self.combined_arch())
+        ext = self.extend("""<field name="name" position="after"><field name="model"/></field>""")
+        self.assertIn('name="model"', self.combined_arch())
+        # modifications that do not invalidate the caches are seen too
+        self.cr.execute("""UPDATE ir_ui_view SET active=false, write_date=write_date + interval '1 second'
+                           WHERE id=%s""", (ext.id,))
+        self.assertNotIn('name="model"', self.combined_arch())
+
+    def test_fields_view_get(self):
+        result = self.View.fields_view_get(self.base.id)
+        result['fields']['name']['string'] = 'Altered'
+        self.assertEqual(self.View.fields_view_get(self.base.id)['fields']['name']['string'], 'View Name')
+
+    @openerp.tools.mute_logger('openerp.addons.base.ir.ir_ui_view')
+    def test_prewarm(self):
+        """ A limited number of views is combined after an update, and a view
+        that fails does not abort the transaction. """
+        combined = []
+
+        def read_combined(self, cr, uid, view_id, fields=None, context=None):
+            combined.append(view_id)
+            if len(combined) == 1:
+                cr.execute("SELECT 1/0")
+            return read_combined.origin(self, cr, uid, view_id, fields, context=context)
+
+        self.View._patch_method('read_combined', read_combined)
+        self.addCleanup(self.View._revert_method, 'read_combined')
+        with patch.object(ir_ui_view, 'PREWARM_PROFILES', 1), patch.object(ir_ui_view, 'PREWARM_VIEWS', 3):
+            self.View._prewarm_combined_views(['base'])
+        self.assertEqual(len(combined), 3)
+        self.assertEqual(self.View.search([('id', '=', self.base.id)]), self.base)
+
+
 class TestXPathExtentions(common.BaseCase):
     def test_hasclass(self):
         tree = E.node(
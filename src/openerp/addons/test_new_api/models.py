@@ -119,6 +119,7 @@ class Category(models.Model):
 
 class Discussion(models.Model):
     _name = 'test_new_api.discussion'
+    _prefetch_groups = {'content': ['message_concat']}
 
     name = fields.Char(string='Title', required=True,
         help="General description of what this discussion is about.")
@@ -3,6 +3,7 @@
 #
 from datetime import date, datetime
 
+from openerp import api
 from openerp.exceptions import AccessError, except_orm
 from openerp.tests import common
 from openerp.tools import mute_logger
@@ -131,6 +132,43 @@ class TestNewFields(common.TransactionCase):
         })
         check_stored(discussion3)
 
+    def test_11_stored_batch(self):
+        """ test the recomputation of stored fields on several records """
+        discussion1 = self.env.ref('test_new_api.discussion_0')
+        discussion2 = discussion1.copy({'name': 'Another discussion'})
+        discussion1.messages[0].discussion = discussion2
+        messages = discussion1.messages + discussion2.messages
+        self.assertTrue(discussion1.messages)
+
+        stat = self.registry.recompute_stats['test_new_api.message.name']
+        batches = stat[0]
+        with self.env.norecompute():
+            discussion1.name = 'Foo'
+            discussion2.name = 'Bar'
+        messages.recompute()
+        self.assertEqual(stat[0], batches + 1)
+
+        self.env.invalidate_all()
+        for msg in messages:
+            self.assertEqual(msg.name, "[%s] %s" % (msg.discussion.name, msg.author.name))
+
+        # an override of _write sees the recomputed values
+        written = []
+
+        @api.multi
+        def _write(self, vals):
+            written.append((self.ids, vals))
+            return _write.origin(self, vals)
+
+        Message = self.env['test_new_api.message']
+        Message._patch_method('_write', _write)
+        self.addCleanup(Message._revert_method, '_write')
+        with self.env.norecompute():
+            discussion1.name = 'Baz'
+            discussion2.name = 'Qux'
+        messages.recompute()
+        self.assertEqual(sorted(id for ids, vals in written for id in ids), sorted(messages.ids))
+
     def test_12_recursive(self):
         """ test recursively dependent fields """
         Category = self.env['test_new_api.category']
@@ -413,6 +451,29 @@ class TestNewFields(common.TransactionCase):
         with self.assertRaises(AccessError):
             Category.browse(cat_1).name
 
+    def test_32_prefetch_groups(self):
+        """ test lazy prefetch groups """
+        discussion = self.env.ref('test_new_api.discussion_0')
+        discussion.message_concat = 'Hello'
+
+        self.env.clear()
+        discussion.name
+        self.assertIn('moderator', discussion._cache)
+        self.assertNotIn('message_concat', discussion._cache)
+        self.assertEqual(discussion.message_concat, 'Hello')
+
+    def test_33_search_batches(self):
+        """ test iterating over search results by batches """
+        discussion = self.env.ref('test_new_api.discussion_0')
+        Message = self.env['test_new_api.message']
+        domain = [('discussion', '=', discussion.id)]
+
+        batches = list(Message._search_batches(domain, order='id', batch_size=2))
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+        self.assertEqual(
+            [rec.id for batch in batches for rec in batch],
+            Message.search(domain, order='id').ids)
+
     def test_40_new(self):
         """ test new records. """
         discussion = self.env.ref('test_new_api.discussion_0')
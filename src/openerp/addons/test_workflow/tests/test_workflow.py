@@ -68,6 +68,33 @@ class test_workflows(common.TransactionCase):
 
         model.unlink(self.cr, SUPERUSER_ID, [i])
 
+    def test_workflow_batch(self):
+        """ Signal the workflow instances of several records at once. """
+        model = self.registry('test.workflow.model.f')
+
+        ids = [model.create(self.cr, SUPERUSER_ID, {}) for _ in range(3)]
+        model.signal_workflow(self.cr, SUPERUSER_ID, ids[:1], 'a-b')
+        self.check_activities(model._name, ids[0], ['b'])
+
+        # the records in a are processed in batch, the one in b is left as is
+        result = model.signal_workflow(self.cr, SUPERUSER_ID, ids, 'a-b')
+        self.assertEqual(sorted(result), sorted(ids))
+        for i in ids:
+            self.check_activities(model._name, i, ['b'])
+            self.check_value(model._name, i, 2)
+
+        # the records stay in b until the trigger is set
+        model = self.registry('test.workflow.model')
+        trigger = self.registry('test.workflow.trigger')
+        ids = [model.create(self.cr, SUPERUSER_ID, {}) for _ in range(3)]
+        model.signal_workflow(self.cr, SUPERUSER_ID, ids, 'a-b')
+        for i in ids:
+            self.check_activities(model._name, i, ['b'])
+        trigger.write(self.cr, SUPERUSER_ID, [1], {'value': True})
+        model.step_workflow(self.cr, SUPERUSER_ID, ids)
+        for i in ids:
+            self.check_activities(model._name, i, ['c'])
+
     def test_workflow_a(self):
         model = self.registry('test.workflow.model.a')
 
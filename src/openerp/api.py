@@ -37,7 +37,7 @@ __all__ = [
     'model', 'multi', 'one',
     'cr', 'cr_context', 'cr_uid', 'cr_uid_context',
     'cr_uid_id', 'cr_uid_id_context', 'cr_uid_ids', 'cr_uid_ids_context',
-    'constrains', 'depends', 'onchange', 'returns',
+    'constrains', 'depends', 'onchange', 'returns', 'create_batchable',
 ]
 
 import logging
@@ -60,6 +60,8 @@ _logger = logging.getLogger(__name__)
 #  - method._returns: set by @returns, specifies return model
 #  - method._onchange: set by @onchange, specifies onchange fields
 #  - method.clear_cache: set by @ormcache, used to clear the cache
+#  - method._batchable: set by @create_batchable, specifies that an override of
+#    create() accepts a list of values
 #
 # On wrapping method only:
 #  - method._api: decorator function, used for re-applying decorator
@@ -67,7 +69,7 @@ _logger = logging.getLogger(__name__)
 #
 
 WRAPPED_ATTRS = ('__module__', '__name__', '__doc__', '_constrains',
-                 '_depends', '_onchange', '_returns', 'clear_cache')
+                 '_depends', '_onchange', '_returns', 'clear_cache', '_batchable')
 
 INHERITED_ATTRS = ('_returns',)
 
@@ -203,6 +205,23 @@ def depends(*args):
     return lambda method: decorate(method, '_depends', args)
 
 
+def create_batchable(method):
+    """ Decorate an override of ``create`` that also accepts a list of values,
+    and then returns the result of ``super().create`` for that list::
+
+        @api.create_batchable
+        def create(self, cr, uid, vals, context=None):
+            vals_list = vals if isinstance(vals, list) else [vals]
+            ...
+            return super(stock_move, self).create(cr, uid, vals, context=context)
+
+    The records of a model are only created together (see
+    :meth:`~openerp.models.Model.load`) when all the overrides of ``create``
+    are decorated. The decorator is not inherited by further overrides.
+    """
+    return decorate(method, '_batchable', True)
+
+
 def returns(model, downgrade=None, upgrade=None):
     """ Return a decorator for methods that return instances of ``model``.
 
@@ -7,7 +7,9 @@ import openerp
 from command import Command, main
 
 import deploy
+import qwebbench
 import scaffold
 import server
+import sessionbench
 import shell
 import start
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import werkzeug.test
+import werkzeug.wrappers
+
+import openerp
+from . import Command
+
+
+class QWebBench(Command):
+    """Measure the rendering time of QWeb reports and pages"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog="%s qwebbench" % sys.argv[0].split(os.path.sep)[-1],
+            description=self.__doc__,
+            epilog="Other arguments are server options, e.g. -d DATABASE.")
+        parser.add_argument('--report', action='append', dest='reports', metavar='REPORT',
+                            help="report to render (default account.report_invoice), may be repeated")
+        parser.add_argument('--records', type=int, default=10,
+                            help="number of records to render the reports on (default 10)")
+        parser.add_argument('--url', action='append', dest='urls', metavar='URL',
+                            help="page to render (default /, rendered with website.layout), may be repeated")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="number of renderings of each report and page (default 20)")
+        opts, server_args = parser.parse_known_args(args)
+
+        openerp.tools.config.parse_config(server_args)
+        dbname = openerp.tools.config['db_name']
+        if not dbname:
+            sys.exit("qwebbench: a database is required (-d DATABASE)")
+        # make the pages of the database reachable without a session
+        openerp.tools.config['dbfilter'] = '^%s$' % dbname
+        openerp.service.server.load_server_wide_modules()
+
+        with openerp.api.Environment.manage():
+            self.bench(dbname, opts)
+        return 0
+
+    def bench(self, dbname, opts):
+        registry = openerp.modules.registry.RegistryManager.get(dbname)
+        uid = openerp.SUPERUSER_ID
+        tests = []
+
+        for report_name in opts.reports or ['account.report_invoice']:
+            with registry.cursor() as cr:
+                report = registry['report']._get_report_from_name(cr, uid, report_name)
+                if not report:
+                    print "%s: report not found, skipped" % report_name
+                    continue
+                ids = registry[report.model].search(cr, uid, [], limit=opts.records, order='id desc')
+
+            def render_report(report_name=report_name, ids=ids):
+                with registry.cursor() as cr:
+                    registry['report'].get_html(cr, uid, ids, report_name)
+            tests.append(("%s (%d records)" % (report_name, len(ids)), render_report))
+
+        client = werkzeug.test.Client(openerp.service.wsgi_server.application,
+                                      werkzeug.wrappers.BaseResponse)
+        for url in opts.urls or ['/']:
+            response = client.get(url, buffered=True)
+            if response.status_code != 200:
+                print "%s: status %s, skipped" % (url, response.status)
+                continue
+
+            def render_page(url=url, count=itertools.count()):
+                # a distinct query string, so that the page is not served from the cache
+                client.get(url, query_string={'qwebbench': next(count)}, buffered=True)
+            tests.append((url, render_page))
+
+        print "%-40s %12s %12s" % ("", "uncached", "compiled")
+        for name, render in tests:
+            timings = []
+            for cached in (False, True):
+                render()
+                t0 = time.time()
+                for index in xrange(opts.repeat):
+                    if not cached:
+                        # parse and compile the templates at each rendering
+                        registry.qweb_cache.clear()
+                    render()
+                timings.append(1000 * (time.time() - t0) / opts.repeat)
+            print "%-40s %10.1fms %10.1fms" % (name, timings[0], timings[1])
+        print "%d compiled templates in cache" % len(registry.qweb_cache)
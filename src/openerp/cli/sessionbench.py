@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import openerp
+from openerp.tools.session_store import session_stores, PostgresSessionStore
+from . import Command
+
+
+class BenchPostgresSessionStore(PostgresSessionStore):
+    _table = 'http_session_bench'
+
+
+class SessionBench(Command):
+    """Measure the throughput of the HTTP session stores"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog="%s sessionbench" % sys.argv[0].split(os.path.sep)[-1],
+            description=self.__doc__,
+            epilog="Other arguments are server options; the postgresql store uses "
+                   "--session-store-db, or else -d DATABASE.")
+        parser.add_argument('--store', action='append', dest='stores', metavar='STORE',
+                            help="store to measure (default all), may be repeated")
+        parser.add_argument('--sessions', type=int, default=10000,
+                            help="number of sessions in the store (default 10000)")
+        parser.add_argument('--requests', type=int, default=10000,
+                            help="number of requests (default 10000)")
+        parser.add_argument('--write-ratio', type=float, default=0.1,
+                            help="proportion of requests that modify their session (default 0.1)")
+        opts, server_args = parser.parse_known_args(args)
+
+        openerp.tools.config.parse_config(server_args)
+        dbname = openerp.tools.config['session_store_db'] or openerp.tools.config['db_name']
+
+        print "%-12s %12s %12s %12s" % ("", "requests/s", "gc", "expire")
+        for name in opts.stores or sorted(session_stores):
+            if name == 'postgresql' and not dbname:
+                print "%-12s skipped, no database given" % name
+                continue
+            path = tempfile.mkdtemp(prefix='sessionbench-')
+            try:
+                if name == 'postgresql':
+                    store = BenchPostgresSessionStore(path, 3600, openerp.http.OpenERPSession, dbname)
+                    with store._cursor() as cr:
+                        cr.execute("TRUNCATE %s" % store._table)
+                else:
+                    store = session_stores[name](path, 3600, openerp.http.OpenERPSession)
+                self.bench(name, store, opts)
+            finally:
+                if name == 'postgresql':
+                    with store._cursor() as cr:
+                        cr.execute("DROP TABLE %s" % store._table)
+                shutil.rmtree(path)
+        return 0
+
+    def bench(self, name, store, opts):
+        sids = []
+        for index in xrange(opts.sessions):
+            session = store.new()
+            session.update(db='bench', uid=index, login='user%d' % index,
+                           context={'lang': 'en_US', 'tz': 'Europe/Brussels', 'uid': index})
+            store.save(session)
+            sids.append(session.sid)
+
+        # one request: load the session, maybe modify it, save it if needed
+        t0 = time.time()
+        for index in xrange(opts.requests):
+            session = store.get(random.choice(sids))
+            if random.random() < opts.write_ratio:
+                session['last_request'] = index
+            else:
+                # assigning the same value makes the session look modified
+                session['db'] = session['db']
+            store.save_if_modified(session)
+        rate = opts.requests / (time.time() - t0)
+
+        # garbage collection with no expired session, then with all of them
+        t0 = time.time()
+        store.gc()
+        gc_time = time.time() - t0
+        t0 = time.time()
+        store.gc(time.time() + 2 * store.ttl)
+        expire_time = time.time() - t0
+
+        print "%-12s %12.0f %10.1fms %10.1fms" % (name, rate, 1000 * gc_time, 1000 * expire_time)
@@ -47,6 +47,7 @@ import openerp
 from openerp.service.server import memory_info
 from openerp.service import security, model as service_model
 from openerp.tools.func import lazy_property
+from openerp.tools.session_store import create_session_store
 from openerp.tools import ustr, consteq
 
 _logger = logging.getLogger(__name__)
@@ -1082,6 +1083,7 @@ class OpenERPSession(werkzeug.contrib.sessions.Session):
         self.inited = False
         self.modified = False
         self.rotate = False
+        self.serialized = None      # content of the session in its store
         super(OpenERPSession, self).__init__(*args, **kwargs)
         self.inited = True
         self._default_values()
@@ -1364,15 +1366,7 @@ class OpenERPSession(werkzeug.contrib.sessions.Session):
 
 def session_gc(session_store):
     if random.random() < 0.001:
-        # we keep session one week
-        last_week = time.time() - 60*60*24*7
-        for fname in os.listdir(session_store.path):
-            path = os.path.join(session_store.path, fname)
-            try:
-                if os.path.getmtime(path) < last_week:
-                    os.unlink(path)
-            except OSError:
-                pass
+        session_store.gc()
 
 #----------------------------------------------------------
 # WSGI Layer
@@ -1477,9 +1471,9 @@ class Root(object):
     @lazy_property
     def session_store(self):
         # Setup http sessions
-        path = openerp.tools.config.session_dir
-        _logger.debug('HTTP sessions stored in: %s', path)
-        return werkzeug.contrib.sessions.FilesystemSessionStore(path, session_class=OpenERPSession)
+        store = create_session_store(OpenERPSession)
+        _logger.debug('HTTP sessions stored in: %s (%s)', store.path, type(store).__name__)
+        return store
 
     @lazy_property
     def nodb_routing_map(self):
@@ -269,10 +269,20 @@ IdType = (int, long, basestring, NewId)
 # maximum number of prefetched records
 PREFETCH_MAX = 1000
 
+# maximum number of records created at once by load()
+LOAD_BATCH_SIZE = 1000
+
 # special columns automatically created by the ORM
 LOG_ACCESS_COLUMNS = ['create_uid', 'create_date', 'write_uid', 'write_date']
 MAGIC_COLUMNS = ['id'] + LOG_ACCESS_COLUMNS
 
+
+def _create_downgrade(self, value, vals=None, *args, **kwargs):
+    """ Return the traditional-style output of create(): the id of the new
+    record, or the list of ids when given a list of values.
+    """
+    return value.ids if isinstance(vals, list) else value.id
+
 class BaseModel(object):
     """ Base class for OpenERP models.
 
@@ -320,6 +330,11 @@ class BaseModel(object):
     _needaction = False
     _translate = True # set to False to disable translations export for this model
 
+    # lazy prefetch groups: {group_name: [field_name, ...]}; the fields of a
+    # group are not prefetched with the other fields of the model, but only
+    # together, when one of them is accessed (e.g. large text/html columns)
+    _prefetch_groups = {}
+
     # dict of {field:method}, with method returning the (name_get of records, {id: fold})
     # to include in the _read_group, if grouped on this field
     _group_by_full = {}
@@ -1053,10 +1068,8 @@ class BaseModel(object):
         noupdate = False
 
         ids = []
-        for id, xid, record, info in self._convert_records(cr, uid,
-                self._extract_records(cr, uid, fields, data,
-                                      context=context, log=messages.append),
-                context=context, log=messages.append):
+        def load_record(id, xid, record, info):
+            """ Save a single record; return False if the transaction is broken. """
             try:
                 cr.execute('SAVEPOINT model_load_save')
             except psycopg2.InternalError, e:
@@ -1065,7 +1078,7 @@ class BaseModel(object):
                 if not any(message['type'] == 'error' for message in messages):
                     messages.append(dict(info, type='error',message=
                         u"Unknown database error: '%s'" % e))
-                break
+                return False
             try:
                 ids.append(ModelData._update(cr, uid, self._name,
                      current_module, record, mode=mode, xml_id=xid,
@@ -1091,6 +1104,47 @@ class BaseModel(object):
                 # Failed for some reason, perhaps due to invalid data supplied,
                 # rollback savepoint and keep going
                 cr.execute('ROLLBACK TO SAVEPOINT model_load_save')
+            return True
+
+        # the records without id nor external id are created together, unless
+        # an override of create() does not support it; when a batch fails, its
+        # records are saved one by one again, in order to report their errors
+        batch = []
+        batchable = self._create_batchable()
+        def load_batch():
+            if len(batch) > 1:
+                try:
+                    cr.execute('SAVEPOINT model_load_batch')
+                    ids.extend(self.create(cr, uid, [item[2] for item in batch],
+                                           context=dict(context or {}, install_mode=True)))
+                    cr.execute('RELEASE SAVEPOINT model_load_batch')
+                    del batch[:]
+                    return True
+                except Exception:
+                    _logger.debug("Batch creation failed, retrying record by record", exc_info=True)
+                    cr.execute('ROLLBACK TO SAVEPOINT model_load_batch')
+                    api.Environment(cr, uid, context or {}).clear()
+            while batch:
+                if not load_record(*batch.pop(0)):
+                    return False
+            return True
+
+        for id, xid, record, info in self._convert_records(cr, uid,
+                self._extract_records(cr, uid, fields, data,
+                                      context=context, log=messages.append),
+                context=context, log=messages.append):
+            if batchable and not id and not xid:
+                batch.append((id, xid, record, info))
+                if len(batch) < LOAD_BATCH_SIZE:
+                    continue
+                if not load_batch():
+                    break
+                continue
+            if not (load_batch() and load_record(id, xid, record, info)):
+                break
+        else:
+            load_batch()
+
         if any(message['type'] == 'error' for message in messages):
             cr.execute('ROLLBACK TO SAVEPOINT model_load')
             ids = False
@@ -1554,7 +1608,7 @@ class BaseModel(object):
                 raise UserError(_("No default view of type '%s' could be found !") % view_type)
 
         # Apply post processing, groups and modifiers etc...
-        xarch, xfields = View.postprocess_and_fields(cr, uid, self._name, etree.fromstring(result['arch']), view_id, context=ctx)
+        xarch, xfields = View.postprocess_arch(cr, uid, self._name, result['arch'], view_id, context=ctx)
         result['arch'] = xarch
         result['fields'] = xfields
 
@@ -1996,17 +2050,20 @@ class BaseModel(object):
                 value = value[0]
         return [(groupby['field'], '=', value)]
 
-    def _read_group_format_result(self, data, annotated_groupbys, groupby, groupby_dict, domain, context):
+    def _read_group_format_result(self, data, annotated_groupbys, groupby, groupby_dict, domain, context, labels=None):
         """
             Helper method to format the data contained in the dictionary data by 
             adding the domain corresponding to its values, the groupbys in the 
             context and by properly formatting the date/datetime values. 
+            The optional dictionary ``labels`` maps pairs (groupby, value) to
+            already formatted date/datetime values.
         """
         domain_group = [dom for gb in annotated_groupbys for dom in self._read_group_get_domain(gb, data[gb['groupby']])]
         for k,v in data.iteritems():
             gb = groupby_dict.get(k)
             if gb and gb['type'] in ('date', 'datetime') and v:
-                data[k] = babel.dates.format_date(v, format=gb['display_format'], locale=context.get('lang', 'en_US'))
+                label = labels and labels.get((k, v))
+                data[k] = label or babel.dates.format_date(v, format=gb['display_format'], locale=context.get('lang', 'en_US'))
 
         data['__domain'] = domain_group + domain 
         if len(groupby) - len(annotated_groupbys) >= 1:
@@ -2128,14 +2185,28 @@ class BaseModel(object):
 
         many2onefields = [gb['field'] for gb in annotated_groupbys if gb['type'] == 'many2one']
         if many2onefields:
-            data_ids = [r['id'] for r in fetched_data]
-            many2onefields = list(set(many2onefields))
-            data_dict = {d['id']: d for d in self.read(cr, uid, data_ids, many2onefields, context=context)} 
-            for d in fetched_data:
-                d.update(data_dict[d['id']])
+            # the group values are the ids of the records: name them with one
+            # name_get() per comodel, as superuser like read() does
+            self.check_field_access_rights(cr, uid, 'read', many2onefields, context=context)
+            for fname in set(many2onefields):
+                comodel = self.pool[self._fields[fname].comodel_name]
+                value_ids = list(set(d[fname] for d in fetched_data if d[fname]))
+                names = dict(comodel.name_get(cr, SUPERUSER_ID, value_ids, context=context))
+                for d in fetched_data:
+                    d[fname] = (d[fname], names[d[fname]]) if d[fname] in names else False
 
         data = map(lambda r: {k: self._read_group_prepare_data(k,v, groupby_dict, context) for k,v in r.iteritems()}, fetched_data)
-        result = [self._read_group_format_result(d, annotated_groupbys, groupby, groupby_dict, domain, context) for d in data]
+
+        # format the distinct date/datetime values once
+        labels = {}
+        locale = context.get('lang', 'en_US')
+        for gb in annotated_groupbys:
+            if gb['type'] in ('date', 'datetime'):
+                key = gb['groupby']
+                for value in set(d[key] for d in data if d[key]):
+                    labels[key, value] = babel.dates.format_date(value, format=gb['display_format'], locale=locale)
+
+        result = [self._read_group_format_result(d, annotated_groupbys, groupby, groupby_dict, domain, context, labels) for d in data]
         if lazy and groupby_fields[0] in self._group_by_full:
             # Right now, read_group only fill results in lazy mode (by default).
             # If you need to have the empty groups in 'eager' mode, then the
@@ -2339,26 +2410,11 @@ class BaseModel(object):
     def _drop_constraint(self, cr, source_table, constraint_name):
         cr.execute("ALTER TABLE %s DROP CONSTRAINT %s" % (source_table,constraint_name))
 
-    def _m2o_fix_foreign_key(self, cr, source_table, source_field, dest_model, ondelete):
+    def _m2o_fix_foreign_key(self, cr, source_table, source_field, dest_model, ondelete, constraints=None):
         # Find FK constraint(s) currently established for the m2o field,
         # and see whether they are stale or not
-        cr.execute("""SELECT confdeltype as ondelete_rule, conname as constraint_name,
-                             cl2.relname as foreign_table
-                      FROM pg_constraint as con, pg_class as cl1, pg_class as cl2,
-                           pg_attribute as att1, pg_attribute as att2
-                      WHERE con.conrelid = cl1.oid
-                        AND cl1.relname = %s
-                        AND con.confrelid = cl2.oid
-                        AND array_lower(con.conkey, 1) = 1
-                        AND con.conkey[1] = att1.attnum
-                        AND att1.attrelid = cl1.oid
-                        AND att1.attname = %s
-                        AND array_lower(con.confkey, 1) = 1
-                        AND con.confkey[1] = att2.attnum
-                        AND att2.attrelid = cl2.oid
-                        AND att2.attname = %s
-                        AND con.contype = 'f'""", (source_table, source_field, 'id'))
-        constraints = cr.dictfetchall()
+        if constraints is None:
+            constraints = self._select_foreign_keys(cr, source_table).get(source_field, [])
         if constraints:
             if len(constraints) == 1:
                 # Is it the right constraint?
@@ -2464,6 +2520,8 @@ class BaseModel(object):
 
             # iterate on the "object columns"
             column_data = self._select_column_data(cr)
+            index_names = self._select_index_names(cr)
+            foreign_keys = self._select_foreign_keys(cr)
 
             for k, f in self._columns.iteritems():
                 if k == 'id': # FIXME: maybe id should be a regular column?
@@ -2600,8 +2658,7 @@ class BaseModel(object):
                                     self._table, k)
                             # Verify index
                             indexname = '%s_%s_index' % (self._table, k)
-                            cr.execute("SELECT indexname FROM pg_indexes WHERE indexname = %s and tablename = %s", (indexname, self._table))
-                            res2 = cr.dictfetchall()
+                            res2 = indexname in index_names
                             if not res2 and f.select:
                                 cr.execute('CREATE INDEX "%s_%s_index" ON "%s" ("%s")' % (self._table, k, self._table, k))
                                 cr.commit()
@@ -2621,7 +2678,8 @@ class BaseModel(object):
                             if isinstance(f, fields.many2one) or (isinstance(f, fields.function) and f._type == 'many2one' and f.store):
                                 dest_model = self.pool[f._obj]
                                 if dest_model._auto and dest_model._table != 'ir_actions':
-                                    self._m2o_fix_foreign_key(cr, self._table, k, dest_model, f.ondelete)
+                                    self._m2o_fix_foreign_key(cr, self._table, k, dest_model, f.ondelete,
+                                                              foreign_keys.get(k, []))
 
                     # The field doesn't exist in database. Create it if necessary.
                     else:
@@ -2770,6 +2828,35 @@ class BaseModel(object):
         return dict(map(lambda x: (x['attname'], x),cr.dictfetchall()))
 
 
+    def _select_index_names(self, cr):
+        cr.execute("SELECT indexname FROM pg_indexes WHERE tablename=%s", (self._table,))
+        return set(name for name, in cr.fetchall())
+
+    def _select_foreign_keys(self, cr, table=None):
+        """ Return the single-column foreign keys of ``table`` (by default the
+        model's table) that reference an ``id`` column, as a dict associating
+        each column name to a list of constraints.
+        """
+        cr.execute("""SELECT att1.attname as column_name, confdeltype as ondelete_rule,
+                             conname as constraint_name, cl2.relname as foreign_table
+                      FROM pg_constraint as con, pg_class as cl1, pg_class as cl2,
+                           pg_attribute as att1, pg_attribute as att2
+                      WHERE con.conrelid = cl1.oid
+                        AND cl1.relname = %s
+                        AND con.confrelid = cl2.oid
+                        AND array_lower(con.conkey, 1) = 1
+                        AND con.conkey[1] = att1.attnum
+                        AND att1.attrelid = cl1.oid
+                        AND array_lower(con.confkey, 1) = 1
+                        AND con.confkey[1] = att2.attnum
+                        AND att2.attrelid = cl2.oid
+                        AND att2.attname = %s
+                        AND con.contype = 'f'""", (table or self._table, 'id'))
+        result = defaultdict(list)
+        for row in cr.dictfetchall():
+            result[row.pop('column_name')].append(row)
+        return result
+
     def _o2m_raise_on_missing_reference(self, cr, f):
         # TODO this check should be a method on fields.one2many.
         if f._obj in self.pool:
@@ -3254,11 +3341,19 @@ class BaseModel(object):
         # determine which fields can be prefetched
         fs = {field}
         if self._context.get('prefetch_fields', True) and field.column._prefetch:
+            group_of = {
+                fname: group
+                for group, fnames in self._prefetch_groups.iteritems()
+                for fname in fnames
+            }
+            group = group_of.get(field.name)
             fs.update(
                 f
                 for f in self._fields.itervalues()
                 # select stored fields that can be prefetched
                 if f.store and f.column._prefetch
+                # select fields in the same lazy prefetch group
+                if group_of.get(f.name) == group
                 # discard fields with groups that the user may not access
                 if not (f.groups and not self.user_has_groups(f.groups))
                 # discard fields that must be recomputed
@@ -3577,6 +3672,7 @@ class BaseModel(object):
         else:
             where_clause, where_params, tables = self.pool.get('ir.rule').domain_get(cr, uid, self._name, operation, context=context)
             if where_clause:
+                start = time.time()
                 where_clause = ' and ' + ' and '.join(where_clause)
                 for sub_ids in cr.split_for_in_conditions(ids):
                     cr.execute('SELECT ' + self._table + '.id FROM ' + ','.join(tables) +
@@ -3584,6 +3680,7 @@ class BaseModel(object):
                                [sub_ids] + where_params)
                     returned_ids = [x['id'] for x in cr.dictfetchall()]
                     self._check_record_rules_result_count(cr, uid, sub_ids, returned_ids, operation, context=context)
+                self.pool.rule_stats[self._name][1] += time.time() - start
 
     def create_workflow(self, cr, uid, ids, context=None):
         """Create a workflow instance for each given record IDs."""
@@ -3604,17 +3701,15 @@ class BaseModel(object):
     def step_workflow(self, cr, uid, ids, context=None):
         """Reevaluate the workflow instances of the given record IDs."""
         from openerp import workflow
-        for res_id in ids:
-            workflow.trg_write(uid, self._name, res_id, cr)
+        if ids:
+            workflow.trg_write_batch(uid, self._name, ids, cr)
         # self.invalidate_cache(cr, uid, context=context) ?
         return True
 
     def signal_workflow(self, cr, uid, ids, signal, context=None):
         """Send given workflow signal and return a dict mapping ids to workflow results"""
         from openerp import workflow
-        result = {}
-        for res_id in ids:
-            result[res_id] = workflow.trg_validate(uid, self._name, res_id, signal, cr)
+        result = workflow.trg_validate_batch(uid, self._name, ids, signal, cr) if ids else {}
         # self.invalidate_cache(cr, uid, context=context) ?
         return result
 
@@ -4110,7 +4205,7 @@ class BaseModel(object):
     # TODO: Should set perm to user.xxx
     #
     @api.model
-    @api.returns('self', lambda value: value.id)
+    @api.returns('self', _create_downgrade)
     def create(self, vals):
         """ create(vals) -> record
 
@@ -4124,7 +4219,11 @@ class BaseModel(object):
 
                 {'field_name': field_value, ...}
 
-            see :meth:`~.write` for details
+            see :meth:`~.write` for details; a list of such dictionaries
+            creates as many records at once, and returns them in the same
+            order (as a list of ids in the traditional style); this requires
+            the overrides of :meth:`~.create` to support it, see
+            :func:`~openerp.api.create_batchable`
         :return: new record created
         :raise AccessError: * if user has no create rights on the requested object
                             * if user tries to bypass access rules for create on the requested object
@@ -4133,41 +4232,72 @@ class BaseModel(object):
         """
         self.check_access_rights('create')
 
-        # add missing defaults, and drop fields that may not be set by user
-        vals = self._add_missing_default_values(vals)
-        for field in itertools.chain(MAGIC_COLUMNS, ('parent_left', 'parent_right')):
-            vals.pop(field, None)
-
-        # split up fields into old-style and pure new-style ones
-        old_vals, new_vals, unknown = {}, {}, []
-        for key, val in vals.iteritems():
-            field = self._fields.get(key)
-            if field:
-                if field.column or field.inherited:
-                    old_vals[key] = val
-                if field.inverse and not field.inherited:
-                    new_vals[key] = val
-            else:
-                unknown.append(key)
+        batch = isinstance(vals, list)
+        vals_list = vals if batch else [vals]
+        old_vals_list, new_vals_list = [], []
+        unknown = set()
+        for vals in vals_list:
+            # add missing defaults, and drop fields that may not be set by user
+            vals = self._add_missing_default_values(vals)
+            for field in itertools.chain(MAGIC_COLUMNS, ('parent_left', 'parent_right')):
+                vals.pop(field, None)
+
+            # split up fields into old-style and pure new-style ones
+            old_vals, new_vals = {}, {}
+            for key, val in vals.iteritems():
+                field = self._fields.get(key)
+                if field:
+                    if field.column or field.inherited:
+                        old_vals[key] = val
+                    if field.inverse and not field.inherited:
+                        new_vals[key] = val
+                else:
+                    unknown.add(key)
+            old_vals_list.append(old_vals)
+            new_vals_list.append(new_vals)
 
         if unknown:
             _logger.warning("%s.create() includes unknown fields: %s", self._name, ', '.join(sorted(unknown)))
 
-        # create record with old-style fields
-        record = self.browse(self._create(old_vals))
+        # create records with old-style fields
+        if batch:
+            records = self.browse(self._create_batch(old_vals_list))
+        else:
+            records = self.browse(self._create(old_vals_list[0]))
+
+        # inverse the pure new-style fields, together for the records that
+        # have values for the same fields
+        inverse_groups = defaultdict(list)
+        for record, new_vals in itertools.izip(records, new_vals_list):
+            if new_vals:
+                # put the values of pure new-style fields into cache
+                record._cache.update(record._convert_to_cache(new_vals))
+                inverse_groups[tuple(sorted(new_vals))].append(record.id)
+        for keys, ids in inverse_groups.iteritems():
+            recs = self.browse(ids)
+            # mark the fields as being computed, to avoid their invalidation
+            for key in keys:
+                self.env.computed[self._fields[key]].update(ids)
+            for key in keys:
+                self._fields[key].determine_inverse(recs)
+            for key in keys:
+                self.env.computed[self._fields[key]].difference_update(ids)
 
-        # put the values of pure new-style fields into cache
-        record._cache.update(record._convert_to_cache(new_vals))
-        # mark the fields as being computed, to avoid their invalidation
-        for key in new_vals:
-            self.env.computed[self._fields[key]].add(record.id)
-        # inverse the fields
-        for key in new_vals:
-            self._fields[key].determine_inverse(record)
-        for key in new_vals:
-            self.env.computed[self._fields[key]].discard(record.id)
+        return records
 
-        return record
+    def _create_batchable(self):
+        """ Return whether :meth:`~.create` may be given a list of values on
+        this model, i.e., whether all its overrides are decorated with
+        :func:`~openerp.api.create_batchable`: the other overrides of
+        :meth:`~.create` may expect a single dictionary.
+        """
+        for cls in type(self).__mro__:
+            if cls is BaseModel:
+                return True
+            method = vars(cls).get('create')
+            if method is not None and not getattr(method, '_batchable', False):
+                return False
+        return False
 
     def _create(self, cr, user, vals, context=None):
         # low-level implementation of create()
@@ -4193,7 +4323,6 @@ class BaseModel(object):
             ('id', "nextval('%s')" % self._sequence),
         ]
 
-        upd_todo = []
         unknown_fields = []
         for v in vals.keys():
             if v in self._inherit_fields and v not in self._columns:
@@ -4222,70 +4351,8 @@ class BaseModel(object):
 
             updates.append((self._inherits[table], '%s', record_id))
 
-        #Start : Set bool fields to be False if they are not touched(to make search more powerful)
-        bool_fields = [x for x in self._columns.keys() if self._columns[x]._type=='boolean']
-
-        for bool_field in bool_fields:
-            if bool_field not in vals:
-                vals[bool_field] = False
-        #End
-        for field in vals.keys():
-            fobj = None
-            if field in self._columns:
-                fobj = self._columns[field]
-            else:
-                fobj = self._inherit_fields[field][2]
-            if not fobj:
-                continue
-            groups = fobj.write
-            if groups:
-                edit = False
-                for group in groups:
-                    module = group.split(".")[0]
-                    grp = group.split(".")[1]
-                    cr.execute("select count(*) from res_groups_users_rel where gid IN (select res_id from ir_model_data where name='%s' and module='%s' and model='%s') and uid=%s" % \
-                               (grp, module, 'res.groups', user))
-                    readonly = cr.fetchall()
-                    if readonly[0][0] >= 1:
-                        edit = True
-                        break
-                    elif readonly[0][0] == 0:
-                        edit = False
-                    else:
-                        edit = False
-
-                if not edit:
-                    vals.pop(field)
-        for field in vals:
-            current_field = self._columns[field]
-            if current_field._classic_write:
-                updates.append((field, current_field._symbol_set[0], current_field._symbol_set[1](vals[field])))
-
-                #for the function fields that receive a value, we set them directly in the database
-                #(they may be required), but we also need to trigger the _fct_inv()
-                if (hasattr(current_field, '_fnct_inv')) and not isinstance(current_field, fields.related):
-                    #TODO: this way to special case the related fields is really creepy but it shouldn't be changed at
-                    #one week of the release candidate. It seems the only good way to handle correctly this is to add an
-                    #attribute to make a field `really readonly´ and thus totally ignored by the create()... otherwise
-                    #if, for example, the related has a default value (for usability) then the fct_inv is called and it
-                    #may raise some access rights error. Changing this is a too big change for now, and is thus postponed
-                    #after the release but, definitively, the behavior shouldn't be different for related and function
-                    #fields.
-                    upd_todo.append(field)
-            else:
-                #TODO: this `if´ statement should be removed because there is no good reason to special case the fields
-                #related. See the above TODO comment for further explanations.
-                if not isinstance(current_field, fields.related):
-                    upd_todo.append(field)
-            if field in self._columns \
-                    and hasattr(current_field, 'selection') \
-                    and vals[field]:
-                self._check_selection_field_value(cr, user, field, vals[field], context=context)
-        if self._log_access:
-            updates.append(('create_uid', '%s', user))
-            updates.append(('write_uid', '%s', user))
-            updates.append(('create_date', "(now() at time zone 'UTC')"))
-            updates.append(('write_date', "(now() at time zone 'UTC')"))
+        columns, upd_todo = self._create_columns(cr, user, vals, context=context)
+        updates.extend(columns)
 
         # the list of tuples used in this formatting corresponds to
         # tuple(field_name, format, value)
@@ -4376,6 +4443,194 @@ class BaseModel(object):
         self.create_workflow(cr, user, [id_new], context=context)
         return id_new
 
+    def _create_columns(self, cr, user, vals, context=None, write_groups=None):
+        """ Return the column assignments ``(column_name, format_string,
+        column_value)`` or ``(column_name, sql_formula)`` of a new record with
+        ``vals``, and the list of fields to set after its insertion.
+        ``write_groups`` memoizes the checks of the fields' write groups.
+        """
+        columns = []
+        upd_todo = []
+        #Start : Set bool fields to be False if they are not touched(to make search more powerful)
+        bool_fields = [x for x in self._columns.keys() if self._columns[x]._type=='boolean']
+
+        for bool_field in bool_fields:
+            if bool_field not in vals:
+                vals[bool_field] = False
+        #End
+        for field in vals.keys():
+            fobj = None
+            if field in self._columns:
+                fobj = self._columns[field]
+            else:
+                fobj = self._inherit_fields[field][2]
+            if not fobj:
+                continue
+            groups = fobj.write
+            if groups and write_groups is not None and tuple(groups) in write_groups:
+                if not write_groups[tuple(groups)]:
+                    vals.pop(field)
+            elif groups:
+                edit = False
+                for group in groups:
+                    module = group.split(".")[0]
+                    grp = group.split(".")[1]
+                    cr.execute("select count(*) from res_groups_users_rel where gid IN (select res_id from ir_model_data where name='%s' and module='%s' and model='%s') and uid=%s" % \
+                               (grp, module, 'res.groups', user))
+                    readonly = cr.fetchall()
+                    if readonly[0][0] >= 1:
+                        edit = True
+                        break
+                    elif readonly[0][0] == 0:
+                        edit = False
+                    else:
+                        edit = False
+
+                if write_groups is not None:
+                    write_groups[tuple(groups)] = edit
+                if not edit:
+                    vals.pop(field)
+        for field in vals:
+            current_field = self._columns[field]
+            if current_field._classic_write:
+                columns.append((field, current_field._symbol_set[0], current_field._symbol_set[1](vals[field])))
+
+                #for the function fields that receive a value, we set them directly in the database
+                #(they may be required), but we also need to trigger the _fct_inv()
+                if (hasattr(current_field, '_fnct_inv')) and not isinstance(current_field, fields.related):
+                    #TODO: this way to special case the related fields is really creepy but it shouldn't be changed at
+                    #one week of the release candidate. It seems the only good way to handle correctly this is to add an
+                    #attribute to make a field `really readonly´ and thus totally ignored by the create()... otherwise
+                    #if, for example, the related has a default value (for usability) then the fct_inv is called and it
+                    #may raise some access rights error. Changing this is a too big change for now, and is thus postponed
+                    #after the release but, definitively, the behavior shouldn't be different for related and function
+                    #fields.
+                    upd_todo.append(field)
+            else:
+                #TODO: this `if´ statement should be removed because there is no good reason to special case the fields
+                #related. See the above TODO comment for further explanations.
+                if not isinstance(current_field, fields.related):
+                    upd_todo.append(field)
+            if field in self._columns \
+                    and hasattr(current_field, 'selection') \
+                    and vals[field]:
+                self._check_selection_field_value(cr, user, field, vals[field], context=context)
+        if self._log_access:
+            columns.append(('create_uid', '%s', user))
+            columns.append(('write_uid', '%s', user))
+            columns.append(('create_date', "(now() at time zone 'UTC')"))
+            columns.append(('write_date', "(now() at time zone 'UTC')"))
+        return columns, upd_todo
+
+    def _create_batch(self, cr, user, vals_list, context=None):
+        """ Low-level implementation of create() for a list of values: the
+        records are inserted with multi-row INSERT statements, and the stored
+        computed fields, constraints, access rules and workflows are processed
+        once for the whole batch. Return the list of the new ids, in the order
+        of ``vals_list``.
+        """
+        if not context:
+            context = {}
+
+        if self._inherits or (self._parent_store and not self.pool._init and
+                              not context.get('defer_parent_store_computation')):
+            # parent records and nested set intervals are allocated one by one
+            return [self._create(cr, user, vals, context=context) for vals in vals_list]
+        if not vals_list:
+            return []
+
+        if self.is_transient():
+            self._transient_vacuum(cr, user)
+
+        cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)",
+                   (self._sequence, len(vals_list)))
+        ids = [row[0] for row in cr.fetchall()]
+
+        # group the rows by columns, in order to insert them together
+        write_groups = {}
+        rows = defaultdict(list)
+        todo = []
+        unknown_fields = set()
+        for id_new, vals in itertools.izip(ids, vals_list):
+            for v in vals.keys():
+                if v not in self._columns:
+                    del vals[v]
+                    unknown_fields.add(v)
+            columns, upd_todo = self._create_columns(cr, user, vals, context=context,
+                                                     write_groups=write_groups)
+            columns.insert(0, ('id', '%s', id_new))
+            key = tuple((u[0], u[1]) for u in columns)
+            rows[key].append(tuple(u[2] for u in columns if len(u) > 2))
+            todo.append((id_new, vals, upd_todo))
+        if unknown_fields:
+            _logger.warning(
+                'No such field(s) in model %s: %s.',
+                self._name, ', '.join(sorted(unknown_fields)))
+
+        for key, params in rows.iteritems():
+            row = '(%s)' % ', '.join(u[1] for u in key)
+            for sub_params in cr.split_for_in_conditions(params):
+                cr.execute(
+                    """INSERT INTO "%s" (%s) VALUES %s""" % (
+                        self._table,
+                        ', '.join('"%s"' % u[0] for u in key),
+                        ', '.join([row] * len(sub_params)),
+                    ),
+                    tuple(itertools.chain.from_iterable(sub_params))
+                )
+
+        recs = self.browse(cr, user, ids, context)
+        if self._parent_store and self.pool._init and \
+                not context.get('defer_parent_store_computation'):
+            self.pool._init_parent[self._name] = True
+
+        # invalidate and mark new-style fields to recompute, before setting the
+        # other fields (see _create)
+        recs.modified(self._fields)
+
+        rel_context = context.copy()
+        for c in context.items():
+            if c[0].startswith('default_'):
+                del rel_context[c[0]]
+
+        result = []
+        upd_fields = set()
+        # the ids of the records, grouped by the fields they were given
+        groups = defaultdict(list)
+        for id_new, vals, upd_todo in todo:
+            upd_todo.sort(lambda x, y: self._columns[x].priority-self._columns[y].priority)
+            for field in upd_todo:
+                result += self._columns[field].set(cr, self, id_new, field, vals[field], user, rel_context) or []
+            upd_fields.update(upd_todo)
+            groups[frozenset(vals)].append(id_new)
+
+        recs.modified(upd_fields)
+
+        for names, group_ids in groups.iteritems():
+            field_names = list(names.union(self._inherits.values()))
+            # check Python constraints
+            self.browse(cr, user, group_ids, context)._validate_fields(field_names)
+            result += self._store_get_values(cr, user, group_ids, field_names, context)
+        recs.env.recompute_old.extend(result)
+
+        if recs.env.recompute and context.get('recompute', True):
+            done = []
+            while recs.env.recompute_old:
+                sorted_recompute_old = sorted(recs.env.recompute_old)
+                recs.env.clear_recompute_old()
+                for __, model_name, ids2, fields2 in sorted_recompute_old:
+                    if not (model_name, ids2, fields2) in done:
+                        self.pool[model_name]._store_set_values(
+                            cr, user, ids2, fields2, context)
+                        done.append((model_name, ids2, fields2))
+
+            # recompute new-style fields
+            recs.recompute()
+
+        self.check_access_rule(cr, user, ids, 'create', context=context)
+        self.create_workflow(cr, user, ids, context=context)
+        return ids
+
     def _store_get_values(self, cr, uid, ids, fields, context):
         """Returns an ordered list of fields.function to call due to
            an update operation on ``fields`` of records with ``ids``,
@@ -4803,6 +5058,35 @@ class BaseModel(object):
 
         return _uniquify_list([x[0] for x in res])
 
+    @api.model
+    def _search_batches(self, domain, order=None, batch_size=PREFETCH_MAX):
+        """ Search for the records matching ``domain``, and yield them as
+            recordsets of at most ``batch_size`` records.
+
+            The ids are fetched through a server-side cursor, and the cache is
+            invalidated after each batch, so that memory stays bounded
+            whatever the number of records. Do not commit the transaction
+            before the iteration is over.
+        """
+        self.check_access_rights('read')
+
+        # For transient models, restrict access to the current user, except for the super-user
+        if self.is_transient() and self._log_access and self._uid != SUPERUSER_ID:
+            domain = expression.AND(([('create_uid', '=', self._uid)], domain or []))
+
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        order_by = self._generate_order_by(order, query)
+        from_clause, where_clause, where_clause_params = query.get_sql()
+        where_str = where_clause and (" WHERE %s" % where_clause) or ''
+        query_str = 'SELECT "%s".id FROM ' % self._table + from_clause + where_str + order_by
+
+        # with auto_join, the same id may appear several times
+        seen = set()
+        for rows in self._cr.stream(query_str, where_clause_params, batch_size):
+            yield self.browse([row[0] for row in rows if row[0] not in seen and not seen.add(row[0])])
+            self.invalidate_cache()
+
     # returns the different values ever entered for one field
     # this is used, for example, in the client when the user hits enter on
     # a char field
@@ -5853,23 +6137,129 @@ class BaseModel(object):
     def recompute(self):
         """ Recompute stored function fields. The fields and records to
             recompute have been determined by method :meth:`modified`.
+            Fields are recomputed in the order of their dependencies, each
+            one at once on all its records to recompute.
         """
         while self.env.has_todo():
             field, recs = self.env.get_todo()
             # determine the fields to recompute
             fs = self.env[field.model_name]._field_computed[field]
             ns = [f.name for f in fs if f.store]
-            # evaluate fields, and group record ids by update
-            updates = defaultdict(set)
+            # evaluate fields
+            values = {}
             for rec in recs.exists():
-                vals = rec._convert_to_write({n: rec[n] for n in ns})
-                updates[frozendict(vals)].add(rec.id)
-            # update records in batch when possible
+                values[rec.id] = rec._convert_to_write({n: rec[n] for n in ns})
+            # update records in batch
             with recs.env.norecompute():
-                for vals, ids in updates.iteritems():
-                    recs.browse(ids)._write(dict(vals))
+                queries = recs._write_recomputed(values) if ns else 0
             # mark computed fields as done
             map(recs._recompute_done, fs)
+            stat = self.pool.recompute_stats[str(field)]
+            stat[0] += 1
+            stat[1] += len(values)
+            stat[2] += queries
+
+    @api.model
+    def _write_recomputed(self, values):
+        """ Write the recomputed values of stored computed fields, given as a
+            dict ``{id: vals}`` where all ``vals`` have the same keys; return
+            the number of UPDATE queries that have been executed.
+        """
+        # group record ids by update
+        updates = defaultdict(set)
+        for id, vals in values.iteritems():
+            updates[frozendict(vals)].add(id)
+        if len(updates) > 1 and self._write_rows_supported(next(iter(values.itervalues()))):
+            return self._write_rows(values)
+        for vals, ids in updates.iteritems():
+            self.browse(ids)._write(dict(vals))
+        return len(updates)
+
+    @api.model
+    def _write_rows_supported(self, names):
+        """ Return whether the fields ``names`` can be written with
+            :meth:`_write_rows`, i.e., they are plain columns of the table,
+            and the model does not override or patch :meth:`_write`.
+        """
+        if self._parent_store and self._parent_name in names:
+            return False
+        if type(self)._write.__func__ is not BaseModel._write.__func__:
+            # the override must see the updates, e.g., base_action_rule
+            return False
+        for name in names:
+            column = self._columns.get(name)
+            if not (column and column._classic_write and column._symbol_set[0] == '%s'
+                    and not hasattr(column, '_fnct_inv') and not column.translate
+                    and not column.write and get_pg_type(column)):
+                return False
+        return True
+
+    @api.model
+    def _write_rows(self, values):
+        """ Write different values on several records at once, with UPDATE
+            queries of the form ``UPDATE ... FROM (VALUES ...)``. The values
+            are given as a dict ``{id: vals}`` where all ``vals`` have the
+            same keys, which must satisfy :meth:`_write_rows_supported`.
+            Return the number of UPDATE queries that have been executed.
+        """
+        cr, uid, context = self.env.args
+        ids = list(values)
+        names = sorted(next(iter(values.itervalues())))
+        recs = self.browse(ids)
+        recs.check_field_access_rights('write', names)
+        recs.check_access_rule('write')
+
+        # for recomputing new-style fields
+        recs.modified(names + (['write_date', 'write_uid'] if self._log_access else []))
+
+        columns = [self._columns[name] for name in names]
+        assignments = [
+            '"%s"=v."%s"::%s' % (name, name, get_pg_type(column)[0])
+            for name, column in zip(names, columns)
+        ]
+        params = []
+        if self._log_access:
+            assignments.append('"write_uid"=%s')
+            assignments.append("\"write_date\"=(now() at time zone 'UTC')")
+            params.append(uid)
+        row = '(%s)' % ', '.join(['%s'] * (len(names) + 1))
+
+        queries = 0
+        for sub_ids in cr.split_for_in_conditions(ids):
+            query = 'UPDATE "%s" SET %s FROM (VALUES %s) AS v(id, %s) WHERE "%s".id=v.id' % (
+                self._table, ','.join(assignments), ', '.join([row] * len(sub_ids)),
+                ', '.join('"%s"' % name for name in names), self._table,
+            )
+            sub_params = list(params)
+            for id in sub_ids:
+                vals = values[id]
+                sub_params.append(id)
+                sub_params.extend(column._symbol_set[1](vals[name])
+                                  for name, column in zip(names, columns))
+            cr.execute(query, sub_params)
+            queries += 1
+            if cr.rowcount != len(sub_ids):
+                raise MissingError(_('One of the records you are trying to modify has already been deleted (Document type: %s).') % self._description)
+
+        # invalidate and mark new-style fields to recompute
+        recs.modified(names)
+
+        # check Python constraints
+        recs._validate_fields(names)
+
+        # recompute old-style fields
+        recs.env.recompute_old.extend(self._model._store_get_values(cr, uid, ids, names, context))
+        done = []
+        while recs.env.recompute_old:
+            sorted_recompute_old = sorted(recs.env.recompute_old)
+            recs.env.clear_recompute_old()
+            for __, model_name, ids2, fields2 in sorted_recompute_old:
+                if not (model_name, ids2, fields2) in done:
+                    self.pool[model_name]._store_set_values(cr, uid, ids2, fields2, context)
+                    done.append((model_name, ids2, fields2))
+
+        self._model.step_workflow(cr, uid, ids, context=context)
+        return queries
 
     #
     # Generic onchange method
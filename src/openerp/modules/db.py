@@ -128,3 +128,19 @@ def has_unaccent(cr):
     """
     cr.execute("SELECT proname FROM pg_proc WHERE proname='unaccent'")
     return len(cr.fetchall()) > 0
+
+def create_data_file_table(cr):
+    """ Create the table of the data files loaded by the modules, if it does
+    not exist yet. It holds the checksum of each file and the external
+    identifiers it defines, so that unchanged files can be skipped when
+    updating the modules.
+
+    """
+    cr.execute("SELECT relname FROM pg_class WHERE relkind='r' AND relname='ir_module_data_file'")
+    if not cr.fetchall():
+        cr.execute("""CREATE TABLE ir_module_data_file (
+                          module varchar NOT NULL,
+                          name varchar NOT NULL,
+                          checksum varchar NOT NULL,
+                          xmlids text NOT NULL,
+                          PRIMARY KEY (module, name))""")
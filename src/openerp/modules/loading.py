@@ -5,6 +5,7 @@
 
 """
 
+import hashlib
 import itertools
 import logging
 import os
@@ -29,6 +30,69 @@ _logger = logging.getLogger(__name__)
 _test_logger = logging.getLogger('openerp.tests')
 
 
+def _data_file_checksum(module_name, filename):
+    fp = tools.file_open(os.path.join(module_name, filename), 'rb')
+    try:
+        return hashlib.sha1(fp.read()).hexdigest()
+    finally:
+        fp.close()
+
+def _skip_data_file(cr, module_name, filename, checksum):
+    """ Return whether the data file has not changed since it was last loaded,
+    in which case its external identifiers are marked as loaded.
+    """
+    cr.execute("SELECT checksum, xmlids FROM ir_module_data_file WHERE module=%s AND name=%s",
+               (module_name, filename))
+    row = cr.fetchone()
+    if not row or row[0] != checksum:
+        return False
+    xmlids = [tuple(xmlid.split('.', 1)) for xmlid in row[1].split('\n') if xmlid]
+    openerp.registry(cr.dbname)['ir.model.data']._restore_loads(cr, SUPERUSER_ID, xmlids)
+    return True
+
+def _save_data_file(cr, module_name, filename, checksum, xmlids):
+    """ Record the checksum of a loaded data file and the external identifiers
+    it defines.
+    """
+    xmlids = '\n'.join(sorted('%s.%s' % xmlid for xmlid in xmlids))
+    cr.execute("UPDATE ir_module_data_file SET checksum=%s, xmlids=%s WHERE module=%s AND name=%s",
+               (checksum, xmlids, module_name, filename))
+    if not cr.rowcount:
+        cr.execute("INSERT INTO ir_module_data_file (module, name, checksum, xmlids) VALUES (%s, %s, %s, %s)",
+                   (module_name, filename, checksum, xmlids))
+
+def _load_data_files(cr, module_name, filenames, idref, mode, kind, report):
+    """ Load the data files ``filenames`` of the module ``module_name``.
+    Unchanged data files are skipped in update mode with the option
+    ``--skip-unchanged-data``.
+    """
+    loads = openerp.registry(cr.dbname)['ir.model.data'].loads
+    for filename in filenames:
+        # the checksums of the xml and csv data files are recorded,
+        # in order to skip the unchanged ones in update mode
+        checksum = None
+        if kind == 'data' and os.path.splitext(filename)[1].lower() in ('.xml', '.csv'):
+            checksum = _data_file_checksum(module_name, filename)
+            if mode == 'update' and tools.config['skip_unchanged_data'] and \
+                    _skip_data_file(cr, module_name, filename, checksum):
+                _logger.info("module %s: skipping unchanged file %s", module_name, filename)
+                continue
+        _logger.info("loading %s/%s", module_name, filename)
+        noupdate = False
+        if kind in ('demo', 'demo_xml') or (filename.endswith('.csv') and kind in ('init', 'init_xml')):
+            noupdate = True
+        t0 = time.time()
+        t0_sql = cr.sql_log_count
+        loads.recorded = set()
+        try:
+            tools.convert_file(cr, module_name, filename, idref, mode, noupdate, kind, report)
+            if checksum:
+                _save_data_file(cr, module_name, filename, checksum, loads.recorded)
+        finally:
+            loads.recorded = None
+        _logger.info("module %s: file %s loaded in %.2fs, %s queries",
+                     module_name, filename, time.time() - t0, cr.sql_log_count - t0_sql)
+
 def load_module_graph(cr, graph, status=None, perform_checks=True, skip_modules=None, report=None):
     """Migrates+Updates or Installs all module nodes from ``graph``
        :param graph: graph of module nodes to load
@@ -90,12 +154,7 @@ def load_module_graph(cr, graph, status=None, perform_checks=True, skip_modules=
         try:
             if kind in ('demo', 'test'):
                 threading.currentThread().testing = True
-            for filename in _get_files_of_kind(kind):
-                _logger.info("loading %s/%s", module_name, filename)
-                noupdate = False
-                if kind in ('demo', 'demo_xml') or (filename.endswith('.csv') and kind in ('init', 'init_xml')):
-                    noupdate = True
-                tools.convert_file(cr, module_name, filename, idref, mode, noupdate, kind, report)
+            _load_data_files(cr, module_name, _get_files_of_kind(kind), idref, mode, kind, report)
         finally:
             if kind in ('demo', 'test'):
                 threading.currentThread().testing = False
@@ -119,6 +178,9 @@ def load_module_graph(cr, graph, status=None, perform_checks=True, skip_modules=
         if skip_modules and module_name in skip_modules:
             continue
 
+        t0_module = time.time()
+        t0_module_sql = cr.sql_log_count
+
         migrations.migrate_module(package, 'pre')
         load_openerp_module(package.name)
 
@@ -175,6 +237,10 @@ def load_module_graph(cr, graph, status=None, perform_checks=True, skip_modules=
             # validate all the views at a whole
             registry['ir.ui.view']._validate_module_views(cr, SUPERUSER_ID, module_name)
 
+            _logger.info("module %s: %s in %.2fs, %s queries", module_name,
+                         'installed' if mode == 'init' else 'updated',
+                         time.time() - t0_module, cr.sql_log_count - t0_module_sql)
+
             if has_demo:
                 # launch tests only in demo mode, allowing tests to use demo data.
                 if tools.config.options['test_enable']:
@@ -188,6 +254,7 @@ def load_module_graph(cr, graph, status=None, perform_checks=True, skip_modules=
                     report.record_result(openerp.modules.module.run_unit_tests(module_name, cr.dbname))
 
             processed_modules.append(package.name)
+            registry._updated_modules.add(package.name)
 
             ver = adapt_version(package.data['version'])
             # Set new modules and dependencies
@@ -259,6 +326,8 @@ def load_modules(db, force_demo=False, status=None, update_module=False):
             if not tools.config['without_demo']:
                 tools.config["demo"]['all'] = 1
 
+        openerp.modules.db.create_data_file_table(cr)
+
         # This is a brand new registry, just created in
         # openerp.modules.registry.RegistryManager.new().
         registry = openerp.registry(cr.dbname)
@@ -35,9 +35,20 @@ class Registry(Mapping):
         self._assertion_report = assertion_report.assertion_report()
         self._fields_by_model = None
 
+        # recomputations of stored computed fields, by field:
+        # [number of batches, number of records, number of UPDATE queries]
+        self.recompute_stats = defaultdict(lambda: [0, 0, 0])
+
+        # record rules applied, by model:
+        # [number of applications, time spent]
+        self.rule_stats = defaultdict(lambda: [0, 0.0])
+
         # modules fully loaded (maintained during init phase by `loading` module)
         self._init_modules = set()
 
+        # modules installed or updated while loading the registry
+        self._updated_modules = set()
+
         self.db_name = db_name
         self._db = openerp.sql_db.db_connect(db_name)
 
@@ -55,7 +66,7 @@ class Registry(Mapping):
         self.base_registry_signaling_sequence = None
         self.base_cache_signaling_sequence = None
 
-        self.cache = LRU(8192)
+        self.cache = openerp.tools.new_cache(db_name)
         # Flag indicating if at least one model cache has been cleared.
         # Useful only in a multi-process context.
         self._any_cache_cleared = False
@@ -101,6 +112,44 @@ class Registry(Mapping):
                 fields.append(model_fields[fname])
         return fields
 
+    @lazy_property
+    def expression_cache(self):
+        """ Return the cache of the SQL generated for domains, indexed by
+            their shape (see :meth:`openerp.osv.expression.expression.get_shape`).
+        """
+        return LRU(8192)
+
+    @lazy_property
+    def rule_cache(self):
+        """ Return the cache of the SQL generated for the domains of record
+            rules, indexed by model and domain (see
+            :meth:`~openerp.addons.base.ir.ir_rule.ir_rule._compile_domain`).
+        """
+        return LRU(4096)
+
+    @lazy_property
+    def qweb_cache(self):
+        """ Return the cache of the compiled QWeb templates, indexed by
+            template source (see :meth:`~openerp.addons.base.ir.ir_qweb.QWeb.get_compiled_template`).
+        """
+        return LRU(1024)
+
+    @lazy_property
+    def translation_catalogs(self):
+        """ Return the catalogs of code translations, as a dict mapping
+            languages to dicts ``{source: value}`` (see
+            :meth:`~openerp.addons.base.ir.ir_translation.ir_translation._get_code_catalog`).
+        """
+        return {}
+
+    @lazy_property
+    def sequence_blocks(self):
+        """ Return the numbers preallocated by this process for the PostgreSQL
+            sequences, as a dict mapping sequence names to lists of numbers (see
+            :meth:`~openerp.addons.base.ir.ir_sequence.ir_sequence._next_do`).
+        """
+        return {}
+
     @lazy_property
     def field_sequence(self):
         """ Return a function mapping a field to an integer. The value of a
@@ -208,9 +257,24 @@ class Registry(Mapping):
         ``tools.ormcache`` or ``tools.ormcache_multi`` for all the models.
         """
         self.cache.clear()
+        self.translation_catalogs.clear()
+        self.sequence_blocks.clear()
         for model in self.models.itervalues():
             model.clear_caches()
 
+    # Useful only in a multi-process context.
+    def clear_caches_signaled(self, sequence):
+        """ Clear the caches after the database signaling ``sequence``. A
+        shared cache is only cleared by the first worker of the host that
+        sees that sequence.
+        """
+        signaled = getattr(self.cache, 'signaled', None)
+        if signaled is None:
+            self.clear_caches()
+        else:
+            with signaled(sequence):
+                self.clear_caches()
+
     # Useful only in a multi-process context.
     def reset_any_cache_cleared(self):
         self._any_cache_cleared = False
@@ -406,6 +470,12 @@ class RegistryManager(object):
         registry.ready = True
 
         if update_module:
+            if not config['stop_after_init']:
+                # outside of the registry lock, as the other requests do not
+                # need to wait for it
+                with openerp.api.Environment.manage():
+                    with registry.cursor() as cr:
+                        registry['ir.ui.view']._prewarm_combined_views(cr, SUPERUSER_ID, registry._updated_modules)
             # only in case of update, otherwise we'll have an infinite reload loop!
             cls.signal_registry_change(db_name)
         return registry
@@ -415,7 +485,10 @@ class RegistryManager(object):
         """Delete the registry linked to a given database.  """
         with cls.lock():
             if db_name in cls.registries:
-                cls.registries[db_name].clear_caches()
+                registry = cls.registries[db_name]
+                # the entries of a shared cache remain valid for other workers
+                if not getattr(registry.cache, 'shared', False):
+                    registry.clear_caches()
                 del cls.registries[db_name]
 
     @classmethod
@@ -475,7 +548,7 @@ class RegistryManager(object):
                 elif registry.base_cache_signaling_sequence is not None and registry.base_cache_signaling_sequence != c:
                     changed = True
                     _logger.info("Invalidating all model caches after database signaling.")
-                    registry.clear_caches()
+                    registry.clear_caches_signaled(c)
                     registry.reset_any_cache_cleared()
                 registry.base_registry_signaling_sequence = r
                 registry.base_cache_signaling_sequence = c
@@ -498,6 +571,10 @@ class RegistryManager(object):
                     r = cr.fetchone()[0]
                 finally:
                     cr.close()
+                if getattr(registry.cache, 'shared', False):
+                    # other workers may have filled the shared cache with
+                    # uncommitted data in the meantime: clear it again, once
+                    registry.clear_caches_signaled(r)
                 registry.base_cache_signaling_sequence = r
                 registry.reset_any_cache_cleared()
 
@@ -119,6 +119,8 @@ import logging
 import traceback
 from zlib import crc32
 
+import psycopg2.extensions
+
 import openerp.modules
 from . import fields
 from .. import SUPERUSER_ID
@@ -297,6 +299,133 @@ def distribute_not(domain):
     return result
 
 
+class _Node(object):
+    """ A node '&', '|' or '!' of a domain tree, used by :func:`optimize_domain`. """
+    __slots__ = ['operator', 'children']
+
+    def __init__(self, operator, children):
+        self.operator = operator
+        self.children = children
+
+
+def _merge_key(model, term):
+    """ Return ``(field name, operator, ids)`` if ``term`` can be merged with
+        the terms on the same field by :func:`optimize_domain`, or ``None``.
+    """
+    if isinstance(term, _Node) or not is_leaf(term):
+        return None
+    left, operator, right = normalize_leaf(term)
+    if left != 'id':
+        column = model._columns.get(left)
+        if not (column and column._type in ('many2one', 'integer')) or \
+                (isinstance(column, fields.function) and not column.store):
+            return None
+    if operator == '=':
+        right = [right]
+    elif operator not in ('in', 'not in') or not isinstance(right, (list, tuple)):
+        return None
+    if not all(isinstance(item, (int, long)) and not isinstance(item, bool) and item
+               for item in right):
+        return None
+    if operator == '=':
+        operator = 'in'
+    return left, operator, list(right)
+
+
+def _simplify(model, operator, children):
+    """ Return the simplification of the '&' or '|' node with ``children``:
+        the duplicate terms are removed, and the terms on the same field are
+        merged together.
+    """
+    unit, zero = (TRUE_LEAF, FALSE_LEAF) if operator == AND_OPERATOR else (FALSE_LEAF, TRUE_LEAF)
+    result = []
+    seen = set()
+    merged = {}                         # {(field, operator): index in result}
+    for child in children:
+        if isinstance(child, _Node):
+            result.append(child)
+            continue
+        term = tuple(child)
+        if term == unit:
+            continue
+        if term == zero:
+            return zero
+        key = repr(term)
+        if key in seen:
+            continue
+        seen.add(key)
+        merge_key = _merge_key(model, term)
+        if merge_key is None or (operator, merge_key[1]) == (OR_OPERATOR, 'not in'):
+            result.append(child)
+            continue
+        left, term_operator, ids = merge_key
+        index = merged.get((left, term_operator))
+        if index is None:
+            merged[(left, term_operator)] = len(result)
+            result.append(child)
+            continue
+        previous = result[index]
+        previous_ids = _merge_key(model, previous)[2]
+        if operator == AND_OPERATOR and term_operator == 'in':
+            # intersection of the ids
+            ids = set(ids)
+            merged_ids = [id_ for id_ in previous_ids if id_ in ids]
+        else:
+            # union of the ids
+            merged_ids = previous_ids + [id_ for id_ in ids if id_ not in set(previous_ids)]
+        result[index] = (left, term_operator, merged_ids)
+    if not result:
+        return unit
+    if len(result) == 1:
+        return result[0]
+    return _Node(operator, result)
+
+
+def optimize_domain(model, domain):
+    """ Return a domain of ``model`` equivalent to the normalized ``domain``,
+        without its redundant terms: the duplicate terms of a '&' or a '|' are
+        removed, as well as the terms ``TRUE_LEAF`` and ``FALSE_LEAF`` that
+        have no effect, and the terms on the ids of the same integer or
+        many2one field of ``model`` are merged, like::
+
+            ['|', ('id', '=', 1), ('id', 'in', [2, 3])]
+                -> [('id', 'in', [1, 2, 3])]
+            ['&', ('id', 'in', [1, 2]), ('id', 'in', [2, 3])]
+                -> [('id', 'in', [2])]
+    """
+    if len(domain) < 3:
+        return domain
+
+    # build the tree of the domain, from right to left
+    stack = []
+    for token in reversed(domain):
+        if token == NOT_OPERATOR:
+            stack.append(_Node(NOT_OPERATOR, [stack.pop()]))
+        elif token in (AND_OPERATOR, OR_OPERATOR):
+            children = []
+            for child in (stack.pop(), stack.pop()):
+                if isinstance(child, _Node) and child.operator == token:
+                    children.extend(child.children)
+                else:
+                    children.append(child)
+            stack.append(_simplify(model, token, children))
+        else:
+            stack.append(token)
+    assert len(stack) == 1
+
+    # flatten the tree back into a domain
+    result = []
+    todo = [stack[0]]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, _Node):
+            result.extend([node.operator] * max(len(node.children) - 1, 1))
+            todo.extend(reversed(node.children))
+        else:
+            result.append(node)
+    return result
+
+
 # --------------------------------------------------
 # Generic leaf manipulation
 # --------------------------------------------------
@@ -406,6 +535,28 @@ def is_leaf(element, internal=False):
 # SQL utils
 # --------------------------------------------------
 
+class Array(object):
+    """ A list of values passed as a single array parameter to a query. Unlike
+        a list, it is not flattened with the other parameters of a domain.
+    """
+    __slots__ = ['values']
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __conform__(self, protocol):
+        return psycopg2.extensions.adapt(self.values)
+
+    def __eq__(self, other):
+        return isinstance(other, Array) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Array(%r)' % (self.values,)
+
+
 def select_from_where(cr, select_field, from_table, where_field, where_ids, where_operator):
     # todo: merge into parent query as sub-query
     res = []
@@ -638,17 +789,81 @@ class expression(object):
         self.root_model = table
 
         # normalize and prepare the expression for parsing
-        self.expression = distribute_not(normalize_domain(exp))
+        self.expression = optimize_domain(table, distribute_not(normalize_domain(exp)))
+
+        # reuse the SQL generated for a domain with the same shape, if possible
+        self._shape_key, self._leaves = self.get_shape()
+        self._compiled = None
+        if self._shape_key is not None:
+            self._compiled = table.pool.expression_cache.get(self._shape_key)
+        if self._compiled is not None:
+            self.result = None
+            return
 
         # parse the domain expression
         self.parse(cr, uid, context=context)
 
+    # ----------------------------------------
+    # Compiled expressions
+    # ----------------------------------------
+
+    def get_shape(self):
+        """ Return a pair ``(key, leaves)`` where ``leaves`` are the extended
+            leaves of the expression, and ``key`` identifies the SQL generated
+            for the expression. The key is ``None`` unless the expression only
+            has terms on the columns of the root model that are translated to
+            SQL as is: in that case the SQL does not depend on the user, the
+            context or the database contents, but only on the fields, the
+            operators and the kind of values of the terms.
+        """
+        model = self.root_model
+        leaves = [ExtendedLeaf(token, model) for token in self.expression]
+        key = [model._name]
+        for leaf in leaves:
+            if leaf.is_operator() or leaf.is_true_leaf() or leaf.is_false_leaf():
+                key.append(leaf.leaf)
+                continue
+            left, operator, right = leaf.leaf
+            if operator in ('child_of', 'parent_of'):
+                return None, leaves
+            column = model._columns.get(left)
+            if column is None:
+                if left not in MAGIC_COLUMNS or left in model._inherit_fields:
+                    return None, leaves
+            elif (isinstance(column, fields.function) and not column.store) or \
+                    column._type in ('one2many', 'many2many') or \
+                    (column._type == 'binary' and column.attachment) or \
+                    (column._type == 'datetime' and right) or \
+                    (column.translate and not callable(column.translate) and right) or \
+                    (column._type == 'many2one' and (isinstance(right, basestring) or (
+                        right and isinstance(right, (tuple, list)) and
+                        all(isinstance(item, basestring) for item in right)))):
+                return None, leaves
+            key.append((left, operator, self._value_shape(column, left, right)))
+        return tuple(key), leaves
+
+    @staticmethod
+    def _value_shape(column, left, right):
+        """ Return what the SQL of a term depends on in its value ``right``. """
+        if right is None or isinstance(right, bool):
+            return right
+        if isinstance(right, (list, tuple)):
+            values = [item for item in right if not item == False]
+            if all(isinstance(item, (int, long)) for item in values) and \
+                    (left == 'id' or column._type in ('many2one', 'integer')):
+                # the ids are passed as one array
+                return 'ids', len(values) < len(right), bool(values)
+            return 'list', len(values) < len(right), len(values)
+        return 'value', bool(right)
+
     # ----------------------------------------
     # Leafs management
     # ----------------------------------------
 
     def get_tables(self):
         """ Returns the list of tables for SQL queries, like select from ... """
+        if self.result is None:
+            return [_quote(self.root_model._table)]
         tables = []
         for leaf in self.result:
             for table in leaf.get_tables():
@@ -716,11 +931,20 @@ class expression(object):
             if left_model._parent_store and (not left_model.pool._init):
                 # TODO: Improve where joins are implemented for many with '.', replace by:
                 # doms += ['&',(prefix+'.parent_left','<',o.parent_right),(prefix+'.parent_left','>=',o.parent_left)]
+                # one range check per subtree; skip the subtrees nested in another one
+                cr.execute('SELECT parent_left, parent_right FROM "%s" WHERE id IN %%s ORDER BY parent_left'
+                           % left_model._table, (tuple(ids),))
                 doms = []
-                for o in left_model.browse(cr, uid, ids, context=context):
+                upper = None
+                for pleft, pright in cr.fetchall():
+                    if pleft is None or (upper is not None and pleft < upper):
+                        continue
                     if doms:
                         doms.insert(0, OR_OPERATOR)
-                    doms += [AND_OPERATOR, ('parent_left', '<', o.parent_right), ('parent_left', '>=', o.parent_left)]
+                    doms += [AND_OPERATOR, ('parent_left', '<', pright), ('parent_left', '>=', pleft)]
+                    upper = pright
+                if not doms:
+                    return FALSE_DOMAIN
                 if prefix:
                     return [(left, 'in', left_model.search(cr, uid, doms, context=context))]
                 return doms
@@ -732,6 +956,24 @@ class expression(object):
                     return ids + recursive_children(ids2, model, parent_field)
                 return [(left, 'in', recursive_children(ids, left_model, parent or left_model._parent_name))]
 
+        def child_of_subquery(ids, left_model, parent=None, prefix=''):
+            """ Return a pair ``(query, params)`` selecting the same ids as
+                :func:`child_of_domain`, without reading the database: the
+                hierarchy is walked by the query itself. """
+            table = left_model._table
+            # the parameters are flattened by to_sql(): one placeholder per id
+            in_ids = 'IN (%s)' % ','.join(['%s'] * len(ids))
+            if left_model._parent_store and (not left_model.pool._init):
+                query = 'SELECT c.id FROM "%s" c JOIN "%s" p ON (c.parent_left >= p.parent_left AND c.parent_left < p.parent_right) WHERE p.id %s' % (table, table, in_ids)
+                if prefix and 'active' in left_model._fields:
+                    query += ' AND c.active'
+            else:
+                query = 'SELECT c.id FROM "%s" c JOIN children ON (c."%s" = children.id)' % (table, parent or left_model._parent_name)
+                if 'active' in left_model._fields:
+                    query += ' WHERE c.active'
+                query = 'WITH RECURSIVE children(id) AS (SELECT id FROM "%s" WHERE id %s UNION %s) SELECT id FROM children' % (table, in_ids, query)
+            return query, list(ids)
+
         def parent_of_domain(left, ids, left_model, parent=None, prefix='', context=None):
             """ Return a domain implementing the parent_of operator for [(left,parent_of,ids)],
                 either as a range using the parent_left/right tree lookup fields
@@ -760,6 +1002,10 @@ class expression(object):
         HIERARCHY_FUNCS = {'child_of': child_of_domain,
                            'parent_of': parent_of_domain}
 
+        # with the context key 'hierarchy_subquery', child_of is translated
+        # into a subquery instead of the ids of the children (see ir.rule)
+        hierarchy_subquery = bool(context and context.get('hierarchy_subquery'))
+
         def pop():
             """ Pop a leaf to process. """
             return self.stack.pop()
@@ -828,10 +1074,14 @@ class expression(object):
 
             elif left == 'id' and operator in HIERARCHY_FUNCS:
                 ids2 = to_ids(right, model, context)
-                dom = HIERARCHY_FUNCS[operator](left, ids2, model)
-                for dom_leaf in reversed(dom):
-                    new_leaf = create_substitution_leaf(leaf, dom_leaf, model)
-                    push(new_leaf)
+                if operator == 'child_of' and ids2 and hierarchy_subquery:
+                    subquery = child_of_subquery(ids2, model)
+                    push_result(create_substitution_leaf(leaf, (left, 'inselect', subquery), model, internal=True))
+                else:
+                    dom = HIERARCHY_FUNCS[operator](left, ids2, model)
+                    for dom_leaf in reversed(dom):
+                        new_leaf = create_substitution_leaf(leaf, dom_leaf, model)
+                        push(new_leaf)
 
             elif not column and path[0] in MAGIC_COLUMNS:
                 push_result(leaf)
@@ -1045,12 +1295,19 @@ class expression(object):
             elif column._type == 'many2one':
                 if operator in HIERARCHY_FUNCS:
                     ids2 = to_ids(right, comodel, context)
-                    if column._obj != model._name:
-                        dom = HIERARCHY_FUNCS[operator](left, ids2, comodel, prefix=column._obj)
+                    if operator == 'child_of' and ids2 and hierarchy_subquery:
+                        if column._obj != model._name:
+                            new_leaf = (left, 'inselect', child_of_subquery(ids2, comodel, prefix=column._obj))
+                        else:
+                            new_leaf = ('id', 'inselect', child_of_subquery(ids2, model, parent=left))
+                        push_result(create_substitution_leaf(leaf, new_leaf, model, internal=True))
                     else:
-                        dom = HIERARCHY_FUNCS[operator]('id', ids2, model, parent=left)
-                    for dom_leaf in reversed(dom):
-                        push(create_substitution_leaf(leaf, dom_leaf, model))
+                        if column._obj != model._name:
+                            dom = HIERARCHY_FUNCS[operator](left, ids2, comodel, prefix=column._obj)
+                        else:
+                            dom = HIERARCHY_FUNCS[operator]('id', ids2, model, parent=left)
+                        for dom_leaf in reversed(dom):
+                            push(create_substitution_leaf(leaf, dom_leaf, model))
                 else:
                     def _get_expression(comodel, cr, uid, left, right, operator, context=None):
                         if context is None:
@@ -1218,11 +1475,21 @@ class expression(object):
                 if params:
                     if left == 'id':
                         instr = ','.join(['%s'] * len(params))
+                        any_array = True
                     else:
-                        ss = model._columns[left]._symbol_set
+                        column = model._columns[left]
+                        ss = column._symbol_set
                         instr = ','.join([ss[0]] * len(params))
                         params = map(ss[1], params)
-                    query = '(%s."%s" %s (%s))' % (table_alias, left, operator, instr)
+                        any_array = column._type in ('many2one', 'integer') and ss[0] == '%s'
+                    if any_array and all(isinstance(value, (int, long)) for value in params):
+                        # pass the ids as one array: the query does not depend
+                        # on their number
+                        array_op = '= ANY' if operator == 'in' else '!= ALL'
+                        query = '(%s."%s" %s (%%s))' % (table_alias, left, array_op)
+                        params = [Array(params)]
+                    else:
+                        query = '(%s."%s" %s (%s))' % (table_alias, left, operator, instr)
                 else:
                     # The case for (left, 'in', []) or (left, 'not in', []).
                     query = 'FALSE' if operator == 'in' else 'TRUE'
@@ -1303,6 +1570,10 @@ class expression(object):
         return query, params
 
     def to_sql(self):
+        if self._compiled is not None:
+            params = [self.__leaf_to_sql(leaf)[1] for leaf in self._leaves if leaf.is_leaf()]
+            return self._compiled, tools.flatten(params)
+
         stack = []
         params = []
         # Process the domain from right to left, using a stack, to generate a SQL expression.
@@ -1326,4 +1597,7 @@ class expression(object):
         if joins:
             query = '(%s) AND %s' % (joins, query)
 
+        if self._shape_key is not None:
+            self.root_model.pool.expression_cache[self._shape_key] = query
+
         return query, tools.flatten(params)
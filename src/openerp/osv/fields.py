@@ -1055,9 +1055,17 @@ class many2many(_column):
                                table=obj._table, tables=','.join(tables), cond=cond)
             cr.execute(query, [id] + params)
 
+        # consecutive commands (4, id) are linked at once
+        to_link = []
         for act in values:
             if not (isinstance(act, list) or isinstance(act, tuple)) or not act:
                 continue
+            if act[0] == 4:
+                to_link.append(act[1])
+                continue
+            if to_link:
+                link(to_link)
+                to_link = []
             if act[0] == 0:
                 idnew = obj.create(cr, user, act[2], context=context)
                 cr.execute('insert into '+rel+' ('+id1+','+id2+') values (%s,%s)', (id, idnew))
@@ -1067,13 +1075,13 @@ class many2many(_column):
                 obj.unlink(cr, user, [act[1]], context=context)
             elif act[0] == 3:
                 cr.execute('delete from '+rel+' where ' + id1 + '=%s and '+ id2 + '=%s', (id, act[1]))
-            elif act[0] == 4:
-                link([act[1]])
             elif act[0] == 5:
                 unlink_all()
             elif act[0] == 6:
                 unlink_all()
                 link(act[2])
+        if to_link:
+            link(to_link)
 
     #
     # TODO: use a name_search
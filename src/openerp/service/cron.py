@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+""" Event-driven scheduler of the cron jobs.
+
+The scheduler knows, for each database, when its next job is due. It sleeps
+until then, or until a notification on the channel ``cron_trigger`` of the
+database ``postgres`` tells that the jobs of a database have changed (see
+:meth:`~openerp.addons.base.ir.ir_cron.ir_cron._notify_scheduler`). The
+databases without active jobs are not looked at until they are notified.
+
+Due jobs are dispatched to a pool of threads, so that a slow job does not
+delay the others. A job is never processed twice at the same time: the
+scheduler does not dispatch a job that is still being processed, and the row
+of the job is locked while it is processed, which excludes the other servers.
+A job running longer than its timeout no longer occupies a thread of the
+pool.
+"""
+
+import logging
+import Queue
+import select
+import threading
+import time
+
+import openerp
+
+_logger = logging.getLogger(__name__)
+
+CHANNEL = 'cron_trigger'
+
+# refresh the list of databases at least every minute
+REFRESH_INTERVAL = 60
+
+# look again at the due jobs that are locked by another server after a minute,
+# in case their completion is not notified
+RETRY_INTERVAL = 60
+
+
+class CronScheduler(object):
+    """ Schedule the cron jobs of the databases returned by the function
+    ``db_names``, and process them with ``workers`` threads.
+    """
+    def __init__(self, db_names, workers):
+        self.db_names = db_names
+        self.workers = workers
+        self.queue = Queue.Queue()
+        self.lock = threading.Lock()
+        self.due = {}               # {db_name: time of the next job, or None}
+        self.running = {}           # {(db_name, job_id): (deadline or None, job)}
+        self.timed_out = set()      # keys of running that timed out
+        self.surplus = 0            # number of threads to stop
+        self.refreshed = 0
+        self.listen_cr = None
+        self.thread_count = 0
+
+    def start(self):
+        """ Start the threads of the pool. With no thread, the jobs are left
+        in ``queue`` for the caller to process them with :meth:`process_job`.
+        """
+        for i in xrange(self.workers):
+            self._spawn_worker()
+
+    def _spawn_worker(self):
+        self.thread_count += 1
+        t = threading.Thread(target=self._worker, name="openerp.service.cron.cron%d" % self.thread_count)
+        t.setDaemon(True)
+        t.start()
+
+    def _worker(self):
+        while True:
+            db_name, job = self.queue.get()
+            self.process_job(db_name, job)
+            with self.lock:
+                if self.surplus:
+                    self.surplus -= 1
+                    return
+
+    def process_job(self, db_name, job):
+        """ Process a job dispatched by the scheduler, in the current thread. """
+        from openerp.addons.base.ir.ir_cron import ir_cron
+        with self.lock:
+            deadline = time.time() + job['timeout'] if job.get('timeout') else None
+            self.running[(db_name, job['id'])] = (deadline, job)
+        try:
+            ir_cron._run_job(db_name, job)
+        except Exception:
+            _logger.exception("Failed to process cron job %s of database %s", job['id'], db_name)
+        finally:
+            self.job_done(db_name, job)
+        with self.lock:
+            self.running.pop((db_name, job['id']), None)
+            if (db_name, job['id']) in self.timed_out:
+                self.timed_out.discard((db_name, job['id']))
+                _logger.info("Cron job %s of database %s completed after its timeout", job['name'], db_name)
+
+    def job_done(self, db_name, job):
+        """ Hook called by the thread that processed ``job``. """
+        pass
+
+    def job_timeout(self, db_name, job):
+        """ Hook called when ``job`` exceeds its timeout: replace the thread
+        that processes it.
+        """
+        with self.lock:
+            self.surplus += 1
+        self._spawn_worker()
+
+    def _listen(self):
+        """ Open the cursor listening to the notifications, if possible. """
+        try:
+            cr = openerp.sql_db.db_connect('postgres').cursor()
+            cr.execute("LISTEN %s" % CHANNEL)
+            cr.commit()
+        except Exception:
+            _logger.warning("Cron scheduler cannot listen to notifications, falling back on polling", exc_info=True)
+            return
+        self.listen_cr = cr
+        # notifications may have been missed, look at all databases
+        for db_name in self.due:
+            self.due[db_name] = 0
+
+    def _wait(self, timeout):
+        """ Wait for notifications during at most ``timeout`` seconds. """
+        if self.listen_cr is None:
+            self._listen()
+        if self.listen_cr is None:
+            time.sleep(timeout)
+            return
+        conn = self.listen_cr._cnx
+        try:
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                conn.poll()
+                while conn.notifies:
+                    db_name = conn.notifies.pop(0).payload
+                    if db_name in self.due:
+                        self.due[db_name] = 0
+        except Exception:
+            _logger.warning("Cron scheduler lost its notifications", exc_info=True)
+            try:
+                self.listen_cr.close()
+            except Exception:
+                pass
+            self.listen_cr = None
+
+    def _refresh(self):
+        """ Update the list of the databases to schedule. """
+        now = time.time()
+        if now - self.refreshed < REFRESH_INTERVAL:
+            return
+        self.refreshed = now
+        db_names = set(self.db_names())
+        for db_name in db_names.difference(self.due):
+            self.due[db_name] = 0
+        for db_name in set(self.due).difference(db_names):
+            del self.due[db_name]
+
+    def _check_timeouts(self):
+        now = time.time()
+        with self.lock:
+            expired = [(key, job) for key, (deadline, job) in self.running.iteritems()
+                       if deadline and deadline < now and key not in self.timed_out]
+            self.timed_out.update(key for key, job in expired)
+        for key, job in expired:
+            _logger.error("Cron job %s of database %s exceeds its timeout of %ss",
+                          job['name'], key[0], job['timeout'])
+            self.job_timeout(key[0], job)
+
+    def _schedule(self, db_name):
+        """ Dispatch the due jobs of ``db_name``, and determine when to look
+        at it again.
+        """
+        from openerp.addons.base.ir.ir_cron import ir_cron
+        jobs, nextcall = ir_cron._get_due_jobs(db_name)
+        now = time.time()
+        with self.lock:
+            # the deadline of a job is set when a thread starts processing it
+            for job in jobs:
+                key = (db_name, job['id'])
+                if key in self.running:
+                    continue
+                self.running[key] = (None, job)
+                self.queue.put((db_name, job))
+        if jobs:
+            nextcall = min(nextcall or now + RETRY_INTERVAL, now + RETRY_INTERVAL)
+        self.due[db_name] = nextcall
+
+    def process(self, timeout=REFRESH_INTERVAL):
+        """ Wait for the next due job or notification, during at most
+        ``timeout`` seconds, and dispatch the jobs that are due.
+        """
+        self._refresh()
+        now = time.time()
+        delays = [timeout, self.refreshed + REFRESH_INTERVAL - now]
+        delays.extend(due - now for due in self.due.itervalues() if due is not None)
+        with self.lock:
+            delays.extend(deadline - now for key, (deadline, job) in self.running.iteritems()
+                          if deadline and key not in self.timed_out)
+        self._wait(max(min(delays), 0))
+        self._check_timeouts()
+        now = time.time()
+        for db_name, due in self.due.items():
+            if due is not None and due <= now:
+                try:
+                    self._schedule(db_name)
+                except Exception:
+                    _logger.exception("Failed to schedule the cron jobs of database %s", db_name)
+                    self.due[db_name] = now + RETRY_INTERVAL
+
+    def run(self):
+        """ Start the pool and schedule jobs forever. """
+        self.start()
+        while True:
+            try:
+                self.process()
+            except Exception:
+                _logger.exception("Cron scheduler failure")
+                time.sleep(RETRY_INTERVAL)
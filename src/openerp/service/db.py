@@ -305,6 +305,10 @@ def exp_migrate_databases(databases):
         openerp.modules.registry.RegistryManager.new(db, force_demo=False, update_module=True)
     return True
 
+def exp_pool_stats():
+    """ Return the statistics of the connection pool of this process """
+    return openerp.sql_db.pool_stats()
+
 #----------------------------------------------------------
 # No master password required
 #----------------------------------------------------------
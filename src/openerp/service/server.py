@@ -8,6 +8,8 @@ import os
 import os.path
 import platform
 import random
+import Queue
+import re
 import select
 import signal
 import socket
@@ -40,6 +42,8 @@ from openerp.modules.registry import RegistryManager
 from openerp.release import nt_service_name
 import openerp.tools.config as config
 from openerp.tools import stripped_sys_argv, dumpstacks, log_ormcache_stats
+from openerp.tools.shared_cache import SharedCacheServer
+from openerp.service.cron import CronScheduler
 
 _logger = logging.getLogger(__name__)
 
@@ -50,7 +54,6 @@ try:
 except ImportError:
     watchdog = None
 
-SLEEP_INTERVAL = 60     # 1 min
 
 def memory_info(process):
     """ psutil < 2.0 does not have memory_info, >= 3.0 does not have
@@ -186,6 +189,28 @@ class CommonServer(object):
                 raise
         sock.close()
 
+    def preload_dbfilter_registries(self):
+        """ Load the registries of the databases matching ``--db-filter`` in
+        the master process, so that the workers inherit them when forked.
+        """
+        dbfilter = config['dbfilter']
+        if '%h' in dbfilter or '%d' in dbfilter:
+            _logger.warning("Cannot preload the registries with a host-dependent db-filter: %s", dbfilter)
+            return
+        if config['db_name']:
+            db_names = config['db_name'].split(',')
+        else:
+            db_names = openerp.service.db.list_dbs(True)
+        for db_name in db_names:
+            if re.match(dbfilter, db_name) and db_name not in RegistryManager.registries:
+                t0 = time.time()
+                try:
+                    RegistryManager.new(db_name)
+                except Exception:
+                    _logger.exception("Failed to preload the registry of database %s", db_name)
+                    continue
+                _logger.info("Preloaded the registry of database %s in %.3fs", db_name, time.time() - t0)
+
 class ThreadedServer(CommonServer):
     def __init__(self, app):
         super(ThreadedServer, self).__init__(app)
@@ -210,36 +235,27 @@ class ThreadedServer(CommonServer):
             openerp.phoenix = True
             self.quit_signals_received += 1
 
-    def cron_thread(self, number):
-        while True:
-            time.sleep(SLEEP_INTERVAL + number)     # Steve Reich timing style
-            registries = openerp.modules.registry.RegistryManager.registries
-            _logger.debug('cron%d polling for jobs', number)
-            for db_name, registry in registries.iteritems():
-                while registry.ready:
-                    acquired = openerp.addons.base.ir.ir_cron.ir_cron._acquire_job(db_name)
-                    if not acquired:
-                        break
-
     def cron_spawn(self):
-        """ Start the above runner function in a daemon thread.
-
-        The thread is a typical daemon thread: it will never quit and must be
-        terminated when the main process exits - with no consequence (the processing
-        threads it spawns are not marked daemon).
+        """ Start the cron scheduler and its pool of threads (see
+        :mod:`openerp.service.cron`). They are daemon threads: they never quit
+        and are terminated when the main process exits.
 
+        Only the databases whose registry is loaded are processed.
         """
         # Force call to strptime just before starting the cron thread
         # to prevent time.strptime AttributeError within the thread.
         # See: http://bugs.python.org/issue7980
         datetime.datetime.strptime('2012-01-01', '%Y-%m-%d')
-        for i in range(openerp.tools.config['max_cron_threads']):
-            def target():
-                self.cron_thread(i)
-            t = threading.Thread(target=target, name="openerp.service.cron.cron%d" % i)
-            t.setDaemon(True)
-            t.start()
-            _logger.debug("cron%d started!" % i)
+        if not openerp.tools.config['max_cron_threads']:
+            return
+        registries = openerp.modules.registry.RegistryManager.registries
+        def db_names():
+            return [db_name for db_name, registry in registries.iteritems() if registry.ready]
+        scheduler = CronScheduler(db_names, openerp.tools.config['max_cron_threads'])
+        t = threading.Thread(target=scheduler.run, name="openerp.service.cron.scheduler")
+        t.setDaemon(True)
+        t.start()
+        _logger.debug("cron scheduler started!")
 
     def http_thread(self):
         def app(e, s):
@@ -318,6 +334,9 @@ class ThreadedServer(CommonServer):
             self.stop()
             return rc
 
+        if config['preload_registries']:
+            self.preload_dbfilter_registries()
+
         # Wait for a first signal to be handled. (time.sleep will be interrupted
         # by the signal handler.) The try/except is for the win32 case.
         try:
@@ -399,6 +418,11 @@ class PreforkServer(CommonServer):
         self.generation = 0
         self.queue = []
         self.long_polling_pid = None
+        self.shared_cache = None
+        # the preloaded registries are refreshed by a thread before spawning
+        # workers, see registries_refresher()
+        self.registries_refresh = threading.Event()
+        self.registries_refreshed = True
 
     def pipe_new(self):
         pipe = os.pipe()
@@ -428,6 +452,7 @@ class PreforkServer(CommonServer):
     def worker_spawn(self, klass, workers_registry):
         self.generation += 1
         worker = klass(self)
+        worker.spawn_time = time.time()
         pid = os.fork()
         if pid != 0:
             worker.pid = pid
@@ -513,12 +538,46 @@ class PreforkServer(CommonServer):
                 _logger.error("Worker (%s) timeout", pid)
                 self.worker_kill(pid, signal.SIGKILL)
 
+    def refresh_registries(self):
+        """ Reload the preloaded registries that have been invalidated since
+        they were loaded, before they are inherited by a new worker.
+        """
+        for db_name in RegistryManager.registries.keys():
+            try:
+                RegistryManager.check_registry_signaling(db_name)
+            except Exception:
+                _logger.exception("Failed to refresh the registry of database %s", db_name)
+                RegistryManager.delete(db_name)
+        # do not share cursors with the workers
+        openerp.sql_db.close_all()
+
+    def registries_refresher(self):
+        """ Refresh the preloaded registries whenever the master process is
+        about to spawn workers. This runs in a thread, so that the master keeps
+        processing signals and timeouts while a registry is reloaded.
+        """
+        while True:
+            self.registries_refresh.wait()
+            self.registries_refresh.clear()
+            self.refresh_registries()
+            self.registries_refreshed = True
+            # wake up the master process
+            self.pipe_ping(self.pipe)
+
     def process_spawn(self):
+        if config['xmlrpc'] and not self.long_polling_pid:
+            self.long_polling_spawn()
+        if config['preload_registries'] and (
+                (config['xmlrpc'] and len(self.workers_http) < self.population) or
+                len(self.workers_cron) < config['max_cron_threads']):
+            if not self.registries_refreshed:
+                # spawn the workers once the registries are refreshed
+                self.registries_refresh.set()
+                return
+            self.registries_refreshed = False
         if config['xmlrpc']:
             while len(self.workers_http) < self.population:
                 self.worker_spawn(WorkerHTTP, self.workers_http)
-            if not self.long_polling_pid:
-                self.long_polling_spawn()
         while len(self.workers_cron) < config['max_cron_threads']:
             self.worker_spawn(WorkerCron, self.workers_cron)
 
@@ -567,6 +626,11 @@ class PreforkServer(CommonServer):
             self.socket.bind(self.address)
             self.socket.listen(8 * self.population)
 
+        if config['ormcache_backend'] == 'shared':
+            # must be started before the registries are preloaded
+            self.shared_cache = SharedCacheServer(config['ormcache_shared_size'])
+            self.shared_cache.start()
+
     def stop(self, graceful=True):
         if self.long_polling_pid is not None:
             # FIXME make longpolling process handle SIGTERM correctly
@@ -591,6 +655,9 @@ class PreforkServer(CommonServer):
             self.worker_kill(pid, signal.SIGTERM)
         if self.socket:
             self.socket.close()
+        if self.shared_cache:
+            self.shared_cache.stop()
+            self.shared_cache = None
 
     def run(self, preload, stop):
         self.start()
@@ -601,6 +668,12 @@ class PreforkServer(CommonServer):
             self.stop()
             return rc
 
+        if config['preload_registries']:
+            self.preload_dbfilter_registries()
+            refresher = threading.Thread(target=self.registries_refresher, name="registries_refresher")
+            refresher.daemon = True
+            refresher.start()
+
         # Empty the cursor pool, we dont want them to be shared among forked workers.
         openerp.sql_db.close_all()
 
@@ -632,6 +705,7 @@ class Worker(object):
         self.watchdog_timeout = multi.timeout
         self.ppid = os.getpid()
         self.pid = None
+        self.spawn_time = None
         self.alive = True
         # should we rename into lifetime ?
         self.request_max = multi.limit_request
@@ -737,11 +811,19 @@ class WorkerHTTP(Worker):
         self.server.socket = client
         # tolerate broken pipe when the http client closes the socket before
         # receiving the full reply
+        start_time = time.time()
         try:
             self.server.process_request(client, addr)
         except IOError, e:
             if e.errno != errno.EPIPE:
                 raise
+        if not self.request_count:
+            # time-to-first-request, the figure to compare with and without
+            # --preload-registries
+            now = time.time()
+            _logger.info("Worker (%s) first request served in %.3fs, %.3fs after fork (%d registries preloaded)",
+                         self.pid, now - start_time, now - self.spawn_time,
+                         len(RegistryManager.registries))
         self.request_count += 1
 
     def process_work(self):
@@ -756,21 +838,33 @@ class WorkerHTTP(Worker):
         Worker.start(self)
         self.server = BaseWSGIServerNoBind(self.multi.app)
 
+class WorkerCronScheduler(CronScheduler):
+    """ Cron scheduler of a cron worker. It has no thread: the worker
+    processes the jobs one at a time in its main loop, so that the watchdog
+    and the CPU time limit of the worker apply to them.
+    """
+    def __init__(self, worker):
+        super(WorkerCronScheduler, self).__init__(worker._db_list, 0)
+        self.worker = worker
+
+    def job_done(self, db_name, job):
+        openerp.modules.registry.RegistryManager.delete(db_name)
+        # dont keep cursors in multi database mode
+        if len(self.due) > 1:
+            openerp.sql_db.close_db(db_name)
+        self.worker.request_count += 1
+
+
 class WorkerCron(Worker):
     """ Cron workers """
 
     def __init__(self, multi):
         super(WorkerCron, self).__init__(multi)
-        # process_work() below process a single database per call.
-        # The variable db_index is keeping track of the next database to
-        # process.
-        self.db_index = 0
+        self.scheduler = None
 
     def sleep(self):
-        # Really sleep once all the databases have been processed.
-        if self.db_index == 0:
-            interval = SLEEP_INTERVAL + self.pid % 10   # chorus effect
-            time.sleep(interval)
+        # the scheduler waits for the jobs in process_work()
+        pass
 
     def _db_list(self):
         if config['db_name']:
@@ -780,46 +874,26 @@ class WorkerCron(Worker):
         return db_names
 
     def process_work(self):
-        rpc_request = logging.getLogger('openerp.netsvc.rpc.request')
-        rpc_request_flag = rpc_request.isEnabledFor(logging.DEBUG)
-        _logger.debug("WorkerCron (%s) polling for jobs", self.pid)
-        db_names = self._db_list()
-        if len(db_names):
-            self.db_index = (self.db_index + 1) % len(db_names)
-            db_name = db_names[self.db_index]
-            self.setproctitle(db_name)
-            if rpc_request_flag:
-                start_time = time.time()
-                start_rss, start_vms = memory_info(psutil.Process(os.getpid()))
-
-            import openerp.addons.base as base
-            base.ir.ir_cron.ir_cron._acquire_job(db_name)
-            openerp.modules.registry.RegistryManager.delete(db_name)
-
-            # dont keep cursors in multi database mode
-            if len(db_names) > 1:
-                openerp.sql_db.close_db(db_name)
-            if rpc_request_flag:
-                run_time = time.time() - start_time
-                end_rss, end_vms = memory_info(psutil.Process(os.getpid()))
-                vms_diff = (end_vms - start_vms) / 1024
-                logline = '%s time:%.3fs mem: %sk -> %sk (diff: %sk)' % \
-                    (db_name, run_time, start_vms / 1024, end_vms / 1024, vms_diff)
-                _logger.debug("WorkerCron (%s) %s", self.pid, logline)
-
-            self.request_count += 1
-            if self.request_count >= self.request_max and self.request_max < len(db_names):
-                _logger.error("There are more dabatases to process than allowed "
-                              "by the `limit_request` configuration variable: %s more.",
-                              len(db_names) - self.request_max)
-        else:
-            self.db_index = 0
+        if self.scheduler.queue.empty():
+            _logger.debug("WorkerCron (%s) waiting for jobs", self.pid)
+            # wake up regularly for the watchdog of the master process
+            self.scheduler.process(self.multi.beat)
+        # process one job per iteration of the main loop: the limits of the
+        # worker are checked between the jobs, and a job that does not return
+        # stops the pings to the watchdog, which kills the worker
+        try:
+            db_name, job = self.scheduler.queue.get_nowait()
+        except Queue.Empty:
+            return
+        self.scheduler.process_job(db_name, job)
 
     def start(self):
         os.nice(10)     # mommy always told me to be nice with others...
         Worker.start(self)
         if self.multi.socket:
             self.multi.socket.close()
+        self.scheduler = WorkerCronScheduler(self)
+        self.scheduler.start()
 
 #----------------------------------------------------------
 # start/stop public api
@@ -8,9 +8,11 @@ the database, *not* a database abstraction toolkit. Database abstraction is what
 the ORM does, in fact.
 """
 
-from contextlib import contextmanager
+from collections import OrderedDict, defaultdict
+from contextlib import closing, contextmanager
 from functools import wraps
 import logging
+import time
 import urlparse
 import uuid
 
@@ -47,6 +49,7 @@ psycopg2.extensions.register_type(psycopg2.extensions.new_type((700, 701, 1700,)
 
 import tools
 from tools.func import frame_codeinfo
+from tools import shared_cache
 from datetime import datetime as mdt
 from datetime import timedelta
 import threading
@@ -253,6 +256,25 @@ class Cursor(object):
            safe for IN conditions, after uniquifying them."""
         return tools.misc.split_every(self.IN_MAX, ids)
 
+    @check
+    def stream(self, query, params=None, size=IN_MAX):
+        """ Execute ``query`` on a server-side (named) cursor, and yield its
+            rows by lists of at most ``size`` rows, so that the whole result
+            is never held in memory. The server-side cursor belongs to the
+            current transaction: do not commit before the iteration is over.
+        """
+        cursor = self._cnx.cursor('stream_%s' % uuid.uuid1().hex)
+        try:
+            cursor.execute(query, params or None)
+            self.sql_log_count += 1
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
     def print_log(self):
         global sql_counter
 
@@ -312,9 +334,10 @@ class Cursor(object):
 
         # Clean the underlying connection.
         self._cnx.rollback()
+        shared_cache.rollback(self.dbname)
 
         if leak:
-            self._cnx.leaked = True
+            self.__pool.leaked(self._cnx)
         else:
             chosen_template = tools.config['db_template']
             templates_list = tuple(set(['template0', 'template1', 'postgres', chosen_template]))
@@ -369,6 +392,7 @@ class Cursor(object):
         """ Perform an SQL `COMMIT`
         """
         result = self._cnx.commit()
+        shared_cache.commit(self.dbname)
         for func in self._pop_event_handlers()['commit']:
             func()
         return result
@@ -378,6 +402,7 @@ class Cursor(object):
         """ Perform an SQL `ROLLBACK`
         """
         result = self._cnx.rollback()
+        shared_cache.rollback(self.dbname)
         for func in self._pop_event_handlers()['rollback']:
             func()
         return result
@@ -495,14 +520,48 @@ class LazyCursor(object):
 class PsycoConnection(psycopg2.extensions.connection):
     pass
 
+def _pool_key(connection_info):
+    """ Return a hashable key for the connection info ``connection_info``. """
+    return frozenset(connection_info.iteritems())
+
+
+def _pool_name(connection_info):
+    """ Return the name of the database of ``connection_info``, for statistics. """
+    if 'dsn' in connection_info:
+        return connection_info_for(connection_info['dsn'])[0]
+    return connection_info.get('database')
+
+
+class _SubPool(object):
+    """ The connections of a ConnectionPool to a given database. """
+    def __init__(self, name):
+        self.name = name
+        self.idle = OrderedDict()       # {cnx: time of give back}, most recent last
+        self.count = 0                  # number of connections, used or not
+        self.borrowed = 0               # number of connections borrowed so far
+        self.wait = 0.0                 # total time spent to borrow connections
+        self.max_wait = 0.0
+        self.leaked = 0                 # number of leaked connections
+
+
 class ConnectionPool(object):
     """ The pool of connections to database(s)
 
         Keep a set of connections to pg databases open, and reuse them
-        to open cursors for all transactions.
-
-        The connections are *not* automatically closed. Only a close_db()
-        can trigger that.
+        to open cursors for all transactions. The connections are grouped by
+        connection info, so that borrowing and giving back a connection is
+        done in constant time.
+
+        The number of connections is limited by ``maxconn`` overall, and by
+        ``maxconn_per_db`` for a single database, so that a busy database
+        cannot take all the connections.
+
+        The connections are *not* automatically closed, unless
+        ``idle_timeout`` is given: the connections that have not been used
+        for that many seconds are then closed. When ``check_interval`` is
+        given, a background thread checks the idle connections at that
+        interval, and the connections are no longer reset when borrowed.
+        Otherwise, only a close_db() can trigger that.
     """
 
     def locked(fun):
@@ -515,65 +574,148 @@ class ConnectionPool(object):
                 self._lock.release()
         return _locked
 
-    def __init__(self, maxconn=64):
-        self._connections = []
+    def __init__(self, maxconn=64, maxconn_per_db=0, idle_timeout=0, check_interval=0):
+        self._pools = {}                # {key: _SubPool}
+        self._idle = OrderedDict()      # {cnx: key} of idle connections, oldest first
+        self._used = {}                 # {cnx: key} of used connections
+        self._leaked = []               # leaked connections, see leaked()
+        self._count = 0
         self._maxconn = max(maxconn, 1)
+        self._maxconn_per_db = min(maxconn_per_db or self._maxconn, self._maxconn)
+        self._idle_timeout = idle_timeout
+        self._check_interval = check_interval
+        self._checker = None
         self._lock = threading.Lock()
 
     def __repr__(self):
-        used = len([1 for c, u in self._connections[:] if u])
-        count = len(self._connections)
-        return "ConnectionPool(used=%d/count=%d/max=%d)" % (used, count, self._maxconn)
+        return "ConnectionPool(used=%d/count=%d/max=%d)" % (len(self._used), self._count, self._maxconn)
 
     def _debug(self, msg, *args):
         _logger.debug(('%r ' + msg), self, *args)
 
-    @locked
+    def _forget(self, cnx, key):
+        """ Close an idle or used connection, and remove it from the pool. """
+        self._idle.pop(cnx, None)
+        self._pools[key].idle.pop(cnx, None)
+        self._used.pop(cnx, None)
+        self._pools[key].count -= 1
+        self._count -= 1
+        if not cnx.closed:
+            cnx.close()
+
+    def _free_leaked(self):
+        """ Put back the leaked connections in the pool. """
+        while self._leaked:
+            cnx = self._leaked.pop()
+            key = self._used.pop(cnx, None)
+            if key is not None:
+                self._pools[key].leaked += 1
+                self._pools[key].idle[cnx] = time.time()
+                self._idle[cnx] = key
+                _logger.info('%r: Free leaked connection to %r', self, cnx.dsn)
+
+    def _start_checker(self):
+        """ Start the thread that checks the idle connections, if necessary. """
+        if (self._check_interval or self._idle_timeout) and \
+                not (self._checker and self._checker.is_alive()):
+            self._checker = threading.Thread(target=self._check_loop,
+                                             name="openerp.sql_db.pool_checker")
+            self._checker.setDaemon(True)
+            self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self._check_interval or self._idle_timeout)
+            try:
+                self.check()
+            except Exception:
+                _logger.exception('%r: Failed to check the idle connections', self)
+
+    def check(self):
+        """ Close the connections that have been idle for too long, and test
+            the other idle connections with a trivial query.
+        """
+        now = time.time()
+        todo = []
+        with self._lock:
+            for cnx, key in self._idle.items():
+                since = self._pools[key].idle[cnx]
+                if cnx.closed or (self._idle_timeout and now - since > self._idle_timeout):
+                    self._forget(cnx, key)
+                    self._debug('Removing idle connection to %r', cnx.dsn)
+                elif self._check_interval:
+                    # take the connection out of the pool while testing it
+                    del self._idle[cnx]
+                    del self._pools[key].idle[cnx]
+                    self._used[cnx] = key
+                    todo.append((cnx, key, since))
+        for cnx, key, since in todo:
+            try:
+                with closing(cnx.cursor()) as cr:
+                    cr.execute('SELECT 1')
+                cnx.rollback()
+                alive = True
+            except psycopg2.Error:
+                alive = False
+            with self._lock:
+                if cnx not in self._used:
+                    continue            # removed by close_all()
+                if alive:
+                    del self._used[cnx]
+                    self._pools[key].idle[cnx] = since
+                    self._idle[cnx] = key
+                else:
+                    self._forget(cnx, key)
+                    self._debug('Removing broken connection to %r', cnx.dsn)
+
     def borrow(self, connection_info):
         """
         :param dict connection_info: dict of psql connection keywords
         :rtype: PsycoConnection
         """
-        # free dead and leaked connections
-        for i, (cnx, _) in tools.reverse_enumerate(self._connections):
-            if cnx.closed:
-                self._connections.pop(i)
-                self._debug('Removing closed connection at index %d: %r', i, cnx.dsn)
-                continue
-            if getattr(cnx, 'leaked', False):
-                delattr(cnx, 'leaked')
-                self._connections.pop(i)
-                self._connections.append((cnx, False))
-                _logger.info('%r: Free leaked connection to %r', self, cnx.dsn)
-
-        for i, (cnx, used) in enumerate(self._connections):
-            if not used and cnx._original_dsn == connection_info:
-                try:
-                    cnx.reset()
-                except psycopg2.OperationalError:
-                    self._debug('Cannot reset connection at index %d: %r', i, cnx.dsn)
-                    # psycopg2 2.4.4 and earlier do not allow closing a closed connection
-                    if not cnx.closed:
-                        cnx.close()
+        start = time.time()
+        key = _pool_key(connection_info)
+        with self._lock:
+            self._free_leaked()
+            self._start_checker()
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _SubPool(_pool_name(connection_info))
+
+            # reuse the most recently used connection
+            while pool.idle:
+                cnx, _since = pool.idle.popitem()
+                del self._idle[cnx]
+                if cnx.closed:
+                    self._debug('Removing closed connection: %r', cnx.dsn)
+                    self._forget(cnx, key)
                     continue
-                self._connections.pop(i)
-                self._connections.append((cnx, True))
-                self._debug('Borrow existing connection to %r at index %d', cnx.dsn, i)
-
+                if not self._check_interval or \
+                        cnx.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        cnx.reset()
+                    except psycopg2.OperationalError:
+                        self._debug('Cannot reset connection: %r', cnx.dsn)
+                        self._forget(cnx, key)
+                        continue
+                self._used[cnx] = key
+                self._debug('Borrow existing connection to %r', cnx.dsn)
+                self._borrowed(pool, start)
                 return cnx
 
-        if len(self._connections) >= self._maxconn:
-            # try to remove the oldest connection not used
-            for i, (cnx, used) in enumerate(self._connections):
-                if not used:
-                    self._connections.pop(i)
-                    if not cnx.closed:
-                        cnx.close()
-                    self._debug('Removing old connection at index %d: %r', i, cnx.dsn)
-                    break
-            else:
-                # note: this code is called only if the for loop has completed (no break)
-                raise PoolError('The Connection Pool Is Full')
+            if pool.count >= self._maxconn_per_db:
+                raise PoolError('The Connection Pool Is Full for database %s' % pool.name)
+            if self._count >= self._maxconn:
+                # remove the oldest connection not used
+                if not self._idle:
+                    raise PoolError('The Connection Pool Is Full')
+                cnx, old_key = self._idle.popitem(last=False)
+                self._forget(cnx, old_key)
+                self._debug('Removing old connection: %r', cnx.dsn)
+
+            # reserve the connection, and connect without holding the lock
+            pool.count += 1
+            self._count += 1
 
         try:
             result = psycopg2.connect(
@@ -581,40 +723,83 @@ class ConnectionPool(object):
                 **connection_info)
         except psycopg2.Error:
             _logger.info('Connection to the database failed')
+            with self._lock:
+                pool.count -= 1
+                self._count -= 1
             raise
         result._original_dsn = connection_info
-        self._connections.append((result, True))
+        with self._lock:
+            self._used[result] = key
+            self._borrowed(pool, start)
         self._debug('Create new connection')
         return result
 
+    def _borrowed(self, pool, start):
+        wait = time.time() - start
+        pool.borrowed += 1
+        pool.wait += wait
+        pool.max_wait = max(pool.max_wait, wait)
+
     @locked
     def give_back(self, connection, keep_in_pool=True):
         self._debug('Give back connection to %r', connection.dsn)
-        for i, (cnx, used) in enumerate(self._connections):
-            if cnx is connection:
-                self._connections.pop(i)
-                if keep_in_pool:
-                    self._connections.append((cnx, False))
-                    self._debug('Put connection to %r in pool', cnx.dsn)
-                else:
-                    self._debug('Forgot connection to %r', cnx.dsn)
-                    cnx.close()
-                break
-        else:
+        key = self._used.pop(connection, None)
+        if key is None:
             raise PoolError('This connection does not below to the pool')
+        if keep_in_pool and not connection.closed:
+            self._pools[key].idle[connection] = time.time()
+            self._idle[connection] = key
+            self._debug('Put connection to %r in pool', connection.dsn)
+        else:
+            self._used[connection] = key
+            self._forget(connection, key)
+            self._debug('Forgot connection to %r', connection.dsn)
+
+    def leaked(self, connection):
+        """ Mark a connection as leaked: it is put back in the pool by the next
+            borrow(). This is safe to call from a destructor, as it does not
+            acquire the pool's lock.
+        """
+        self._leaked.append(connection)
 
     @locked
     def close_all(self, dsn=None):
         count = 0
         last = None
-        for i, (cnx, used) in tools.reverse_enumerate(self._connections):
-            if dsn is None or cnx._original_dsn == dsn:
-                cnx.close()
-                last = self._connections.pop(i)[0]
+        key = dsn and _pool_key(dsn)
+        for cnx, cnx_key in self._idle.items() + self._used.items():
+            if key is None or cnx_key == key:
+                self._forget(cnx, cnx_key)
+                last = cnx
                 count += 1
         _logger.info('%r: Closed %d connections %s', self, count,
                     (dsn and last and 'to %r' % last.dsn) or '')
 
+    @locked
+    def stats(self):
+        """ Return the statistics of the pool, per database. """
+        self._free_leaked()
+        used = defaultdict(int)
+        for key in self._used.itervalues():
+            used[key] += 1
+        databases = {}
+        for key, pool in self._pools.iteritems():
+            stat = databases.setdefault(pool.name, defaultdict(int))
+            stat['connections'] += pool.count
+            stat['used'] += used[key]
+            stat['idle'] += len(pool.idle)
+            stat['borrowed'] += pool.borrowed
+            stat['wait'] += pool.wait
+            stat['max_wait'] = max(stat['max_wait'], pool.max_wait)
+            stat['leaked'] += pool.leaked
+        return {
+            'connections': self._count,
+            'used': len(self._used),
+            'maxconn': self._maxconn,
+            'maxconn_per_db': self._maxconn_per_db,
+            'databases': {name: dict(stat) for name, stat in databases.iteritems()},
+        }
+
 
 class Connection(object):
     """ A lightweight instance of a connection to postgres
@@ -682,7 +867,10 @@ _Pool = None
 def db_connect(to, allow_uri=False):
     global _Pool
     if _Pool is None:
-        _Pool = ConnectionPool(int(tools.config['db_maxconn']))
+        _Pool = ConnectionPool(int(tools.config['db_maxconn']),
+                               int(tools.config['db_maxconn_per_db'] or 0),
+                               int(tools.config['db_pool_idle_timeout'] or 0),
+                               int(tools.config['db_pool_check_interval'] or 0))
 
     db, info = connection_info_for(to)
     if not allow_uri and db != to:
@@ -699,3 +887,7 @@ def close_all():
     global _Pool
     if _Pool:
         _Pool.close_all()
+
+def pool_stats():
+    """ Return the statistics of the connection pool. """
+    return _Pool.stats() if _Pool else {}
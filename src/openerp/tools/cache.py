@@ -192,9 +192,34 @@ class dummy_cache(object):
         pass
 
 
+def new_cache(dbname):
+    """ Return the store of ormcache entries for the registry of ``dbname``,
+    depending on the option ``ormcache_backend``: either a per-process LRU, or
+    the host-wide store shared by the workers of a PreforkServer.
+    """
+    from openerp.tools import config
+    from openerp.tools import shared_cache
+    from openerp.tools.lru import LRU
+
+    if config.get('ormcache_backend') == 'shared' and shared_cache.socket_path:
+        return shared_cache.SharedCache(dbname)
+    return LRU(8192)
+
+
+def _method_name(method):
+    # shared caches store the name of the method instead of the method
+    if isinstance(method, basestring):
+        return method.rsplit('.', 1)[-1]
+    return method.__name__
+
+
 def log_ormcache_stats(sig=None, frame=None):
-    """ Log statistics of ormcache usage by database, model, and method. """
+    """ Log statistics of ormcache usage by database, model, and method,
+    statistics of the recomputations of stored fields and of the record rules
+    applied, and statistics of the code objects cached by safe_eval.
+    """
     from openerp.modules.registry import RegistryManager
+    from openerp.tools.safe_eval import code_cache_stats
     import threading
 
     me = threading.currentThread()
@@ -202,15 +227,33 @@ def log_ormcache_stats(sig=None, frame=None):
     entries = defaultdict(int)
     for dbname, reg in RegistryManager.registries.iteritems():
         for key in reg.cache.iterkeys():
-            entries[(dbname,) + key[:2]] += 1
-    for key, count in sorted(entries.items()):
+            entries[(dbname, key[0], _method_name(key[1]))] += 1
+    for key, stat in sorted(STAT.items(), key=lambda item: (item[0][:2], item[0][2].__name__)):
         dbname, model_name, method = key
+        count = entries.get((dbname, model_name, method.__name__), 0)
+        if not (count or stat.hit or stat.miss):
+            continue
         me.dbname = dbname
-        stat = STAT[key]
         _logger.info("%6d entries, %6d hit, %6d miss, %6d err, %4.1f%% ratio, for %s.%s",
                      count, stat.hit, stat.miss, stat.err, stat.ratio, model_name, method.__name__)
+    for dbname, reg in RegistryManager.registries.iteritems():
+        if getattr(reg.cache, 'shared', False):
+            me.dbname = dbname
+            _logger.info("shared cache: %(entries)d/%(size)d entries, %(hit)d hit, %(miss)d miss "
+                         "on host, %(client_hit)d hit, %(client_miss)d miss, %(client_err)d err "
+                         "in this process", reg.cache.stats())
+    for dbname, reg in RegistryManager.registries.iteritems():
+        me.dbname = dbname
+        for field, stat in sorted(reg.recompute_stats.items()):
+            _logger.info("%6d recomputations, %6d records, %6d updates, for %s",
+                         stat[0], stat[1], stat[2], field)
+        for model_name, stat in sorted(reg.rule_stats.items()):
+            _logger.info("%6d record rule applications, %8.3fs, for %s",
+                         stat[0], stat[1], model_name)
 
     me.dbname = me_dbname
+    _logger.info("safe_eval: %(entries)d/%(size)d code objects, %(hit)d hit, %(miss)d miss, "
+                 "%(ratio)4.1f%% ratio, %(saved).3fs saved", code_cache_stats())
 
 
 def get_cache_key_counter(bound_method, *args, **kwargs):
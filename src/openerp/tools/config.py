@@ -102,6 +102,9 @@ class configmanager(object):
         group.add_option("-i", "--init", dest="init", help="install one or more modules (comma-separated list, use \"all\" for all modules), requires -d")
         group.add_option("-u", "--update", dest="update",
                           help="update one or more modules (comma-separated list, use \"all\" for all modules). Requires -d.")
+        group.add_option("--skip-unchanged-data", dest="skip_unchanged_data", action="store_true", my_default=False,
+                         help="when updating modules, skip the xml and csv data files that did not change since they "
+                              "were last loaded: their records are neither reset nor recreated. Requires -d and -u.")
         group.add_option("--without-demo", dest="without_demo",
                           help="disable loading demo data for modules to be installed (comma-separated, use \"all\" for all modules). Requires -d and -i. Default is %default",
                           my_default=False)
@@ -135,6 +138,14 @@ class configmanager(object):
         group = optparse.OptionGroup(parser, "Web interface Configuration")
         group.add_option("--db-filter", dest="dbfilter", my_default='.*',
                          help="Filter listed database", metavar="REGEXP")
+        group.add_option("--session-store", dest="session_store", my_default='filesystem',
+                         help="Store of the HTTP sessions: 'filesystem' (default), 'sqlite' (shared by "
+                              "the workers of the host) or 'postgresql' (in the database given by "
+                              "--session-store-db).")
+        group.add_option("--session-store-db", dest="session_store_db", my_default=False,
+                         help="Database of the postgresql session store.")
+        group.add_option("--session-ttl", dest="session_ttl", type='int', my_default=7 * 24 * 60 * 60,
+                         help="Lifetime of the HTTP sessions since their last use, in seconds (default one week).")
         parser.add_option_group(group)
 
         # Testing Group
@@ -203,6 +214,15 @@ class configmanager(object):
                          help="specify the database port", type="int")
         group.add_option("--db_maxconn", dest="db_maxconn", type='int', my_default=64,
                          help="specify the the maximum number of physical connections to posgresql")
+        group.add_option("--db_maxconn_per_db", dest="db_maxconn_per_db", type='int', my_default=0,
+                         help="specify the maximum number of physical connections to a single database "
+                              "(default is db_maxconn)")
+        group.add_option("--db_pool_idle_timeout", dest="db_pool_idle_timeout", type='int', my_default=0,
+                         help="close the connections that have been idle for more than that many seconds "
+                              "(default is to keep them open)")
+        group.add_option("--db_pool_check_interval", dest="db_pool_check_interval", type='int', my_default=0,
+                         help="check the idle connections every that many seconds in a background thread, "
+                              "instead of resetting them every time they are used (default is 0: disabled)")
         group.add_option("--db-template", dest="db_template", my_default="template1",
                          help="specify a custom database template to create a new database")
         parser.add_option_group(group)
@@ -276,6 +296,17 @@ class configmanager(object):
             group.add_option("--limit-request", dest="limit_request", my_default=8192,
                              help="Maximum number of request to be processed per worker (default 8192).",
                              type="int")
+            group.add_option("--preload-registries", dest="preload_registries", action="store_true", my_default=False,
+                             help="Load the registries of the databases matching --db-filter in the master "
+                                  "process, so that workers inherit them instead of loading them on their "
+                                  "first request.")
+            group.add_option("--ormcache-backend", dest="ormcache_backend", my_default='local',
+                             type="choice", choices=['local', 'shared'],
+                             help="Store of the ormcache entries: 'local' to each worker (default), or "
+                                  "'shared' by all the workers of the host through a local socket.")
+            group.add_option("--ormcache-shared-size", dest="ormcache_shared_size", my_default=262144,
+                             help="Maximum number of entries of the shared ormcache (default 262144).",
+                             type="int")
             parser.add_option_group(group)
 
         # Copy all optparse options (i.e. MyOption) into self.options.
@@ -362,9 +393,11 @@ class configmanager(object):
                 'db_name', 'db_user', 'db_password', 'db_host',
                 'db_port', 'db_template', 'logfile', 'pidfile', 'smtp_port',
                 'email_from', 'smtp_server', 'smtp_user', 'smtp_password',
-                'db_maxconn', 'import_partial', 'addons_path',
+                'db_maxconn', 'db_maxconn_per_db', 'db_pool_idle_timeout',
+                'db_pool_check_interval', 'import_partial', 'addons_path',
                 'xmlrpc', 'syslog', 'without_demo',
-                'dbfilter', 'log_level', 'log_db',
+                'dbfilter', 'session_store', 'session_store_db', 'session_ttl',
+                'log_level', 'log_db',
                 'log_db_level', 'geoip_database',
         ]
 
@@ -389,13 +422,14 @@ class configmanager(object):
             'list_db', 'proxy_mode',
             'test_file', 'test_enable', 'test_commit', 'test_report_directory',
             'osv_memory_count_limit', 'osv_memory_age_limit', 'max_cron_threads', 'unaccent',
-            'data_dir',
+            'data_dir', 'skip_unchanged_data',
         ]
 
         posix_keys = [
             'workers',
             'limit_memory_hard', 'limit_memory_soft',
             'limit_time_cpu', 'limit_time_real', 'limit_request',
+            'ormcache_backend', 'ormcache_shared_size', 'preload_registries',
         ]
 
         if os.name == 'posix':
@@ -38,6 +38,12 @@ _logger = logging.getLogger(__name__)
 unsafe_eval = eval
 from safe_eval import safe_eval as eval
 
+# the external identifiers in expressions like ref('module.name')
+REF_PATTERN = re.compile(r"""\bref\(\s*['"]([\w.]+)['"]\s*\)""")
+
+# the attributes holding external identifiers
+XMLID_ATTRIBUTES = ('id', 'ref', 'inherit_id', 'parent', 'action')
+
 class ParseError(Exception):
     def __init__(self, msg, text, filename, lineno):
         self.msg = msg
@@ -792,6 +798,18 @@ form: module.record_id""" % (xml_id,)
             cr, self.uid, id_str,
             raise_if_not_found=raise_if_not_found)
 
+    def collect_xmlids(self, de):
+        """ Return the external identifiers defined or referenced in ``de``. """
+        names = set()
+        for node in de.iter():
+            if isinstance(node, SKIPPED_ELEMENT_TYPES):
+                continue
+            names.update(node.get(attr) for attr in XMLID_ATTRIBUTES)
+            names.update(group.strip().lstrip('-') for group in node.get('groups', '').split(','))
+            names.update(REF_PATTERN.findall(node.get('eval', '')))
+        return set(name if '.' in name else '%s.%s' % (self.module, name)
+                   for name in names if name)
+
     def parse(self, de, mode=None):
         roots = ['openerp','data','odoo']
         if de.tag not in roots:
@@ -903,7 +921,19 @@ def convert_csv_import(cr, module, fname, csvcontent, idref=None, mode='init',
             _logger.error("Cannot import the line: %s", line)
 
     registry = openerp.registry(cr.dbname)
-    result, rows, warning_msg, dummy = registry[model].import_data(cr, uid, fields, datas,mode, module, noupdate, filename=fname_partial)
+    model_data = registry['ir.model.data']
+    xmlids = set()
+    for index, field in enumerate(fields):
+        if field == 'id' or field.endswith(':id') or field.endswith('/id'):
+            for line in datas:
+                names = line[index].split(',') if index < len(line) else []
+                xmlids.update(name if '.' in name else '%s.%s' % (module, name)
+                              for name in map(unicode.strip, names) if name)
+    model_data._prefetch_xmlids(cr, uid, xmlids)
+    try:
+        result, rows, warning_msg, dummy = registry[model].import_data(cr, uid, fields, datas,mode, module, noupdate, filename=fname_partial)
+    finally:
+        model_data._clear_prefetched()
     if result < 0:
         # Report failed import and abort module install
         raise Exception(_('Module loading %s failed: file %s could not be processed:\n %s') % (module, fname, warning_msg))
@@ -931,5 +961,10 @@ def convert_xml_import(cr, module, xmlfile, idref=None, mode='init', noupdate=Fa
     else:
         xml_filename = xmlfile
     obj = xml_import(cr, module, idref, mode, report=report, noupdate=noupdate, xml_filename=xml_filename)
-    obj.parse(doc.getroot(), mode=mode)
+    model_data = obj.pool['ir.model.data']
+    model_data._prefetch_xmlids(cr, SUPERUSER_ID, obj.collect_xmlids(doc.getroot()))
+    try:
+        obj.parse(doc.getroot(), mode=mode)
+    finally:
+        model_data._clear_prefetched()
     return True
@@ -19,12 +19,15 @@ from opcode import HAVE_ARGUMENT, opmap, opname
 from psycopg2 import OperationalError
 from types import CodeType
 import logging
+import threading
+import time
 
+from .lru import LRU
 from .misc import ustr
 
 import openerp
 
-__all__ = ['test_expr', 'safe_eval', 'const_eval']
+__all__ = ['test_expr', 'safe_eval', 'const_eval', 'code_cache_stats']
 
 # The time module is usually already provided in the safe_eval environment
 # but some code, e.g. datetime.datetime.now() (Windows/Python 2.5.2, bug
@@ -34,7 +37,7 @@ _ALLOWED_MODULES = ['_strptime', 'math', 'time']
 _UNSAFE_ATTRIBUTES = ['f_builtins', 'f_globals', 'f_locals', 'gi_frame',
                       'co_code', 'func_globals']
 
-_CONST_OPCODES = set(opmap[x] for x in [
+_CONST_OPCODES = frozenset(opmap[x] for x in [
     'POP_TOP', 'ROT_TWO', 'ROT_THREE', 'ROT_FOUR', 'DUP_TOP', 'DUP_TOPX',
     'POP_BLOCK','SETUP_LOOP', 'BUILD_LIST', 'BUILD_MAP', 'BUILD_TUPLE',
     'LOAD_CONST', 'RETURN_VALUE', 'STORE_SUBSCR', 'STORE_MAP'] if x in opmap)
@@ -138,6 +141,61 @@ def assert_valid_codeobj(allowed_codes, code_obj, expr):
         if isinstance(const, CodeType):
             assert_valid_codeobj(allowed_codes, const, 'lambda')
 
+class _CodeCache(object):
+    """ Bounded cache of the code objects validated by :func:`test_expr`,
+    indexed by ``(expression, allowed opcodes, mode)``. Only expressions that
+    compile and pass the validation are stored; code objects are immutable,
+    so they can be shared by all the evaluations of the same expression.
+    """
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self.entries = LRU(size)
+        self.hit = 0
+        self.miss = 0
+        self.saved = 0.0            # time saved by the hits, in seconds
+
+    def get(self, key):
+        try:
+            code_obj, duration = self.entries[key]
+        except (KeyError, TypeError):
+            return None
+        with self._lock:
+            self.hit += 1
+            self.saved += duration
+        return code_obj
+
+    def set(self, key, code_obj, duration):
+        with self._lock:
+            self.miss += 1
+        try:
+            self.entries[key] = (code_obj, duration)
+        except TypeError:
+            pass
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hit + self.miss
+            return {
+                'entries': len(self.entries),
+                'size': self.entries.count,
+                'hit': self.hit,
+                'miss': self.miss,
+                'ratio': 100.0 * self.hit / total if total else 0.0,
+                'saved': self.saved,
+            }
+
+_code_cache = _CodeCache(4096)
+
+def code_cache_stats():
+    """ Return the statistics of the cache of validated code objects: the
+    number of ``entries`` out of ``size``, the ``hit`` and ``miss`` counts,
+    the hit ``ratio`` in percent, and the time ``saved`` in seconds.
+    """
+    return _code_cache.stats()
+
 def test_expr(expr, allowed_codes, mode="eval"):
     """test_expr(expression, allowed_codes[, mode]) -> code_object
 
@@ -145,7 +203,15 @@ def test_expr(expr, allowed_codes, mode="eval"):
     If the expression is valid and contains only allowed codes,
     return the compiled code object.
     Otherwise raise a ValueError, a Syntax Error or TypeError accordingly.
+
+    The code objects of valid expressions are cached, provided that
+    ``allowed_codes`` is hashable (like the opcode sets of this module).
     """
+    key = (expr, allowed_codes, mode)
+    code_obj = _code_cache.get(key)
+    if code_obj is not None:
+        return code_obj
+    start = time.time()
     try:
         if mode == 'eval':
             # eval() does not like leading/trailing whitespace
@@ -158,6 +224,7 @@ def test_expr(expr, allowed_codes, mode="eval"):
         exc_info = sys.exc_info()
         raise ValueError, '"%s" while compiling\n%r' % (ustr(e), expr), exc_info[2]
     assert_valid_codeobj(allowed_codes, code_obj, expr)
+    _code_cache.set(key, code_obj, time.time() - start)
     return code_obj
 
 
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+""" Stores of the HTTP sessions.
+
+The store used by the server is given by the option ``session_store``, as a
+key of :data:`session_stores`:
+
+* ``filesystem`` (default): one pickle file per session in the session
+  directory, expired by scanning the directory;
+* ``sqlite``: a SQLite database in the session directory, shared by the
+  workers of the host;
+* ``postgresql``: a table in the database ``session_store_db``, shared by
+  all the servers connected to it.
+
+Other stores can be provided by server-wide modules: subclass
+:class:`SessionStore` and register the class in :data:`session_stores`.
+
+The sqlite and postgresql stores index the sessions by expiration time, so
+that expiring them does not look at every session. All the stores write a
+session only when its content has changed.
+"""
+
+import cPickle
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import psycopg2
+import werkzeug.contrib.sessions
+from werkzeug.posixemulation import rename
+
+from openerp import sql_db
+
+_logger = logging.getLogger(__name__)
+
+__all__ = ['SessionStore', 'FilesystemSessionStore', 'SqliteSessionStore',
+           'PostgresSessionStore', 'session_stores', 'create_session_store']
+
+
+class SessionStore(werkzeug.contrib.sessions.SessionStore):
+    """ Base class of the session stores. Sessions are serialized with
+    pickle, and subclasses only implement the storage of the serialized data
+    (methods ``_load``, ``_store``, ``_touch``, ``_delete`` and ``_expire``).
+
+    :param path: the session directory, where the files uploaded with the
+                 requests saved in sessions are kept (see
+                 :meth:`~openerp.http.OpenERPSession.save_request_data`)
+    :param ttl: the lifetime of the sessions since their last use, in seconds
+    :param session_class: the class of the sessions; its instances must
+                          accept a ``serialized`` attribute
+    """
+    def __init__(self, path, ttl, session_class=None):
+        super(SessionStore, self).__init__(session_class)
+        self.path = path
+        self.ttl = ttl
+
+    def _load(self, sid):
+        """ Return the serialized session ``sid`` and its expiration time, or
+        ``(None, None)`` if it does not exist. The expiration time may be
+        ``None`` if the store does not track it.
+        """
+        raise NotImplementedError
+
+    def _store(self, sid, data, expire):
+        """ Store the serialized session ``sid`` until ``expire``. """
+        raise NotImplementedError
+
+    def _touch(self, sid, expire):
+        """ Extend the lifetime of the session ``sid`` until ``expire``. """
+        raise NotImplementedError
+
+    def _delete(self, sid):
+        """ Remove the session ``sid``. """
+        raise NotImplementedError
+
+    def _expire(self, now):
+        """ Remove the sessions that expired before ``now``. """
+        raise NotImplementedError
+
+    def get(self, sid):
+        if not self.is_valid_key(sid):
+            return self.new()
+        now = time.time()
+        data, expire = self._load(sid)
+        if expire is not None and expire < now:
+            data = None
+        try:
+            values = cPickle.loads(data) if data else {}
+        except Exception:
+            values = {}
+        session = self.session_class(values, sid, False)
+        session.serialized = data
+        if expire is not None and expire - now < self.ttl / 2:
+            # keep the sessions in use alive, without writing them every time
+            self._touch(sid, now + self.ttl)
+        return session
+
+    def save(self, session):
+        data = cPickle.dumps(dict(session), cPickle.HIGHEST_PROTOCOL)
+        if data != session.serialized:
+            self._store(session.sid, data, time.time() + self.ttl)
+            session.serialized = data
+
+    def delete(self, session):
+        self._delete(session.sid)
+        session.serialized = None
+
+    def gc(self, now=None):
+        """ Remove the sessions expired at ``now`` (by default, the current
+        time), and the stale files of the requests saved in sessions.
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        for fname in os.listdir(self.path):
+            if fname.startswith('werkzeug_') and fname.endswith('.file'):
+                path = os.path.join(self.path, fname)
+                try:
+                    if os.path.getmtime(path) < now - self.ttl:
+                        os.unlink(path)
+                except OSError:
+                    pass
+
+
+class FilesystemSessionStore(SessionStore):
+    """ Store each session in a file of the session directory, like
+    :class:`werkzeug.contrib.sessions.FilesystemSessionStore` does. The
+    sessions expire with the modification time of their file, which is
+    updated when they are used.
+    """
+    def _filename(self, sid):
+        return os.path.join(self.path, 'werkzeug_%s.sess' % sid)
+
+    def _load(self, sid):
+        try:
+            with open(self._filename(sid), 'rb') as f:
+                return f.read(), os.fstat(f.fileno()).st_mtime + self.ttl
+        except (IOError, OSError):
+            return None, None
+
+    def _store(self, sid, data, expire):
+        fd, tmp = tempfile.mkstemp(suffix='.__wz_sess', dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            rename(tmp, self._filename(sid))
+            os.chmod(self._filename(sid), 0644)
+        except (IOError, OSError):
+            pass
+
+    def _touch(self, sid, expire):
+        try:
+            os.utime(self._filename(sid), (expire - self.ttl, expire - self.ttl))
+        except OSError:
+            pass
+
+    def _delete(self, sid):
+        try:
+            os.unlink(self._filename(sid))
+        except OSError:
+            pass
+
+    def _expire(self, now):
+        pass
+
+    def gc(self, now=None):
+        last_use = (time.time() if now is None else now) - self.ttl
+        for fname in os.listdir(self.path):
+            path = os.path.join(self.path, fname)
+            try:
+                if os.path.getmtime(path) < last_use:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+class SqliteSessionStore(SessionStore):
+    """ Store the sessions in a SQLite database of the session directory,
+    shared by the workers of the host. Put the data directory on a tmpfs to
+    keep the sessions in memory.
+    """
+    def __init__(self, path, ttl, session_class=None, filename='sessions.sqlite'):
+        super(SqliteSessionStore, self).__init__(path, ttl, session_class)
+        self.filename = os.path.join(path, filename)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS session "
+                     "(sid TEXT PRIMARY KEY, data BLOB NOT NULL, expire REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS session_expire ON session (expire)")
+
+    def _connection(self):
+        # connections can be shared by neither threads nor processes
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+            local.conn.execute("PRAGMA journal_mode=WAL")
+            local.conn.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.conn
+
+    def _load(self, sid):
+        row = self._connection().execute(
+            "SELECT data, expire FROM session WHERE sid=?", (sid,)).fetchone()
+        return (str(row[0]), row[1]) if row else (None, None)
+
+    def _store(self, sid, data, expire):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO session (sid, data, expire) VALUES (?, ?, ?)",
+            (sid, sqlite3.Binary(data), expire))
+
+    def _touch(self, sid, expire):
+        self._connection().execute("UPDATE session SET expire=? WHERE sid=?", (expire, sid))
+
+    def _delete(self, sid):
+        self._connection().execute("DELETE FROM session WHERE sid=?", (sid,))
+
+    def _expire(self, now):
+        self._connection().execute("DELETE FROM session WHERE expire < ?", (now,))
+
+
+class PostgresSessionStore(SessionStore):
+    """ Store the sessions in a table of the database ``dbname`` (by default,
+    the option ``session_store_db``), shared by all the servers using it.
+    """
+    _table = 'http_session'
+
+    def __init__(self, path, ttl, session_class=None, dbname=None):
+        super(PostgresSessionStore, self).__init__(path, ttl, session_class)
+        if dbname is None:
+            from openerp.tools import config
+            dbname = config['session_store_db']
+        if not dbname:
+            raise ValueError("The postgresql session store requires the option session_store_db")
+        self.db = sql_db.db_connect(dbname)
+        try:
+            with self._cursor() as cr:
+                cr.execute("SELECT 1 FROM pg_class WHERE relname=%s", (self._table,))
+                if not cr.rowcount:
+                    cr.execute("""CREATE TABLE %s (sid varchar PRIMARY KEY, data bytea NOT NULL,
+                                                   expire double precision NOT NULL)""" % self._table)
+                    cr.execute("CREATE INDEX %s_expire_index ON %s (expire)" % (self._table, self._table))
+        except psycopg2.Error:
+            # another worker has created the table at the same time
+            _logger.debug("Table %s of the session store already exists", self._table, exc_info=True)
+
+    def _cursor(self):
+        # sessions are independent, no need for a transaction
+        cr = self.db.cursor()
+        cr.autocommit(True)
+        return cr
+
+    def _load(self, sid):
+        with self._cursor() as cr:
+            cr.execute("SELECT data, expire FROM %s WHERE sid=%%s" % self._table, (sid,))
+            row = cr.fetchone()
+        return (str(row[0]), row[1]) if row else (None, None)
+
+    def _store(self, sid, data, expire):
+        with self._cursor() as cr:
+            cr.execute("UPDATE %s SET data=%%s, expire=%%s WHERE sid=%%s" % self._table,
+                       (psycopg2.Binary(data), expire, sid))
+            if not cr.rowcount:
+                cr.execute("INSERT INTO %s (sid, data, expire) VALUES (%%s, %%s, %%s)" % self._table,
+                           (sid, psycopg2.Binary(data), expire))
+
+    def _touch(self, sid, expire):
+        with self._cursor() as cr:
+            cr.execute("UPDATE %s SET expire=%%s WHERE sid=%%s" % self._table, (expire, sid))
+
+    def _delete(self, sid):
+        with self._cursor() as cr:
+            cr.execute("DELETE FROM %s WHERE sid=%%s" % self._table, (sid,))
+
+    def _expire(self, now):
+        with self._cursor() as cr:
+            cr.execute("DELETE FROM %s WHERE expire < %%s" % self._table, (now,))
+
+
+#: the session stores by name, for the option ``session_store``
+session_stores = {
+    'filesystem': FilesystemSessionStore,
+    'sqlite': SqliteSessionStore,
+    'postgresql': PostgresSessionStore,
+}
+
+
+def create_session_store(session_class=None):
+    """ Return the session store given by the server options. """
+    from openerp.tools import config
+    name = config['session_store']
+    if name not in session_stores:
+        raise ValueError("Unknown session store %r, expected one of: %s"
+                         % (name, ", ".join(sorted(session_stores))))
+    return session_stores[name](config.session_dir, config['session_ttl'], session_class)
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+""" Host-wide ormcache store shared by the workers of a PreforkServer.
+
+The master process runs a :class:`SharedCacheServer` on a local unix socket
+before forking its workers. Each worker talks to it through a
+:class:`SharedCache`, which has the same mapping API as the per-process
+:class:`~openerp.tools.lru.LRU` used by default for ``Registry.cache``.
+
+Entries are stored per database under a generation number. Clearing the
+cache of a database simply bumps its generation, so that all the workers of
+the host see the invalidation at once, and old entries age out of the LRU.
+
+The values computed by a transaction may depend on its uncommitted changes.
+They are kept in the thread that computed them, and only published to the
+server when the transaction commits (see :func:`commit` and :func:`rollback`,
+called by the database cursors).
+"""
+
+import cPickle
+import logging
+import os
+import shutil
+import socket
+import struct
+import SocketServer
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from lru import LRU
+
+_logger = logging.getLogger(__name__)
+
+__all__ = ['SharedCacheServer', 'SharedCache']
+
+# path of the socket of the running server, inherited by forked workers
+socket_path = None
+
+# maximum number of values kept per client until the transaction commits
+PENDING_SIZE = 1024
+
+# the values not yet published by the current thread, by client
+_transaction = threading.local()
+
+
+def _pending():
+    try:
+        return _transaction.pending
+    except AttributeError:
+        _transaction.pending = pending = {}
+        return pending
+
+
+def commit(dbname):
+    """ Publish the values computed by the current thread on ``dbname``. """
+    pending = _pending()
+    for client in [client for client in pending if client.dbname == dbname]:
+        client._publish(pending.pop(client))
+
+
+def rollback(dbname):
+    """ Discard the values computed by the current thread on ``dbname``. """
+    pending = _pending()
+    for client in [client for client in pending if client.dbname == dbname]:
+        del pending[client]
+
+_HEADER = struct.Struct('!I')
+
+
+def _send(sock, obj):
+    data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("shared cache connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def _recv(sock):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return cPickle.loads(_recv_exactly(sock, size))
+
+
+class _Handler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                message = _recv(self.request)
+                _send(self.request, getattr(store, message[0])(*message[1:]))
+            except (EOFError, socket.error):
+                return
+
+
+class _Store(object):
+    """ The actual storage of the server: an LRU of pickled values indexed by
+    ``(dbname, generation, pickled key)``.
+    """
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self.entries = LRU(size)
+        self.generation = defaultdict(int)
+        self.sequence = defaultdict(int)
+        self.dirty = set()
+        self.hit = 0
+        self.miss = 0
+
+    def get(self, dbname, key):
+        try:
+            value = self.entries[(dbname, self.generation[dbname], key)]
+            self.hit += 1
+            return True, value
+        except KeyError:
+            self.miss += 1
+            return False, None
+
+    def set(self, dbname, key, value):
+        self.entries[(dbname, self.generation[dbname], key)] = value
+        self.dirty.add(dbname)
+
+    def set_many(self, dbname, items):
+        for key, value in items:
+            self.set(dbname, key, value)
+
+    def delete(self, dbname, key):
+        try:
+            del self.entries[(dbname, self.generation[dbname], key)]
+        except KeyError:
+            pass
+
+    def clear(self, dbname, sequence=None):
+        """ Invalidate the entries of ``dbname``. When ``sequence`` is given,
+        the clearing comes from the database signaling, and is only performed
+        by the first worker of the host that sees that sequence.
+        """
+        with self._lock:
+            if sequence is not None:
+                if sequence <= self.sequence[dbname]:
+                    return False
+                self.sequence[dbname] = sequence
+            if dbname in self.dirty:
+                self.generation[dbname] += 1
+                self.dirty.discard(dbname)
+            return True
+
+    def keys(self, dbname):
+        generation = self.generation[dbname]
+        return [key for (db, gen, key) in self.entries.keys()
+                if db == dbname and gen == generation]
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'size': self.entries.count,
+            'hit': self.hit,
+            'miss': self.miss,
+        }
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class SharedCacheServer(object):
+    """ Serve a shared cache store on a local unix socket, in a daemon thread
+    of the current process. Unless ``path`` is given, the socket is created in
+    a new directory only accessible to the user of the process, as the server
+    unpickles whatever it receives.
+    """
+    def __init__(self, size, path=None):
+        self.path = path
+        self.directory = None
+        self.size = size
+        self.server = None
+
+    def start(self):
+        global socket_path
+        if not self.path:
+            # mkdtemp() creates the directory with mode 0700
+            self.directory = tempfile.mkdtemp(prefix='odoo-ormcache-')
+            self.path = os.path.join(self.directory, 'ormcache.sock')
+        elif os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = _Server(self.path, _Handler)
+        os.chmod(self.path, 0600)
+        self.server.store = _Store(self.size)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  name="openerp.ormcache.server")
+        thread.setDaemon(True)
+        thread.start()
+        socket_path = self.path
+        _logger.info("Shared ormcache listening on %s (%d entries)", self.path, self.size)
+
+    def stop(self):
+        global socket_path
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            if self.directory:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = self.path = None
+            socket_path = None
+
+
+def _key_part(part):
+    """ Make a key part independent of the process: functions are replaced by
+    their qualified name.
+    """
+    if callable(part) and hasattr(part, '__module__'):
+        return '%s.%s' % (part.__module__, part.__name__)
+    return part
+
+
+class SharedCache(object):
+    """ Client of a :class:`SharedCacheServer` for a given database, with the
+    mapping API of :class:`~openerp.tools.lru.LRU`. Values must be picklable;
+    those that are not are simply not cached. Every lookup returns a copy of
+    the cached value. Values are only published to the other workers once the
+    transaction of the current thread commits.
+    """
+    shared = True
+
+    def __init__(self, dbname, path=None):
+        self.dbname = dbname
+        self.path = path or socket_path
+        self._lock = threading.Lock()
+        self._sock = None
+        self._pid = None
+        self._sequence = None
+        self.hit = 0
+        self.miss = 0
+        self.err = 0
+
+    def _call(self, *message):
+        with self._lock:
+            if self._pid != os.getpid():
+                # the connection of the parent process must not be shared
+                self._sock = None
+            try:
+                if self._sock is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.connect(self.path)
+                    self._sock, self._pid = sock, os.getpid()
+                _send(self._sock, message)
+                return _recv(self._sock)
+            except (socket.error, EOFError):
+                self._sock = None
+                raise
+
+    def _dumps_key(self, key):
+        try:
+            return cPickle.dumps(tuple(_key_part(part) for part in key), cPickle.HIGHEST_PROTOCOL)
+        except cPickle.PicklingError, e:
+            # ormcache treats unhashable keys by not caching
+            raise TypeError(e)
+
+    def _unavailable(self):
+        _logger.warning("Shared ormcache unavailable on %s", self.path, exc_info=True)
+        self.err += 1
+
+    def _publish(self, entries):
+        try:
+            self._call('set_many', self.dbname, entries.items())
+        except (socket.error, EOFError):
+            self._unavailable()
+
+    def __getitem__(self, key):
+        skey = self._dumps_key(key)
+        pending = _pending().get(self)
+        if pending and skey in pending:
+            self.hit += 1
+            return cPickle.loads(pending[skey])
+        try:
+            found, value = self._call('get', self.dbname, skey)
+        except (socket.error, EOFError):
+            self._unavailable()
+            raise KeyError(key)
+        if not found:
+            self.miss += 1
+            raise KeyError(key)
+        self.hit += 1
+        return cPickle.loads(value)
+
+    def __setitem__(self, key, value):
+        try:
+            value = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        except (cPickle.PicklingError, TypeError):
+            self.err += 1
+            return
+        pending = _pending().setdefault(self, {})
+        if len(pending) < PENDING_SIZE:
+            pending[self._dumps_key(key)] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __delitem__(self, key):
+        skey = self._dumps_key(key)
+        _pending().get(self, {}).pop(skey, None)
+        try:
+            self._call('delete', self.dbname, skey)
+        except (socket.error, EOFError):
+            self._unavailable()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key):
+        value = self[key]
+        del self[key]
+        return value
+
+    def clear(self):
+        """ Invalidate the entries of the database for all the workers. """
+        _pending().pop(self, None)
+        try:
+            self._call('clear', self.dbname, self._sequence)
+        except (socket.error, EOFError):
+            self._unavailable()
+
+    @contextmanager
+    def signaled(self, sequence):
+        """ Context manager for the clearings that follow the database
+        signaling ``sequence``: only the first one on the host is effective.
+        """
+        self._sequence = sequence
+        try:
+            yield
+        finally:
+            self._sequence = None
+
+    def iterkeys(self):
+        try:
+            keys = set(self._call('keys', self.dbname))
+        except (socket.error, EOFError):
+            self._unavailable()
+            keys = set()
+        keys.update(_pending().get(self, ()))
+        for key in keys:
+            yield cPickle.loads(key)
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def stats(self):
+        """ Return the statistics of the server and of this client. """
+        try:
+            stats = dict(self._call('stats'))
+        except (socket.error, EOFError):
+            self._unavailable()
+            stats = {}
+        stats.update(client_hit=self.hit, client_miss=self.miss, client_err=self.err)
+        return stats
@@ -338,11 +338,12 @@ class GettextAlias(object):
     def _get_cr(self, frame, allow_create=True):
         # try, in order: cr, cursor, self.env.cr, self.cr,
         # request.env.cr
-        if 'cr' in frame.f_locals:
-            return frame.f_locals['cr'], False
-        if 'cursor' in frame.f_locals:
-            return frame.f_locals['cursor'], False
-        s = frame.f_locals.get('self')
+        local_vars = frame.f_locals
+        if 'cr' in local_vars:
+            return local_vars['cr'], False
+        if 'cursor' in local_vars:
+            return local_vars['cursor'], False
+        s = local_vars.get('self')
         if hasattr(s, 'env'):
             return s.env.cr, False
         if hasattr(s, 'cr'):
@@ -361,25 +362,27 @@ class GettextAlias(object):
 
     def _get_uid(self, frame):
         # try, in order: uid, user, self.env.uid
-        if 'uid' in frame.f_locals:
-            return frame.f_locals['uid']
-        if 'user' in frame.f_locals:
-            return int(frame.f_locals['user'])      # user may be a record
-        s = frame.f_locals.get('self')
+        local_vars = frame.f_locals
+        if 'uid' in local_vars:
+            return local_vars['uid']
+        if 'user' in local_vars:
+            return int(local_vars['user'])      # user may be a record
+        s = local_vars.get('self')
         return s.env.uid
 
     def _get_lang(self, frame):
         # try, in order: context.get('lang'), kwargs['context'].get('lang'),
         # self.env.lang, self.localcontext.get('lang'), request.env.lang
+        local_vars = frame.f_locals
         lang = None
-        if frame.f_locals.get('context'):
-            lang = frame.f_locals['context'].get('lang')
+        if local_vars.get('context'):
+            lang = local_vars['context'].get('lang')
         if not lang:
-            kwargs = frame.f_locals.get('kwargs', {})
+            kwargs = local_vars.get('kwargs', {})
             if kwargs.get('context'):
                 lang = kwargs['context'].get('lang')
         if not lang:
-            s = frame.f_locals.get('self')
+            s = local_vars.get('self')
             if hasattr(s, 'env'):
                 lang = s.env.lang
             if not lang:
@@ -403,6 +406,18 @@ class GettextAlias(object):
                     lang = pool['res.users'].context_get(cr, uid)['lang']
         return lang
 
+    def _get_catalog(self, frame, lang):
+        # return the catalog of lang if the registry has it already, without
+        # creating a cursor nor loading a registry
+        from openerp.modules.registry import Registry, RegistryManager
+        pool = getattr(frame.f_locals.get('self'), 'pool', None)
+        if not isinstance(pool, Registry):
+            cr, dummy = self._get_cr(frame, allow_create=False)
+            db_name = cr.dbname if cr else getattr(threading.currentThread(), 'dbname', None)
+            pool = RegistryManager.registries.get(db_name)
+        if pool is not None:
+            return pool.translation_catalogs.get(lang)
+
     def __call__(self, source):
         res = source
         cr = None
@@ -416,11 +431,16 @@ class GettextAlias(object):
                 return source
             lang = self._get_lang(frame)
             if lang:
-                cr, is_new_cr = self._get_cr(frame)
-                if cr:
-                    # Try to use ir.translation to benefit from global cache if possible
-                    registry = openerp.registry(cr.dbname)
-                    res = registry['ir.translation']._get_source(cr, SUPERUSER_ID, None, ('code','sql_constraint'), lang, source)
+                # fast path: the catalog of code translations is loaded
+                catalog = self._get_catalog(frame, lang)
+                if catalog is None:
+                    cr, is_new_cr = self._get_cr(frame)
+                    if cr:
+                        registry = openerp.registry(cr.dbname)
+                        catalog = registry['ir.translation']._get_code_catalog(cr, SUPERUSER_ID, lang)
+                if catalog is not None:
+                    source = misc.ustr(source)
+                    res = catalog.get(source, source)
                 else:
                     _logger.debug('no context cursor detected, skipping translation for "%r"', source)
             else:
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from openerp.workflow.batch import WorkflowBatch
+from openerp.workflow.helpers import Session
 from openerp.workflow.service import WorkflowService
 
 # The new API is in openerp.workflow.workflow_service
@@ -21,6 +23,17 @@ def trg_write(uid, res_type, res_id, cr):
     """
     return WorkflowService.new(cr, uid, res_type, res_id).write()
 
+def trg_write_batch(uid, res_type, res_ids, cr):
+    """
+    Reevaluates the workflow instances of several records at once, like
+    ``trg_write`` does for each of them.
+
+    :param res_type: the model name
+    :param res_ids: the model instance ids the workflows belong to
+    :param cr: a database cursor
+    """
+    return WorkflowBatch(Session(cr, uid), res_type, res_ids).update()
+
 def trg_trigger(uid, res_type, res_id, cr):
     """
     Activate a trigger.
@@ -66,6 +79,20 @@ def trg_validate(uid, res_type, res_id, signal, cr):
     assert isinstance(signal, basestring)
     return WorkflowService.new(cr, uid, res_type, res_id).validate(signal)
 
+def trg_validate_batch(uid, res_type, res_ids, signal, cr):
+    """
+    Fire a signal on the workflow instances of several records at once, like
+    ``trg_validate`` does for each of them.
+
+    :param res_type: the model name
+    :param res_ids: the model instance ids the workflows belong to
+    :signal: the signal name to be fired
+    :param cr: a database cursor
+    :return: a dict associating each record id to the result of the signal
+    """
+    assert isinstance(signal, basestring)
+    return WorkflowBatch(Session(cr, uid), res_type, res_ids).validate(signal)
+
 def trg_redirect(uid, res_type, res_id, new_rid, cr):
     """
     Re-bind a workflow instance to another instance of the same model.
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+""" Processing of the workflow instances of many records at once.
+
+The instances and their workitems are read in bulk, and the workitems are
+grouped by activity. The common step of a workflow is processed for a whole
+group: a workitem waiting in a completed activity follows a transition to an
+activity of kind ``dummy`` or ``function``, possibly followed by other such
+transitions. The workitems are replaced with set-based queries, and the
+action of the activity is evaluated once for all the records when it only
+calls methods of the model. Transition conditions made of constants are
+evaluated once per group, the other ones once per record.
+
+The other cases (subflows, parallel branches, AND splits and joins, signals
+sent to parent workflows, ...) are processed record by record by
+:class:`~openerp.workflow.instance.WorkflowInstance`, as usual.
+"""
+
+import logging
+from collections import defaultdict
+
+import openerp
+from openerp.workflow.helpers import Session
+from openerp.workflow.helpers import Record
+from openerp.workflow.helpers import WorkflowActivity
+from openerp.workflow.instance import WorkflowInstance
+from openerp.workflow.workitem import WorkflowItem
+
+logger = logging.getLogger(__name__)
+
+BATCH_KINDS = (WorkflowActivity.KIND_DUMMY, WorkflowActivity.KIND_FUNCTION)
+
+
+def _expr_names(lines):
+    """ Return the names used by the expressions ``lines``, or ``None`` if
+    they cannot be compiled.
+    """
+    names = set()
+    for line in (lines or '').split('\n'):
+        line = line.strip()
+        if not line or line in ('True', 'False'):
+            continue
+        try:
+            names.update(compile(line, '<workflow>', 'eval').co_names)
+        except SyntaxError:
+            return None
+    return names.difference(['True', 'False', 'None'])
+
+
+class WorkflowBatch(object):
+    """ The workflow instances of the records ``ids`` of ``model``. """
+
+    def __init__(self, session, model, ids):
+        assert isinstance(session, Session)
+        self.session = session
+        self.cr = session.cr
+        self.model = model
+        self.ids = ids
+        self.instances = {}                 # {instance_id: res_id}
+        self.stacks = defaultdict(list)     # {res_id: [action]}
+        self.activities = {}                # {activity_id: activity}
+        self.transitions = defaultdict(list)    # {activity_id: [transition]}
+        self.constants = {}                 # {transition_id: value of the condition}
+        self._user_groups = None
+
+    def validate(self, signal):
+        """ Fire ``signal`` on the instances, and return a dict associating
+        each record id to its result, like ``trg_validate`` does.
+        """
+        assert isinstance(signal, basestring)
+        return self._process(signal)
+
+    def update(self):
+        """ Reevaluate the instances, like ``trg_write`` does. """
+        self._process(None)
+
+    def _process(self, signal):
+        cr = self.cr
+        for sub_ids in cr.split_for_in_conditions(self.ids):
+            cr.execute("SELECT id, res_id FROM wkf_instance WHERE res_type=%s AND res_id IN %s AND state=%s",
+                       (self.model, sub_ids, 'active'))
+            self.instances.update(cr.fetchall())
+        result = dict.fromkeys(self.ids, False)
+        if not self.instances:
+            return result
+
+        workitems = defaultdict(list)
+        for sub_ids in cr.split_for_in_conditions(self.instances):
+            cr.execute("SELECT * FROM wkf_workitem WHERE inst_id IN %s ORDER BY id", (sub_ids,))
+            for workitem in cr.dictfetchall():
+                workitems[workitem['inst_id']].append(workitem)
+        self._load_workflows()
+
+        # the instances waiting in a single completed activity are processed
+        # in batch, the other ones one by one
+        groups = defaultdict(list)
+        others = []
+        for instance_id in sorted(self.instances):
+            items = workitems.get(instance_id, [])
+            if len(items) == 1 and items[0]['state'] == 'complete' and items[0]['act_id'] in self.activities:
+                groups[items[0]['act_id']].append(items[0])
+            else:
+                others.append(instance_id)
+        self._split(groups, signal, False, lambda item: others.append(item['inst_id']))
+
+        batched = set(self.instances).difference(others)
+        for sub_ids in cr.split_for_in_conditions(batched):
+            cr.execute("""SELECT w.inst_id FROM wkf_workitem w LEFT JOIN wkf_activity a ON (a.id=w.act_id)
+                          WHERE w.inst_id IN %s GROUP BY w.inst_id
+                          HAVING bool_and(w.state='complete' AND coalesce(a.flow_stop, false))""", (sub_ids,))
+            for instance_id, in cr.fetchall():
+                self._instance(instance_id)._update_end()
+        for instance_id in batched:
+            res_id = self.instances[instance_id]
+            result[res_id] = result[res_id] or (self.stacks[res_id] and self.stacks[res_id][0]) or False
+
+        for instance_id in sorted(others):
+            res_id = self.instances[instance_id]
+            if signal is None:
+                self._instance(instance_id).update()
+            else:
+                result[res_id] = result[res_id] or self._instance(instance_id).validate(signal)
+        return result
+
+    def _load_workflows(self):
+        cr = self.cr
+        cr.execute("""SELECT a.* FROM wkf_activity a
+                      WHERE a.wkf_id IN (SELECT DISTINCT wkf_id FROM wkf_instance WHERE id IN %s)""",
+                   (tuple(self.instances),))
+        for activity in cr.dictfetchall():
+            self.activities[activity['id']] = activity
+        if self.activities:
+            cr.execute("SELECT * FROM wkf_transition WHERE act_from IN %s ORDER BY sequence, id",
+                       (tuple(self.activities),))
+            for transition in cr.dictfetchall():
+                self.transitions[transition['act_from']].append(transition)
+
+    def _instance(self, instance_id):
+        record = Record(self.model, self.instances[instance_id])
+        return WorkflowInstance(self.session, record, {'id': instance_id})
+
+    def _item(self, workitem):
+        record = Record(self.model, self.instances[workitem['inst_id']])
+        return WorkflowItem(self.session, record, workitem)
+
+    def _stack(self, workitem):
+        return self.stacks[self.instances[workitem['inst_id']]]
+
+    def _user_in_group(self, group_id):
+        if self._user_groups is None:
+            registry = openerp.registry(self.cr.dbname)
+            uid = self.session.uid
+            self._user_groups = set(registry['res.users'].read(self.cr, uid, [uid], ['groups_id'])[0]['groups_id'])
+        return group_id in self._user_groups
+
+    def _check(self, transition, workitem):
+        """ Test ``transition`` for ``workitem``, like
+        :meth:`~openerp.workflow.workitem.WorkflowItem.wkf_expr_check` does,
+        once the signal and the group have been checked.
+        """
+        transition_id = transition['id']
+        if transition_id in self.constants:
+            return self.constants[transition_id]
+        if _expr_names(transition['condition']) == set():
+            value = self._item(workitem).wkf_expr_eval_expr(transition['condition'])
+            self.constants[transition_id] = value
+            return value
+        return self._item(workitem).wkf_expr_eval_expr(transition['condition'])
+
+    def _is_method_call(self, lines):
+        """ Return whether the expressions ``lines`` only use methods of the
+        model, and can therefore be evaluated on many records at once.
+        """
+        names = _expr_names(lines)
+        if names is None:
+            return False
+        model = openerp.registry(self.cr.dbname)[self.model]
+        return all(name not in model._fields and callable(getattr(model, name, None)) for name in names)
+
+    def _split(self, groups, signal, triggers, fallback):
+        """ Make the completed workitems ``groups`` (a dict associating each
+        activity id to a list of workitems) follow their transitions, like
+        :meth:`~openerp.workflow.workitem.WorkflowItem._split_test` does. The
+        workitems that cannot be processed in batch are given to ``fallback``.
+        When ``triggers`` is set, the workitems that stay in their activity
+        wait for the triggers of its transitions.
+        """
+        uid = self.session.uid
+        hops = defaultdict(list)            # {transition_id: [workitem]}
+        transitions_by_id = {}
+        for activity_id, items in groups.iteritems():
+            activity = self.activities[activity_id]
+            if activity['split_mode'] not in ('XOR', 'OR'):
+                map(fallback, items)
+                continue
+            transitions = self.transitions[activity_id]
+            candidates = [
+                transition for transition in transitions
+                if not (transition['signal'] and signal != transition['signal'])
+                if not (uid != openerp.SUPERUSER_ID and transition['group_id'] and
+                        not self._user_in_group(transition['group_id']))
+            ]
+            if candidates:
+                # prefetch the records for the evaluation of the conditions
+                registry = openerp.registry(self.cr.dbname)
+                registry[self.model].browse(self.cr, uid, [self.instances[item['inst_id']] for item in items])
+            for item in items:
+                passed = []
+                for transition in candidates:
+                    if self._check(transition, item):
+                        passed.append(transition)
+                        if activity['split_mode'] == 'XOR':
+                            break
+                if not passed:
+                    if triggers and any(transition['trigger_model'] for transition in transitions):
+                        self._item(item)._create_triggers()
+                elif len(passed) == 1 and self._can_follow(passed[0]):
+                    hops[passed[0]['id']].append(item)
+                    transitions_by_id[passed[0]['id']] = passed[0]
+                else:
+                    fallback(item)
+
+        for transition_id, items in sorted(hops.iteritems()):
+            self._follow(transitions_by_id[transition_id], items)
+
+    def _can_follow(self, transition):
+        activity = self.activities.get(transition['act_to'])
+        return bool(activity and activity['join_mode'] == 'XOR' and
+                    activity['kind'] in BATCH_KINDS and not activity['signal_send'])
+
+    def _follow(self, transition, items):
+        """ Replace the workitems ``items`` by workitems in the destination
+        activity of ``transition``, and execute that activity, like
+        :meth:`~openerp.workflow.workitem.WorkflowItem._join_test` and
+        :meth:`~openerp.workflow.workitem.WorkflowItem._execute` do.
+        """
+        cr = self.cr
+        activity = self.activities[transition['act_to']]
+        function = activity['kind'] == WorkflowActivity.KIND_FUNCTION
+        cr.execute("DELETE FROM wkf_workitem WHERE id IN %s", (tuple(item['id'] for item in items),))
+        cr.execute("""INSERT INTO wkf_workitem (act_id, inst_id, state)
+                      SELECT %s, inst_id, %s FROM unnest(%s) AS inst_id
+                      RETURNING *""",
+                   (activity['id'], 'running' if function else 'complete', [item['inst_id'] for item in items]))
+        items = sorted(cr.dictfetchall(), key=lambda item: item['id'])
+        logger.info('Created %d workflow items in activity %s', len(items), activity['id'])
+
+        if function:
+            if self._is_method_call(activity['action']):
+                res_ids = [self.instances[item['inst_id']] for item in items]
+                result = self._item(items[0]).wkf_expr_eval_expr(activity['action'], res_ids)
+                results = [result] * len(items)
+            else:
+                results = [self._item(item).wkf_expr_execute(activity) for item in items]
+            for item, result in zip(items, results):
+                if type(result) in (dict,):
+                    self._stack(item).append(result)
+        if activity['action_id']:
+            for item in items:
+                result = self._item(item).wkf_expr_execute_action(activity)
+                if result:
+                    self._stack(item).append(result)
+        if function:
+            cr.execute("UPDATE wkf_workitem SET state=%s WHERE id IN %s",
+                       ('complete', tuple(item['id'] for item in items)))
+            for item in items:
+                item['state'] = 'complete'
+
+        # the new workitems follow the transitions without signal
+        def fallback(item):
+            workitem = self._item(item)
+            workitem.workitem['state'] = 'complete'
+            if not workitem._split_test(activity['split_mode'], None, self._stack(item)):
+                workitem._create_triggers()
+
+        self._split({activity['id']: items}, None, True, fallback)
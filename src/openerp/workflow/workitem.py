@@ -26,12 +26,12 @@ class Environment(dict):
     instance, column names, and all the record (the one obtained by browsing
     the provided ID) attributes.
     """
-    def __init__(self, session, record):
+    def __init__(self, session, record, ids=None):
         self.cr = session.cr
         self.uid = session.uid
         self.model = record.model
         self.id = record.id
-        self.ids = [record.id]
+        self.ids = ids or [record.id]
         self.obj = openerp.registry(self.cr.dbname)[self.model]
 
     def __getitem__(self, key):
@@ -103,17 +103,24 @@ class WorkflowItem(object):
             triggers = triggers and not ok
 
         if triggers:
-            cr.execute('select * from wkf_transition where act_from=%s ORDER BY sequence,id', (self.workitem['act_id'],))
-            for trans in cr.dictfetchall():
-                if trans['trigger_model']:
-                    ids = self.wkf_expr_eval_expr(trans['trigger_expr_id'])
-                    for res_id in ids:
-                        cr.execute('select nextval(\'wkf_triggers_id_seq\')')
-                        id =cr.fetchone()[0]
-                        cr.execute('insert into wkf_triggers (model,res_id,instance_id,workitem_id,id) values (%s,%s,%s,%s,%s)', (trans['trigger_model'],res_id, self.workitem['inst_id'], self.workitem['id'], id))
+            self._create_triggers()
 
         return True
 
+    def _create_triggers(self):
+        """ Make the workitem wait for the records given by the transitions
+        with a trigger model.
+        """
+        cr = self.session.cr
+        cr.execute('select * from wkf_transition where act_from=%s ORDER BY sequence,id', (self.workitem['act_id'],))
+        for trans in cr.dictfetchall():
+            if trans['trigger_model']:
+                ids = self.wkf_expr_eval_expr(trans['trigger_expr_id'])
+                for res_id in ids:
+                    cr.execute('select nextval(\'wkf_triggers_id_seq\')')
+                    id =cr.fetchone()[0]
+                    cr.execute('insert into wkf_triggers (model,res_id,instance_id,workitem_id,id) values (%s,%s,%s,%s,%s)', (trans['trigger_model'],res_id, self.workitem['inst_id'], self.workitem['id'], id))
+
     def _execute(self, activity, stack):
         """Send a signal to parenrt workflow (signal: subflow.signal_name)"""
         result = True
@@ -253,10 +260,11 @@ class WorkflowItem(object):
                     cr.execute('delete from wkf_witm_trans where trans_id=%s and inst_id=%s', (id,inst_id))
                 WorkflowItem.create(self.session, self.record, activity, inst_id, stack=stack)
 
-    def wkf_expr_eval_expr(self, lines):
+    def wkf_expr_eval_expr(self, lines, ids=None):
         """
         Evaluate each line of ``lines`` with the ``Environment`` environment, returning
-        the value of the last line.
+        the value of the last line. The environment is bound to the records
+        ``ids`` if given, and to the workitem's record otherwise.
         """
         assert lines, 'You used a NULL action in a workflow, use dummy node instead.'
         result = False
@@ -269,7 +277,7 @@ class WorkflowItem(object):
             elif line == 'False':
                 result = False
             else:
-                env = Environment(self.session, self.record)
+                env = Environment(self.session, self.record, ids)
                 result = eval(line, env, nocopy=True)
         return result
 